@@ -0,0 +1,447 @@
+""" Benchmarks for the query, bulk, bulk 2.0 and formatting hot paths
+
+Every benchmark runs against a local mocked HTTP layer (`responses`), so
+the numbers measure client side overhead only: serialization, parsing,
+splitting and bookkeeping.
+
+Usage:
+
+    python benchmarks/bench.py                  # compare with baseline.json
+    python benchmarks/bench.py -k bulk2         # only matching benchmarks
+    python benchmarks/bench.py --csv-mb 1024    # GB-scale CSV inputs
+    python benchmarks/bench.py --save           # record a new baseline
+
+The process exits with status 1 when a benchmark is slower, or uses more
+memory, than its baseline by more than `--tolerance`.
+"""
+
+import argparse
+import csv
+import gc
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Tuple
+
+import requests
+import responses
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# pylint: disable=wrong-import-position
+from simple_salesforce import Salesforce, format_soql
+from simple_salesforce.bulk import _merge_results
+from simple_salesforce.bulk2 import _convert_dict_to_csv, _count_csv, \
+    _split_csv
+from simple_salesforce.metadata import SfdcMetadataApi
+from simple_salesforce.testing import FakeOrg
+
+BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+INSTANCE_URL = 'https://na15.salesforce.com'
+QUERY_PAGE_SIZE = 2000
+
+# A benchmark prepares its input and returns the number of records it
+# processes together with the callable to time.
+Prepared = Tuple[int, Callable[[], Any]]
+
+
+class Result(NamedTuple):
+    """Outcome of one benchmark"""
+    name: str
+    records: int
+    seconds: float
+    records_per_second: float
+    peak_bytes: int
+
+
+def _client() -> Salesforce:
+    """A client whose calls go to the mocked HTTP layer"""
+    return Salesforce(session_id='12345',
+                      instance_url=INSTANCE_URL,
+                      session=requests.Session())
+
+
+def _record(i: int) -> Dict[str, Any]:
+    """A Contact record as returned by the REST API"""
+    return {
+        'attributes': {'type': 'Contact',
+                       'url': f'/services/data/v59.0/sobjects/Contact/{i}'},
+        'Id': f'003{i:015d}',
+        'FirstName': f'First {i}',
+        'LastName': f'Last {i}',
+        'Email': f'contact{i}@example.com',
+        'Description': 'Lorem ipsum dolor sit amet, "quoted", ' * 3,
+        }
+
+
+def _mock_query_pages(total: int) -> None:
+    """Serve `total` records in pages linked by nextRecordsUrl"""
+    pages = max(1, -(-total // QUERY_PAGE_SIZE))
+    bodies = []
+    for page in range(pages):
+        start = page * QUERY_PAGE_SIZE
+        body: Dict[str, Any] = {
+            'totalSize': total,
+            'done': page == pages - 1,
+            'records': [_record(i) for i in
+                        range(start, min(total, start + QUERY_PAGE_SIZE))],
+            }
+        if page < pages - 1:
+            body['nextRecordsUrl'] = (
+                f'/services/data/v59.0/query/01gD0000002HU6KIAW-{page + 1}'
+                )
+        bodies.append(json.dumps(body))
+
+    def first_page(_: Any) -> Tuple[int, Dict[str, str], str]:
+        return 200, {}, bodies[0]
+
+    def next_page(request: Any) -> Tuple[int, Dict[str, str], str]:
+        page = int(request.url.rsplit('-', 1)[1])
+        return 200, {}, bodies[page]
+
+    responses.add_callback(responses.GET,
+                           re.compile(r'^https://.*/query/\?q=.*$'),
+                           callback=first_page)
+    responses.add_callback(responses.GET,
+                           re.compile(r'^https://.*/query/01gD.*-\d+$'),
+                           callback=next_page)
+
+
+def bench_query_all_iter(args: argparse.Namespace) -> Prepared:
+    """`Salesforce.query_all_iter` over paged results"""
+    total = args.query_records
+    _mock_query_pages(total)
+    client = _client()
+    return total, lambda: sum(1 for _ in client.query_all_iter(
+        'SELECT Id FROM Contact'))
+
+
+def bench_query_all(args: argparse.Namespace) -> Prepared:
+    """`Salesforce.query_all` over paged results"""
+    total = args.query_records
+    _mock_query_pages(total)
+    client = _client()
+    return total, lambda: client.query_all('SELECT Id FROM Contact')
+
+
+def _mock_bulk() -> None:
+    """Serve Bulk API jobs whose batches complete immediately"""
+    batch_sizes: Dict[str, int] = {}
+    batch_requests: Dict[str, str] = {}
+
+    def add_batch(request: Any) -> Tuple[int, Dict[str, str], str]:
+        batch_id = f'751D{len(batch_sizes):014d}'
+        batch_sizes[batch_id] = len(json.loads(request.body))
+        batch_requests[batch_id] = request.body
+        return 200, {}, json.dumps(
+            {'id': batch_id, 'jobId': 'Job-1', 'state': 'Queued'})
+
+    def get_batches(_: Any) -> Tuple[int, Dict[str, str], str]:
+        return 200, {}, json.dumps({'batchInfo': [
+            {'id': i, 'jobId': 'Job-1', 'state': 'Completed',
+             'numberRecordsProcessed': size, 'numberRecordsFailed': 0}
+            for i, size in batch_sizes.items()]})
+
+    def batch_result(request: Any) -> Tuple[int, Dict[str, str], str]:
+        batch_id = request.url.rsplit('/', 2)[1]
+        return 200, {}, json.dumps([
+            {'success': True, 'created': True, 'id': f'003{i:015d}',
+             'errors': []} for i in range(batch_sizes[batch_id])])
+
+    responses.add(responses.POST,
+                  re.compile(r'^https://.*/job$'),
+                  json={'id': 'Job-1', 'state': 'Open'})
+    responses.add(responses.POST,
+                  re.compile(r'^https://.*/job/Job-1$'),
+                  json={'id': 'Job-1', 'state': 'Closed'})
+    responses.add_callback(responses.POST,
+                           re.compile(r'^https://.*/job/Job-1/batch$'),
+                           callback=add_batch)
+    responses.add_callback(responses.GET,
+                           re.compile(r'^https://.*/job/Job-1/batch$'),
+                           callback=get_batches)
+    responses.add_callback(
+        responses.GET,
+        re.compile(r'^https://.*/job/Job-1/batch/\w+/result$'),
+        callback=batch_result)
+    responses.add_callback(
+        responses.GET,
+        re.compile(r'^https://.*/job/Job-1/batch/\w+/request$'),
+        callback=lambda request: (
+            200, {}, batch_requests[request.url.rsplit('/', 2)[1]]))
+
+
+def bench_bulk_insert_auto(args: argparse.Namespace) -> Prepared:
+    """Bulk API insert with `batch_size='auto'`"""
+    total = args.bulk_records
+    _mock_bulk()
+    data = [{k: v for k, v in _record(i).items() if k != 'attributes'}
+            for i in range(total)]
+    bulk = _client().bulk.Contact
+    return total, lambda: bulk.insert(data, batch_size='auto')
+
+
+def bench_bulk_insert_generator(args: argparse.Namespace) -> Prepared:
+    """Bulk API insert of records produced by a generator"""
+    total = args.bulk_records
+    _mock_bulk()
+    bulk = _client().bulk.Contact
+    return total, lambda: bulk.insert(
+        ({k: v for k, v in _record(i).items() if k != 'attributes'}
+         for i in range(total)),
+        batch_size='auto')
+
+
+def _lookup_record(i: int) -> Dict[str, Any]:
+    """A Contact record to send, with a lookup by external id"""
+    record = {k: v for k, v in _record(i).items() if k != 'attributes'}
+    record['Account'] = {'Ext__c': f'A-{i % 100}'}
+    return record
+
+
+def bench_bulk_insert_detailed(args: argparse.Namespace) -> Prepared:
+    """Bulk API insert of 10,000 record batches with
+    `include_detailed_results`"""
+    total = args.bulk_records
+    _mock_bulk()
+    data = [_lookup_record(i) for i in range(total)]
+    bulk = _client().bulk.Contact
+    return total, lambda: bulk.insert(data, batch_size=10_000,
+                                      include_detailed_results=True)
+
+
+def bench_bulk_merge_results(_: argparse.Namespace) -> Prepared:
+    """Join of a 10,000 record batch with its results"""
+    total = 10_000
+    data = [_lookup_record(i) for i in range(total)]
+    results = [{'success': True, 'created': True, 'id': f'003{i:015d}',
+                'errors': []} for i in range(total)]
+    return total, lambda: sum(1 for _ in _merge_results([results], data))
+
+
+def _csv_file(directory: str, megabytes: int) -> Tuple[str, int]:
+    """Write a CSV file of about `megabytes` MB, return path and rows"""
+    path = os.path.join(directory, 'contacts.csv')
+    row = ['003000000000000AAA', 'First', 'Last', 'contact@example.com',
+           'Lorem ipsum, "dolor" sit amet\nconsectetur ' * 2]
+    rows = 0
+    with open(path, 'w', encoding='utf-8', newline='') as out:
+        writer = csv.writer(out, lineterminator='\n')
+        writer.writerow(['Id', 'FirstName', 'LastName', 'Email',
+                         'Description'])
+        while out.tell() < megabytes * 1024 * 1024:
+            writer.writerows([row] * 1000)
+            rows += 1000
+    return path, rows
+
+
+def bench_bulk2_split_csv_file(args: argparse.Namespace) -> Prepared:
+    """Bulk 2.0 `_split_csv` of a CSV file"""
+    path, rows = _csv_file(args.tmp, args.csv_mb)
+    return rows, lambda: sum(n for n, _ in _split_csv(filename=path))
+
+
+def bench_bulk2_split_csv_records(args: argparse.Namespace) -> Prepared:
+    """Bulk 2.0 `_split_csv` of an in-memory CSV string"""
+    path, rows = _csv_file(args.tmp, max(1, args.csv_mb // 4))
+    with open(path, encoding='utf-8') as source:
+        data = source.read()
+    return rows, lambda: sum(n for n, _ in _split_csv(records=data))
+
+
+def bench_bulk2_count_csv(args: argparse.Namespace) -> Prepared:
+    """Bulk 2.0 `_count_csv` of a CSV file"""
+    path, rows = _csv_file(args.tmp, args.csv_mb)
+    return rows, lambda: _count_csv(filename=path, skip_header=True)
+
+
+def bench_bulk2_convert_dict_to_csv(args: argparse.Namespace) -> Prepared:
+    """Bulk 2.0 `_convert_dict_to_csv` of a list of records"""
+    total = args.bulk_records * 5
+    data = [{k: v for k, v in _record(i).items() if k != 'attributes'}
+            for i in range(total)]
+    return total, lambda: _convert_dict_to_csv(data, ',', '\n')
+
+
+def bench_format_soql_in_list(args: argparse.Namespace) -> Prepared:
+    """`format_soql` with a large IN-list"""
+    ids = [f'003{i:015d}' for i in range(args.in_list)]
+    return len(ids), lambda: format_soql(
+        'SELECT Id FROM Contact WHERE Id IN {}', ids)
+
+
+def bench_fake_org_bulk_insert(args: argparse.Namespace) -> Prepared:
+    """Bulk API insert against a `FakeOrg`, end to end"""
+    total = args.bulk_records
+    org = FakeOrg(latency=args.latency)
+    data = [{k: v for k, v in _record(i).items() if k != 'attributes'}
+            for i in range(total)]
+    bulk = org.client().bulk.Contact
+    return total, lambda: bulk.insert(data, batch_size=2000)
+
+
+def bench_fake_org_bulk_insert_csv(args: argparse.Namespace) -> Prepared:
+    """Bulk API insert with CSV batches against a `FakeOrg`, end to end"""
+    total = args.bulk_records
+    org = FakeOrg(latency=args.latency)
+    data = [{k: v for k, v in _record(i).items() if k != 'attributes'}
+            for i in range(total)]
+    bulk = org.client().bulk.Contact
+    return total, lambda: bulk.insert(data, batch_size=2000,
+                                      content_type='CSV')
+
+
+def bench_fake_org_bulk_query(args: argparse.Namespace) -> Prepared:
+    """Bulk API query against a `FakeOrg`, consuming the results as they
+    are streamed"""
+    total = args.bulk_records
+    org = FakeOrg(latency=args.latency)
+    org.add_records('Contact', (
+        {k: v for k, v in _record(i).items() if k not in ('attributes', 'Id')}
+        for i in range(total)))
+    bulk = org.client().bulk.Contact
+    return total, lambda: sum(len(i) for i in bulk.query(
+        'SELECT Id, FirstName, LastName, Email, Description FROM Contact',
+        lazy_operation=True))
+
+
+def bench_fake_org_bulk2_insert(args: argparse.Namespace) -> Prepared:
+    """Bulk 2.0 insert against a `FakeOrg`, end to end"""
+    total = args.bulk_records
+    org = FakeOrg(latency=args.latency)
+    data = [{k: v for k, v in _record(i).items() if k != 'attributes'}
+            for i in range(total)]
+    bulk2 = org.client().bulk2.Contact
+    return total, lambda: bulk2.insert(records=data, batch_size=2000,
+                                       concurrency=4, wait=0)
+
+
+def bench_metadata_api_init(_: argparse.Namespace) -> Prepared:
+    """`SfdcMetadataApi` construction, including WSDL parsing"""
+    session = requests.Session()
+    return 1, lambda: SfdcMetadataApi(
+        session, '12345', INSTANCE_URL,
+        f'{INSTANCE_URL}/services/Soap/m/59.0/', {}, '59.0')
+
+
+BENCHMARKS: Dict[str, Callable[[argparse.Namespace], Prepared]] = {
+    name[len('bench_'):]: func
+    for name, func in sorted(globals().items())
+    if name.startswith('bench_')
+    }
+
+
+@contextmanager
+def _mocked() -> Iterator[None]:
+    """Route every request to the `responses` mocks"""
+    responses.start()
+    try:
+        yield
+    finally:
+        responses.stop()
+        responses.reset()
+
+
+def run(name: str, args: argparse.Namespace) -> Result:
+    """Run one benchmark: best time of `repeat` runs, then peak memory"""
+    with _mocked(), tempfile.TemporaryDirectory() as tmp:
+        args.tmp = tmp
+        records, func = BENCHMARKS[name](args)
+        func()  # warm up caches and lazily compiled patterns
+        best = float('inf')
+        for _ in range(args.repeat):
+            gc.collect()
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return Result(name, records, best, records / best, peak)
+
+
+def compare(results: List[Result],
+            baseline: Dict[str, Any],
+            tolerance: float
+            ) -> List[str]:
+    """Describe every result that regressed beyond `tolerance`"""
+    regressions = []
+    for result in results:
+        previous = baseline.get('results', {}).get(result.name)
+        if not previous or previous['records'] != result.records:
+            continue
+        if result.records_per_second < \
+                previous['records_per_second'] * (1 - tolerance):
+            regressions.append(
+                f"{result.name}: {result.records_per_second:,.0f} records/s, "
+                f"baseline {previous['records_per_second']:,.0f}")
+        if result.peak_bytes > previous['peak_bytes'] * (1 + tolerance):
+            regressions.append(
+                f"{result.name}: peak {result.peak_bytes:,} bytes, "
+                f"baseline {previous['peak_bytes']:,}")
+    return regressions
+
+
+def main() -> int:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n', maxsplit=1)[0])
+    parser.add_argument('-k', dest='pattern', default='',
+                        help='only run benchmarks whose name contains this')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--query-records', type=int, default=20_000)
+    parser.add_argument('--bulk-records', type=int, default=20_000)
+    parser.add_argument('--csv-mb', type=int, default=64,
+                        help='size of the CSV inputs, 1024 for GB-scale')
+    parser.add_argument('--in-list', type=int, default=100_000)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds FakeOrg waits before each response')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown or memory growth, 0.25 = 25%%')
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--save', action='store_true',
+                        help='write the results as the new baseline')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'benchmark':32} {'records':>10} {'seconds':>9} "
+          f"{'records/s':>12} {'peak MB':>9}")
+    for name in BENCHMARKS:
+        if args.pattern not in name:
+            continue
+        result = run(name, args)
+        results.append(result)
+        print(f'{result.name:32} {result.records:>10,} '
+              f'{result.seconds:>9.3f} {result.records_per_second:>12,.0f} '
+              f'{result.peak_bytes / 2 ** 20:>9.1f}')
+
+    baseline = json.loads(args.baseline.read_text()) \
+        if args.baseline.exists() else {}
+    if args.save:
+        baseline.setdefault('results', {}).update(
+            {i.name: i._asdict() for i in results})
+        baseline['python'] = platform.python_version()
+        baseline['machine'] = platform.machine()
+        args.baseline.write_text(
+            json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
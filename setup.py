@@ -30,9 +30,11 @@ setup(
        'requests>=2.22.0',
        'typing-extensions',
        'zeep',
-       'pyjwt[crypto]',
-       'more-itertools'
+       'pyjwt[crypto]'
        ],
+    extras_require={
+        'opentelemetry': ['opentelemetry-api'],
+        },
     tests_require=[
         'pytest',
         'pytz>=2014.1.1',
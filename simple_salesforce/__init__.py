@@ -2,7 +2,7 @@
 # flake8: noqa
 
 from .api import Salesforce, SFType
-from .bulk import SFBulkHandler
+from .bulk import BulkJob, BulkJobWriter, SFBulkHandler
 from .exceptions import (SalesforceAuthenticationFailed, SalesforceError,
                          SalesforceExpiredSession, SalesforceGeneralError,
                          SalesforceMalformedRequest,
@@ -7,11 +7,11 @@ DEFAULT_API_VERSION = '59.0'
 import base64
 import json
 import logging
-import re
 from typing import Any, Callable, Dict, IO, Iterator, List, Mapping, \
     MutableMapping, \
     Optional, Tuple, Union, cast
 from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
 from functools import partial
 from pathlib import Path
 from urllib.parse import urljoin, urlparse
@@ -21,8 +21,8 @@ from .bulk2 import SFBulk2Handler
 from .exceptions import SalesforceGeneralError
 from .login import SalesforceLogin
 from .metadata import SfdcMetadataApi
-from .util import Headers, PerAppUsage, Proxies, Usage, date_to_iso8601, \
-    exception_handler
+from .util import Headers, Hooks, PerAppUsage, Proxies, Usage, \
+    date_to_iso8601, exception_handler, parse_api_usage, send_request
 
 # pylint: disable=invalid-name
 logger = logging.getLogger(__name__)
@@ -36,6 +36,7 @@ class Salesforce:
     """
     _parse_float = None
     _object_pairs_hook = OrderedDict
+    hooks: Optional[Hooks] = None
 
     # pylint: disable=too-many-arguments,too-many-locals,too-many-branches,too-many-statements,line-too-long
     def __init__(
@@ -59,6 +60,9 @@ class Salesforce:
             parse_float: Optional[Callable[[str], Any]] = None,
             object_pairs_hook: Optional[Callable[[List[Tuple[Any, Any]]], Any]]
             = OrderedDict,
+            hooks: Optional[Hooks] = None,
+            executor: Optional[Executor] = None,
+            max_workers: Optional[int] = None,
             ):
 
         """Initialize the instance with the given parameters.
@@ -108,6 +112,18 @@ class Salesforce:
                          https://docs.python.org/3/library/json.html#json.load
         * object_pairs_hook -- Function to parse ordered list of pairs in json.
                                To use python 'dict' change it to None or dict.
+        * hooks -- `Hooks` fired around every HTTP call made by this instance
+                   and its REST, bulk, bulk 2.0 and metadata helpers. A new,
+                   empty one is created if not given.
+        * executor -- Executor running the concurrent requests of the bulk
+                      and bulk 2.0 helpers. Shared with any other client
+                      given the same one.
+        * max_workers -- when no executor is given, run those requests in a
+                         thread pool of this size owned by this instance.
+                         If neither is given they share a process wide
+                         pool, see `util.default_executor`. A pool of its
+                         own is shut down by `close`, or when leaving a
+                         `with` block on this instance.
         """
 
         if domain is None:
@@ -119,6 +135,11 @@ class Salesforce:
         self.domain = domain
         self.session = session or requests.Session()
         self.proxies = self.session.proxies
+        self.hooks = hooks if hooks is not None else Hooks()
+        self._owns_executor = executor is None and max_workers is not None
+        if self._owns_executor:
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.executor = executor
         self._salesforce_login_partial = None
         # override custom session proxies dance
         if proxies is not None:
@@ -285,7 +306,8 @@ class Salesforce:
                                           instance=self.sf_instance,
                                           metadata_url=self.metadata_url,
                                           api_version=self.sf_version,
-                                          headers=self.headers
+                                          headers=self.headers,
+                                          hooks=self.hooks
                                           )
         return self._mdapi
 
@@ -341,6 +363,19 @@ class Salesforce:
                 )[0].get('IsSandbox')
         return is_sandbox
 
+    def close(self) -> None:
+        """Shut down the thread pool created for `max_workers`, if any,
+        once its requests are done. An executor passed in is left to its
+        owner."""
+        if self._owns_executor and self.executor is not None:
+            self.executor.shutdown()
+
+    def __enter__(self) -> 'Salesforce':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
     # SObject Handler
     def __getattr__(
             self,
@@ -366,13 +401,17 @@ class Salesforce:
             return SFBulkHandler(self.session_id,
                                  self.bulk_url,
                                  self.proxies,
-                                 self.session
+                                 self.session,
+                                 hooks=self.hooks,
+                                 executor=self.executor
                                  )
         if name == 'bulk2':
             return SFBulk2Handler(self.session_id,
                                   self.bulk2_url,
                                   self.proxies,
-                                  self.session
+                                  self.session,
+                                  hooks=self.hooks,
+                                  executor=self.executor
                                   )
 
         return SFType(
@@ -755,12 +794,15 @@ class Salesforce:
                                         )
         headers.update(additional_headers)
 
-        result = self.session.request(
-            method,
-            url,
-            headers=headers,
-            **kwargs
-            )
+        result = send_request(self.session,
+                              method,
+                              url,
+                              name=name,
+                              hooks=self.hooks,
+                              retries=retries,
+                              headers=headers,
+                              **kwargs
+                              )
 
         if self._salesforce_login_partial is not None \
                 and result.status_code == 401:
@@ -802,31 +844,7 @@ class Salesforce:
             Example 2: 'api-usage=25/5000;
                 per-app-api-usage=17/250(appName=sample-connected-app)'
         """
-        result: MutableMapping[str, Union[Usage, PerAppUsage]] = {}
-
-        api_usage = re.match(
-            r'[^-]?api-usage=(?P<used>\d+)/(?P<tot>\d+)',
-            sforce_limit_info
-            )
-
-        pau = r'.+per-app-api-usage=(?P<u>\d+)/(?P<t>\d+)\(appName=(?P<n>.+)\)'
-        per_app_api_usage = re.match(pau,
-                                     sforce_limit_info
-                                     )
-
-        if api_usage and api_usage.groups():
-            groups = api_usage.groups()
-            result['api-usage'] = Usage(used=int(groups[0]),
-                                        total=int(groups[1])
-                                        )
-        if per_app_api_usage and per_app_api_usage.groups():
-            groups = per_app_api_usage.groups()
-            result['per-app-api-usage'] = PerAppUsage(used=int(groups[0]),
-                                                      total=int(groups[1]),
-                                                      name=groups[2]
-                                                      )
-
-        return result
+        return parse_api_usage(sforce_limit_info)
 
     # file-based deployment function
     def deploy(
@@ -908,6 +926,7 @@ class SFType:
             parse_float: Optional[Callable[[str], Any]] = None,
             object_pairs_hook: Callable[[List[Tuple[Any, Any]]], Any]
             = OrderedDict,
+            hooks: Optional[Hooks] = None,
             ):
         """Initialize the instance with the given parameters.
         Arguments:
@@ -924,6 +943,8 @@ class SFType:
                          https://docs.python.org/3/library/json.html#json.load
         * object_pairs_hook -- Function to parse ordered list of pairs in json.
                                To use python 'dict' change it to None or dict.
+        * hooks -- `Hooks` fired around every HTTP call. Defaults to the hooks
+                   of `salesforce` when given.
         """
 
         # Make this backwards compatible with any tests that
@@ -942,6 +963,9 @@ class SFType:
         self.session = session or requests.Session()
         self._parse_float = parse_float
         self._object_pairs_hook = object_pairs_hook  # type: ignore[assignment]
+        if hooks is None and salesforce is not None:
+            hooks = salesforce.hooks
+        self.hooks = hooks
 
         # don't wipe out original proxies with None
         if not session and proxies is not None:
@@ -1249,11 +1273,15 @@ class SFType:
                                         {}
                                         )
         headers.update(additional_headers or {})
-        result = self.session.request(method,
-                                      url,
-                                      headers=headers,
-                                      **kwargs
-                                      )
+        result = send_request(self.session,
+                              method,
+                              url,
+                              name=self.name,
+                              hooks=self.hooks,
+                              retries=retries,
+                              headers=headers,
+                              **kwargs
+                              )
         # pylint: disable=W0212
         if (self.salesforce
                 and self.salesforce._salesforce_login_partial is not None
@@ -1269,6 +1297,7 @@ class SFType:
 
                 return self._call_salesforce(method,
                                              url,
+                                             retries=retries,
                                              **kwargs
                                              )
 
@@ -1,18 +1,607 @@
 """ Classes for interacting with Salesforce Bulk API """
 
 import concurrent.futures
+import csv
+import io
+import itertools
 import json
+import logging
+import queue
+import re
+import sys
+import threading
+import time
 from collections import OrderedDict
-from functools import partial
+from contextlib import closing
 from time import sleep
-from typing import Any, Dict, Iterable, List, Optional, Union, cast
+from typing import Any, Callable, Dict, Generator, Iterable, Iterator, \
+    List, Mapping, Match, NamedTuple, Optional, Set, TextIO, Tuple, Union, cast
+from xml.etree import ElementTree
 
 import requests
 
 from .exceptions import SalesforceGeneralError
-from .util import BulkDataAny, BulkDataStr, Headers, Proxies, \
-    call_salesforce, \
-    list_from_generator
+from .tracing import add_event, bind_context, set_attributes, span
+from .util import BulkDataAny, BulkDataStr, BulkEvent, Headers, Hooks, \
+    Proxies, call_salesforce, default_executor, list_from_generator
+
+logger = logging.getLogger(__name__)
+
+# Batch states after which a batch does not change anymore
+FINAL_BATCH_STATES = ('Completed', 'Failed', 'NotProcessed')
+
+# Record errors that a follow-up job may not run into again
+RETRYABLE_ERRORS = frozenset({'UNABLE_TO_LOCK_ROW'})
+
+# Limits of a single batch
+BATCH_RECORD_LIMIT = 10_000
+BATCH_CHAR_LIMIT = 10_000_000
+# Batch sizes `batch_size` may be set to instead of a number of records
+BATCH_SIZE_MODES = ('auto', 'adaptive')
+
+# Query results are streamed in chunks of bytes, and handed over in pages
+# of records, with at most this many pages waiting per result set
+STREAM_CHUNK_SIZE = 64 * 1024
+RESULT_PAGE_RECORDS = 2000
+RESULT_QUEUE_PAGES = 8
+
+# Job content types and the Content-Type header of their batches
+CONTENT_TYPES = {
+    'JSON': 'application/json',
+    'CSV': 'text/csv',
+    }
+
+
+def _pk_chunking_header(pk_chunking: Union[bool, int, Mapping[str, Any]]
+                        ) -> Optional[str]:
+    """ Value of the `Sforce-Enable-PKChunking` header
+
+    Arguments:
+
+    * pk_chunking -- `True` for the default chunk size, a chunk size, or
+                     options such as `{'chunkSize': 250000,
+                     'parent': 'Account', 'startRow': '001...'}`
+    """
+    if pk_chunking is False or pk_chunking is None:
+        return None
+    if pk_chunking is True:
+        return 'true'
+    if isinstance(pk_chunking, int):
+        return f'chunkSize={pk_chunking}'
+    return '; '.join(f'{k}={v}' for k, v in pk_chunking.items())
+
+
+def _check_options(batch_size: Union[int, str], content_type: str) -> None:
+    """Validate the batch size and content type of a job"""
+    # check for batch size type since now it accepts both integers
+    # & the string `auto`
+    if not (isinstance(batch_size,
+                       int
+                       ) or batch_size in BATCH_SIZE_MODES):
+        raise ValueError('batch size should be auto, adaptive or an integer')
+    if content_type not in CONTENT_TYPES:
+        raise ValueError('content type should be JSON or CSV')
+
+
+def _non_empty(data: Iterable[Mapping[str, Any]], operation: str
+               ) -> Iterator[Mapping[str, Any]]:
+    """Check that there is a record, without consuming generators"""
+    records = iter(data)
+    first = next(records, None)
+    if first is None:
+        raise ValueError(f'data should not be empty for {operation}')
+    return itertools.chain([first], records)
+
+
+_RECORD_ID = re.compile(r'^[a-zA-Z0-9]{15}(?:[a-zA-Z0-9]{3})?$')
+
+
+def _is_retryable(result: Mapping[str, Any]) -> bool:
+    """Whether a record only failed on `RETRYABLE_ERRORS`"""
+    errors = result.get('errors') or []
+    return not result.get('success') and bool(errors) and all(
+        i.get('statusCode') in RETRYABLE_ERRORS for i in errors)
+
+
+def _parent_key(record: Mapping[str, Any]) -> List[Tuple[str, str]]:
+    """The parents a record looks up, by Id or by external id
+
+    Sorting on it sends the children of a parent in the same batch, rather
+    than in concurrent batches that lock the parent in turn.
+    """
+    return sorted(
+        (field, json.dumps(value, sort_keys=True)
+         if isinstance(value, Mapping) else str(value))
+        for field, value in record.items()
+        if field != 'Id' and (
+            field.endswith('Id') or isinstance(value, Mapping)
+            or field.endswith('__c') and isinstance(value, str)
+            and _RECORD_ID.match(value)))
+
+
+class _ProcessingTimes:
+    """ Processing time per record of the recent batches of each org,
+    object and operation, shared by every job of the process """
+
+    # weight of the latest batch in the moving average
+    SMOOTHING = 0.5
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._seconds: Dict[Tuple[str, str, str], float] = {}
+
+    def add(self, key: Tuple[str, str, str], batch_info: Mapping[str, Any]
+            ) -> None:
+        """Record the processing time of a finished batch"""
+        records = int(batch_info.get('numberRecordsProcessed', 0))
+        processing_time = batch_info.get('totalProcessingTime')
+        if not records or processing_time is None:
+            return
+        seconds = int(processing_time) / 1000 / records
+        with self._lock:
+            average = self._seconds.get(key)
+            self._seconds[key] = seconds if average is None else \
+                average + self.SMOOTHING * (seconds - average)
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[float]:
+        """Average seconds per record, if a batch was recorded"""
+        with self._lock:
+            return self._seconds.get(key)
+
+
+_PROCESSING_TIMES = _ProcessingTimes()
+
+
+def _local_name(tag: str) -> str:
+    """Strip the namespace from an XML tag"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _parse_xml(element: ElementTree.Element) -> Any:
+    """Convert a job, batch info or result list XML element to the
+    structure returned for JSON jobs"""
+    tag = _local_name(element.tag)
+    children = list(element)
+    if tag == 'result-list':
+        return [i.text for i in children]
+    if tag == 'batchInfoList':
+        return {'batchInfo': [_parse_xml(i) for i in children]}
+    if not children:
+        return element.text
+    return OrderedDict((_local_name(i.tag), _parse_xml(i)) for i in children)
+
+
+def _is_csv(result: requests.Response) -> bool:
+    """Whether a response has CSV content"""
+    return 'csv' in result.headers.get('Content-Type', '')
+
+
+def _parse_response(result: requests.Response) -> Any:
+    """Decode job and batch info, which is returned as XML for CSV jobs"""
+    if 'xml' in result.headers.get('Content-Type', ''):
+        return _parse_xml(ElementTree.fromstring(result.content))
+    return result.json(object_pairs_hook=OrderedDict)
+
+
+def _save_result(row: Dict[str, str]) -> Dict[str, Any]:
+    """Convert a row of CSV batch results to the JSON result format"""
+    error = row.get('Error') or ''
+    status_code, _, message = error.partition(':')
+    return OrderedDict([
+        ('success', row.get('Success') == 'true'),
+        ('created', row.get('Created') == 'true'),
+        ('id', row.get('Id') or None),
+        ('errors', [OrderedDict([('statusCode', status_code),
+                                 ('message', message),
+                                 ('fields', [])])] if error else []),
+        ])
+
+
+def _parse_records(result: requests.Response,
+                   save_results: bool = False
+                   ) -> Iterable[Any]:
+    """Decode batch data, results or query results
+
+    CSV content is parsed lazily, row by row. Rows of DML results are
+    converted to the `success`, `created`, `id` and `errors` format of JSON
+    jobs when `save_results` is set.
+    """
+    if not _is_csv(result):
+        return cast(Iterable[Any], result.json())
+    rows = csv.DictReader(io.StringIO(result.content.decode('utf-8'),
+                                      newline=''))
+    if save_results:
+        return map(_save_result, rows)
+    return rows
+
+
+_JSON_WHITESPACE = re.compile(r'\s*')
+_JSON_SEPARATOR = re.compile(r'[\s,]*')
+_JSON_ENDS = frozenset(' \t\n\r,]')
+
+
+class _ResponseReader(io.RawIOBase):
+    """Raw file-like view of a streamed response body"""
+
+    def __init__(self, result: requests.Response):
+        super().__init__()
+        self._chunks = result.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+        self._pending = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = chunk
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def _iter_json_array(stream: TextIO) -> Iterator[Any]:
+    """Decode the items of a JSON array one by one, reading `stream` a
+    chunk at a time"""
+    scan = json.JSONDecoder().scan_once  # type: ignore[attr-defined]
+    buffer, pos = '', 0
+    opened = eof = False
+    while True:
+        pos = cast(Match[str], (_JSON_SEPARATOR if opened
+                                else _JSON_WHITESPACE).match(buffer, pos)
+                   ).end()
+        if pos < len(buffer):
+            if not opened:
+                if buffer[pos] != '[':
+                    raise ValueError('expected a JSON array')
+                opened = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                item, end = scan(buffer, pos)
+            except (StopIteration, ValueError):
+                # the item may go on in the next chunk
+                if eof:
+                    raise ValueError(f'invalid JSON item at {pos}') \
+                        from None
+            else:
+                # so may a number, unless it is followed by a separator
+                if eof or (end < len(buffer) and buffer[end] in _JSON_ENDS):
+                    yield item
+                    pos = end
+                    continue
+        if eof:
+            raise ValueError('unterminated JSON array')
+        chunk = stream.read(STREAM_CHUNK_SIZE)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+
+def _stream_records(result: requests.Response
+                    ) -> Generator[Any, None, None]:
+    """Decode the records of a streamed query result one by one, so only
+    a chunk of the response is held in memory"""
+    with closing(result):
+        text = io.TextIOWrapper(io.BufferedReader(_ResponseReader(result)),
+                                encoding='utf-8', newline='')
+        if _is_csv(result):
+            yield from csv.DictReader(text)
+        else:
+            yield from _iter_json_array(text)
+
+
+def _flatten(record: Mapping[str, Any]) -> Dict[str, Any]:
+    """Flatten relationship fields, e.g. `{'Account': {'Ext__c': '1'}}`,
+    to the `Account.Ext__c` columns of CSV batches"""
+    flat: Dict[str, Any] = OrderedDict()
+    for key, value in record.items():
+        if isinstance(value, dict):
+            for field, inner in value.items():
+                flat[f'{key}.{field}'] = inner
+        else:
+            flat[key] = value
+    return flat
+
+
+def _merge_results(results: Iterable[Iterable[Dict[str, Any]]],
+                   records: Iterable[Mapping[str, Any]]
+                   ) -> Iterator[Dict[str, Any]]:
+    """Merge batch results with the records they were sent for
+
+    Results come in the order of the batch, so both are zipped in a single
+    pass, and every merged row is produced as soon as it is consumed.
+    Relationship fields are flattened to `Account.Ext__c` keys.
+    """
+    for result, record in zip(itertools.chain.from_iterable(results),
+                              records):
+        result.update(_flatten(record))
+        yield result
+
+
+def _csv_value(value: Any) -> Any:
+    """Format a field value for a CSV batch"""
+    if value is None:
+        # sets the field to null, an empty cell leaves it unchanged
+        return '#N/A'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value
+
+
+class _Echo:
+    """File-like object whose `write` returns the text, so a `csv.writer`
+    returns each row as a string"""
+
+    @staticmethod
+    def write(text: str) -> str:
+        """Return the text"""
+        return text
+
+
+class _Batch(NamedTuple):
+    """Serialized batch"""
+    data: str
+    records: int
+
+
+class _BatchBuilder:
+    """ Serialize records into batches that respect the Bulk API limits
+
+    Every record is serialized once, into the batch being built, and a batch
+    is cut as soon as the next record would take it over `record_limit`
+    records or `char_limit` characters. The limits may be changed between
+    records.
+
+    CSV batches share the union of the columns seen so far. Rows written
+    before a column first appeared are padded with empty cells, which leave
+    fields unchanged.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self,
+                 content_type: str = 'JSON',
+                 record_limit: int = BATCH_RECORD_LIMIT,
+                 char_limit: int = BATCH_CHAR_LIMIT
+                 ):
+        """Initialize the instance with the given parameters.
+
+        Arguments:
+
+        * content_type -- `JSON` or `CSV`
+        * record_limit -- maximum number of records in a batch
+        * char_limit -- maximum size of a batch, in characters for JSON
+                        (which is ASCII) and in bytes for CSV
+        """
+        self.content_type = content_type
+        self.record_limit = record_limit
+        self.char_limit = char_limit
+        self.records = 0
+        self._parts: List[str] = []
+        self._chars = 0
+        # CSV state
+        # the line terminator is what makes values with line breaks quoted
+        self._writer = csv.writer(_Echo(), lineterminator='\n')
+        self._columns: Dict[str, int] = OrderedDict()
+        self._header = ''
+        self._widths: List[int] = []
+        self._cells = 0
+
+    def __len__(self) -> int:
+        """Number of records in the pending batch"""
+        return len(self._parts)
+
+    def _is_full(self, chars: int) -> bool:
+        """Whether the pending batch must be cut before adding a record"""
+        return bool(self._parts) and (len(self._parts) >= self.record_limit
+                                      or chars > self.char_limit)
+
+    def add(self, record: Mapping[str, Any]) -> Optional[_Batch]:
+        """Add a record, returning the batch it did not fit in, if any"""
+        if self.content_type == 'CSV':
+            return self._add_row(record)
+        part = json.dumps(record, allow_nan=False)
+        # enclosing `[]` and a `,` between records
+        chars = self._chars + len(part) + len(self._parts) + 2
+        batch = self.flush() if self._is_full(chars) else None
+        self._parts.append(part)
+        self._chars += len(part)
+        self.records += 1
+        return batch
+
+    def _add_row(self, record: Mapping[str, Any]) -> Optional[_Batch]:
+        """Add a record as a CSV row"""
+        flat = _flatten(record)
+        columns, header = self._columns, self._header
+        new = [i for i in flat if i not in columns]
+        if new:
+            columns = OrderedDict(columns)
+            for name in new:
+                columns[name] = len(columns)
+            header = self._writer.writerow(list(columns))[:-1]
+        cells = [''] * len(columns)
+        for name, value in flat.items():
+            cells[columns[name]] = _csv_value(value)
+        while len(cells) > 1 and cells[-1] == '':
+            cells.pop()
+        row = self._writer.writerow(cells)[:-1]
+        size = len(row) if row.isascii() else len(row.encode('utf-8'))
+        rows = len(self._parts) + 1
+        # line breaks, and the commas padding rows to the header width
+        chars = (len(header) + self._chars + size + rows + 1 +
+                 rows * len(columns) - self._cells - len(cells))
+        batch = self.flush() if self._is_full(chars) else None
+        self._columns, self._header = columns, header
+        self._parts.append(row)
+        self._widths.append(len(cells))
+        self._cells += len(cells)
+        self._chars += size
+        self.records += 1
+        return batch
+
+    def flush(self) -> Optional[_Batch]:
+        """Return the pending batch, if any, and start a new one"""
+        if not self._parts:
+            return None
+        if self.content_type == 'CSV':
+            width = len(self._columns)
+            data = ''.join(
+                [self._header, '\n'] +
+                [f'{row}{"," * (width - cells)}\n'
+                 for row, cells in zip(self._parts, self._widths)])
+        else:
+            data = f'[{",".join(self._parts)}]'
+        batch = _Batch(data, len(self._parts))
+        self._parts, self._widths = [], []
+        self._chars, self._cells = 0, 0
+        return batch
+
+    def build(self, records: Iterable[Mapping[str, Any]]
+              ) -> Iterator[_Batch]:
+        """Serialize records, yielding batches as they are cut"""
+        for record in records:
+            batch = self.add(record)
+            if batch:
+                yield batch
+        batch = self.flush()
+        if batch:
+            yield batch
+
+
+def _put_page(pages: 'queue.Queue[Any]', item: Any,
+              stop: threading.Event) -> None:
+    """Put `item` in `pages`, unless the consumer gave up on them while
+    the queue is full"""
+    while not stop.is_set():
+        try:
+            pages.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+
+def _in_thread(func: Callable[..., Any], *args: Any
+               ) -> 'concurrent.futures.Future[Any]':
+    """Run `func` in a new thread
+
+    For calls that wait on tasks of the executor, which would deadlock if
+    they took one of its workers.
+    """
+    future: 'concurrent.futures.Future[Any]' = concurrent.futures.Future()
+    future.set_running_or_notify_cancel()
+
+    def run() -> None:
+        try:
+            future.set_result(func(*args))
+        except BaseException as error:  # pylint: disable=broad-except
+            future.set_exception(error)
+
+    threading.Thread(target=bind_context(run), daemon=True).start()
+    return future
+
+
+class _BatchUploads:
+    """ Ids of the batches of a job, as their uploads are accepted
+
+    Shared between the thread uploading batches and the thread polling
+    them, so polling can start before every batch is uploaded.
+    """
+
+    def __init__(self, batch_ids: Iterable[str] = ()):
+        self._condition = threading.Condition()
+        self._new: List[str] = list(batch_ids)
+        self._order: Dict[int, str] = dict(enumerate(self._new))
+        self._done = False
+        self._error: Optional[BaseException] = None
+
+    def accepted(self, batch_id: str, index: Optional[int] = None) -> None:
+        """Record an uploaded batch, the `index`th one of the job"""
+        with self._condition:
+            self._new.append(batch_id)
+            if index is not None:
+                self._order[index] = batch_id
+            self._condition.notify_all()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """Record that no more batches will be uploaded"""
+        with self._condition:
+            if not self._done:
+                self._done, self._error = True, error
+            self._condition.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        """Sleep between polls, waking up early when the last upload is
+        done so the final batches are polled right away"""
+        with self._condition:
+            if not self._done:
+                self._condition.wait_for(lambda: self._done, timeout=seconds)
+                return
+        sleep(seconds)
+
+    def take(self, block: bool = False) -> List[str]:
+        """Return the batches accepted since the last call
+
+        With `block`, wait until there is a batch to return or every upload
+        is done, so an empty list means no batch will follow.
+        """
+        with self._condition:
+            if block:
+                self._condition.wait_for(lambda: self._new or self._done)
+            if self._error is not None:
+                raise self._error
+            new, self._new = self._new, []
+            return new
+
+    def batch(self, index: int) -> Optional[str]:
+        """Return the id of the `index`th batch of the job once it is
+        uploaded, or `None` if every upload is done without it"""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: index in self._order or self._done)
+            if index not in self._order and self._error is not None:
+                raise self._error
+            return self._order.get(index)
+
+
+class _FinishedBatches:
+    """ Infos of the batches of a job that reached a final state
+
+    Shared between the thread polling the batches and the one reading
+    their results.
+    """
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._infos: Dict[str, Dict[str, Any]] = {}
+        self._done = False
+        self._error: Optional[BaseException] = None
+
+    def add(self, batch_info: Dict[str, Any]) -> None:
+        """Record a finished batch"""
+        with self._condition:
+            self._infos[batch_info['id']] = batch_info
+            self._condition.notify_all()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """Record that polling is over"""
+        with self._condition:
+            if not self._done:
+                self._done, self._error = True, error
+            self._condition.notify_all()
+
+    def get(self, batch_id: str) -> Dict[str, Any]:
+        """Wait for a batch to finish and return its info"""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: batch_id in self._infos or self._done)
+            if batch_id not in self._infos and self._error is not None:
+                raise self._error
+            return self._infos[batch_id]
 
 
 class SFBulkHandler:
@@ -28,7 +617,9 @@ class SFBulkHandler:
             session_id: str,
             bulk_url: str,
             proxies: Optional[Proxies] = None,
-            session: Optional[requests.Session] = None
+            session: Optional[requests.Session] = None,
+            hooks: Optional[Hooks] = None,
+            executor: Optional[concurrent.futures.Executor] = None
             ):
         """Initialize the instance with the given parameters.
 
@@ -40,9 +631,14 @@ class SFBulkHandler:
         * session -- Custom requests session, created in calling code. This
                      enables the use of requests Session features not otherwise
                      exposed by simple_salesforce.
+        * hooks -- `Hooks` fired around every HTTP call
+        * executor -- runs the concurrent requests, the process wide
+                      `default_executor` if not given
         """
         self.session_id = session_id
         self.session = session or requests.Session()
+        self.hooks = hooks
+        self.executor = executor
         self.bulk_url = bulk_url
         # don't wipe out original proxies with None
         if not session and proxies is not None:
@@ -56,25 +652,53 @@ class SFBulkHandler:
             'X-PrettyPrint': '1'
             }
 
+    def resume_job(self, state: Mapping[str, Any]) -> 'BulkJob':
+        """ Recreate a `BulkJob` from the `to_dict` of a handle, e.g.
+        one submitted by another process """
+        return BulkJob(getattr(self, state['object']),
+                       job_id=state['job_id'],
+                       operation=state['operation'],
+                       batch_ids=state['batch_ids'],
+                       content_type=state.get('content_type', 'JSON'),
+                       include_detailed_results=state.get(
+                           'include_detailed_results', False),
+                       state=state.get('state', 'Closed')
+                       )
+
     def __getattr__(self,
                     name: str
                     ) -> "SFBulkType":
         return SFBulkType(object_name=name,
                           bulk_url=self.bulk_url,
                           headers=self.headers,
-                          session=self.session
+                          session=self.session,
+                          hooks=self.hooks,
+                          executor=self.executor
                           )
 
 
 class SFBulkType:
     """ Interface to Bulk/Async API functions"""
 
+    # polls without a finished batch stretch the interval up to this
+    MAX_CHECK_INTERVAL_SECONDS = 30.0
+    CHECK_INTERVAL_BACKOFF = 1.5
+    # `adaptive` batches aim at this processing time, well within the
+    # 10 minutes after which Salesforce requeues the rest of a batch
+    TARGET_BATCH_SECONDS = 120.0
+    # `adaptive` batch size until a batch of the object was processed,
+    # and the smallest one, the size of the chunks batches are run in
+    FIRST_ADAPTIVE_BATCH_RECORDS = 2_000
+    MIN_ADAPTIVE_BATCH_RECORDS = 200
+
     def __init__(
             self,
             object_name: str,
             bulk_url: str,
             headers: Headers,
-            session: requests.Session
+            session: requests.Session,
+            hooks: Optional[Hooks] = None,
+            executor: Optional[concurrent.futures.Executor] = None
             ):
         """Initialize the instance with the given parameters.
 
@@ -87,16 +711,32 @@ class SFBulkType:
         * session -- Custom requests session, created in calling code. This
                      enables the use of requests Session features not otherwise
                      exposed by simple_salesforce.
+        * hooks -- `Hooks` fired around every HTTP call
+        * executor -- runs the concurrent requests, the process wide
+                      `default_executor` if not given
         """
         self.object_name = object_name
         self.bulk_url = bulk_url
         self.session = session
         self.headers = headers
+        self.hooks = hooks
+        self.executor = executor
+
+    @property
+    def _executor(self) -> concurrent.futures.Executor:
+        """ Executor of the concurrent requests
+
+        Only requests are submitted to it, never tasks waiting on other
+        tasks, so a small shared pool cannot deadlock.
+        """
+        return self.executor or default_executor()
 
     def _create_job(self,
                     operation: str,
                     use_serial: bool,
-                    external_id_field: Optional[str] = None
+                    external_id_field: Optional[str] = None,
+                    content_type: str = 'JSON',
+                    pk_chunking: Union[bool, int, Mapping[str, Any]] = False
                     ) -> Any:
         """ Create a bulk job
 
@@ -105,13 +745,16 @@ class SFBulkType:
         * operation -- Bulk operation to be performed by job
         * use_serial -- Process batches in order
         * external_id_field -- unique identifier field for upsert operations
+        * content_type -- format of the batches, `JSON` or `CSV`
+        * pk_chunking -- split query jobs into batches by record id, see
+                         `_pk_chunking_header`
         """
 
         payload = {
             'operation': operation,
             'object': self.object_name,
             'concurrencyMode': 1 if use_serial else 0,
-            'contentType': 'JSON'
+            'contentType': content_type
             }
 
         if operation == 'upsert':
@@ -119,15 +762,29 @@ class SFBulkType:
 
         url = f'{self.bulk_url}job'
 
-        result = call_salesforce(url=url,
-                                 method='POST',
-                                 session=self.session,
-                                 headers=self.headers,
-                                 data=json.dumps(payload,
-                                                 allow_nan=False
-                                                 )
-                                 )
-        return result.json(object_pairs_hook=OrderedDict)
+        headers = self.headers
+        chunking = _pk_chunking_header(pk_chunking)
+        if chunking:
+            headers = dict(headers, **{'Sforce-Enable-PKChunking': chunking})
+
+        with span('bulk.create_job', {
+                'salesforce.object': self.object_name,
+                'salesforce.bulk.operation': operation,
+                'salesforce.bulk.pk_chunking': chunking,
+                }) as current:
+            result = call_salesforce(url=url,
+                                     method='POST',
+                                     session=self.session,
+                                     name='bulk.create_job',
+                                     hooks=self.hooks,
+                                     headers=headers,
+                                     data=json.dumps(payload,
+                                                     allow_nan=False
+                                                     )
+                                     )
+            job = _parse_response(result)
+            set_attributes(current, {'salesforce.bulk.job_id': job.get('id')})
+        return job
 
     def _close_job(self,
                    job_id: str
@@ -139,15 +796,42 @@ class SFBulkType:
 
         url = f'{self.bulk_url}job/{job_id}'
 
-        result = call_salesforce(url=url,
-                                 method='POST',
-                                 session=self.session,
-                                 headers=self.headers,
-                                 data=json.dumps(payload,
-                                                 allow_nan=False
-                                                 )
-                                 )
-        return result.json(object_pairs_hook=OrderedDict)
+        with span('bulk.close_job', {'salesforce.bulk.job_id': job_id}):
+            result = call_salesforce(url=url,
+                                     method='POST',
+                                     session=self.session,
+                                     name='bulk.close_job',
+                                     hooks=self.hooks,
+                                     headers=self.headers,
+                                     data=json.dumps(payload,
+                                                     allow_nan=False
+                                                     )
+                                     )
+        return _parse_response(result)
+
+    def _abort_job(self,
+                   job_id: str
+                   ) -> Any:
+        """ Abort a bulk job, batches that were not processed yet are
+        left `NotProcessed` """
+        payload = {
+            'state': 'Aborted'
+            }
+
+        url = f'{self.bulk_url}job/{job_id}'
+
+        with span('bulk.abort_job', {'salesforce.bulk.job_id': job_id}):
+            result = call_salesforce(url=url,
+                                     method='POST',
+                                     session=self.session,
+                                     name='bulk.abort_job',
+                                     hooks=self.hooks,
+                                     headers=self.headers,
+                                     data=json.dumps(payload,
+                                                     allow_nan=False
+                                                     )
+                                     )
+        return _parse_response(result)
 
     def _get_job(self,
                  job_id: str
@@ -158,38 +842,62 @@ class SFBulkType:
         result = call_salesforce(url=url,
                                  method='GET',
                                  session=self.session,
+                                 name='bulk.get_job',
+                                 hooks=self.hooks,
                                  headers=self.headers
                                  )
-        return result.json(object_pairs_hook=OrderedDict)
+        return _parse_response(result)
 
     def _add_batch(
             self,
             job_id: str,
-            data: BulkDataAny,
-            operation: str
+            data: Union[BulkDataAny, str, _Batch],
+            operation: str,
+            content_type: str = 'JSON'
             ) -> Any:
         """ Add a set of data as a batch to an existing job
-        Separating this out in case of later
-        implementations involving multiple batches
+
+        Arguments:
+
+        * job_id -- job to add the batch to
+        * data -- SOQL for query jobs, otherwise records or a batch
+                  serialized by `_BatchBuilder`
+        * operation -- Bulk operation of the job
+        * content_type -- `JSON` or `CSV`
         """
 
         url = f'{self.bulk_url}job/{job_id}/batch'
 
-        data_: Union[BulkDataAny, str]
-        if operation not in ('query', 'queryAll'):
-            data_ = json.dumps(data,
-                               allow_nan=False
-                               )
+        records: Optional[int] = None
+        if isinstance(data, _Batch):
+            data_, records = data
+        elif operation in ('query', 'queryAll'):
+            data_ = cast(str, data)
         else:
-            data_ = data
-
-        result = call_salesforce(url=url,
-                                 method='POST',
-                                 session=self.session,
-                                 headers=self.headers,
-                                 data=data_
-                                 )
-        return result.json(object_pairs_hook=OrderedDict)
+            data_, records = next(_BatchBuilder(
+                content_type, record_limit=sys.maxsize,
+                char_limit=sys.maxsize).build(cast(BulkDataAny, data)))
+
+        with span('bulk.add_batch', {
+                'salesforce.bulk.job_id': job_id,
+                'salesforce.bulk.records': records,
+                'salesforce.bulk.chars': len(data_),
+                }) as current:
+            result = call_salesforce(url=url,
+                                     method='POST',
+                                     session=self.session,
+                                     name='bulk.add_batch',
+                                     hooks=self.hooks,
+                                     headers=dict(
+                                         self.headers,
+                                         **{'Content-Type':
+                                            CONTENT_TYPES[content_type]}),
+                                     data=data_
+                                     )
+            batch = _parse_response(result)
+            set_attributes(current,
+                           {'salesforce.bulk.batch_id': batch.get('id')})
+        return batch
 
     def _get_batch(self,
                    job_id: str,
@@ -202,74 +910,317 @@ class SFBulkType:
         result = call_salesforce(url=url,
                                  method='GET',
                                  session=self.session,
+                                 name='bulk.get_batch',
+                                 hooks=self.hooks,
                                  headers=self.headers
                                  )
-        return result.json(object_pairs_hook=OrderedDict)
-
-    def _get_batch_results(
-            self,
-            job_id: str,
-            batch_id: str,
-            operation: str
-            ) -> Iterable[Any]:
-        """ retrieve a set of results from a completed job """
+        return _parse_response(result)
+
+    def _wait_for_batch(self,
+                        batch: Dict[str, Any],
+                        operation: str,
+                        wait: int = 5
+                        ) -> Any:
+        """ Poll a batch until it reaches a final state """
+        with span('bulk.wait_for_batch', {
+                'salesforce.bulk.job_id': batch['jobId'],
+                'salesforce.bulk.batch_id': batch['id'],
+                }) as current:
+            batch_info = self._get_batch(job_id=batch['jobId'],
+                                         batch_id=batch['id']
+                                         )
+            polls = 1
+            while batch_info['state'] not in FINAL_BATCH_STATES:
+                sleep(wait)
+                batch_info = self._get_batch(job_id=batch['jobId'],
+                                             batch_id=batch['id']
+                                             )
+                polls += 1
+            set_attributes(current, {
+                'salesforce.bulk.polls': polls,
+                'salesforce.bulk.state': batch_info['state'],
+                'salesforce.bulk.records_processed':
+                    batch_info.get('numberRecordsProcessed'),
+                'salesforce.bulk.records_failed':
+                    batch_info.get('numberRecordsFailed'),
+                'salesforce.bulk.total_processing_time_ms':
+                    batch_info.get('totalProcessingTime'),
+                'salesforce.bulk.api_active_processing_time_ms':
+                    batch_info.get('apiActiveProcessingTime'),
+                'salesforce.bulk.apex_processing_time_ms':
+                    batch_info.get('apexProcessingTime'),
+                })
+        self._batch_finished(batch_info, operation)
+        return batch_info
+
+    def _get_batches(self,
+                     job_id: str
+                     ) -> List[Any]:
+        """ Get the info of every batch of a job """
 
-        url = f'{self.bulk_url}job/{job_id}/batch/{batch_id}/result'
+        url = f'{self.bulk_url}job/{job_id}/batch'
 
         result = call_salesforce(url=url,
                                  method='GET',
                                  session=self.session,
+                                 name='bulk.get_batches',
+                                 hooks=self.hooks,
                                  headers=self.headers
                                  )
+        return list(_parse_response(result)['batchInfo'])
+
+    def _wait_for_batches(
+            self,
+            job_id: str,
+            batch_ids: Union[Iterable[str], _BatchUploads],
+            operation: str,
+            wait: float = 5,
+            on_finished: Optional[Callable[[Dict[str, Any]], None]] = None,
+            discover: bool = False,
+            stop: Optional[threading.Event] = None
+            ) -> Dict[str, Any]:
+        """ Poll the batches of a job until they all reach a final state
+
+        Each poll lists every batch of the job in a single request. The
+        interval between polls starts at `wait` and grows while no batch
+        finishes, up to `MAX_CHECK_INTERVAL_SECONDS`.
+
+        Arguments:
+
+        * job_id -- job of the batches
+        * batch_ids -- batches to wait for, or the `_BatchUploads` of
+                       batches that are still being uploaded
+        * operation -- Bulk operation of the job
+        * wait -- seconds between the first polls
+        * on_finished -- called with the info of each batch as soon as it
+                         reaches a final state
+        * discover -- also wait for the batches Salesforce adds to the job,
+                      such as the chunks of a PK chunking query
+        * stop -- once set, polling ends with the batches finished so far
+        """
+        uploads = batch_ids if isinstance(batch_ids, _BatchUploads) \
+            else _BatchUploads(batch_ids)
+        if not isinstance(batch_ids, _BatchUploads):
+            uploads.finish()
+        pending: Set[str] = set()
+        finished: Dict[str, Any] = OrderedDict()
+        polls, idle = 0, 0
+        with span('bulk.wait_for_batches', {
+                'salesforce.bulk.job_id': job_id,
+                }) as current:
+            while stop is None or not stop.is_set():
+                pending.update(uploads.take(block=not pending))
+                if not pending:
+                    break
+                if polls:
+                    uploads.pause(
+                        min(wait * self.CHECK_INTERVAL_BACKOFF ** idle,
+                            max(wait, self.MAX_CHECK_INTERVAL_SECONDS)))
+                    idle += 1
+                    pending.update(uploads.take())
+                    if stop is not None and stop.is_set():
+                        break
+                polls += 1
+                for batch_info in self._get_batches(job_id):
+                    if discover and batch_info['id'] not in finished:
+                        pending.add(batch_info['id'])
+                    if batch_info['id'] not in pending or \
+                            batch_info['state'] not in FINAL_BATCH_STATES:
+                        continue
+                    idle = 0
+                    pending.discard(batch_info['id'])
+                    finished[batch_info['id']] = batch_info
+                    add_event(current, 'bulk.batch_finished', {
+                        'salesforce.bulk.batch_id': batch_info['id'],
+                        'salesforce.bulk.state': batch_info['state'],
+                        'salesforce.bulk.records_processed':
+                            batch_info.get('numberRecordsProcessed'),
+                        'salesforce.bulk.records_failed':
+                            batch_info.get('numberRecordsFailed'),
+                        'salesforce.bulk.total_processing_time_ms':
+                            batch_info.get('totalProcessingTime'),
+                        })
+                    self._batch_finished(batch_info, operation)
+                    if on_finished:
+                        on_finished(batch_info)
+            set_attributes(current, {
+                'salesforce.bulk.polls': polls,
+                'salesforce.bulk.batches': len(finished),
+                })
+        return finished
+
+    def _batch_finished(self,
+                        batch_info: Dict[str, Any],
+                        operation: str
+                        ) -> None:
+        """ Notify the bulk event hooks that a batch reached a final state,
+        and record its processing time for `adaptive` batch sizes """
+        _PROCESSING_TIMES.add((self.bulk_url, self.object_name, operation),
+                              batch_info)
+        if not self.hooks:
+            return
+        processing_time = batch_info.get('totalProcessingTime')
+        self.hooks.fire_bulk_event(BulkEvent(
+            api='bulk',
+            object_name=self.object_name,
+            operation=operation,
+            job_id=batch_info['jobId'],
+            batch_id=batch_info['id'],
+            state=batch_info['state'],
+            records_processed=int(batch_info.get('numberRecordsProcessed', 0)),
+            records_failed=int(batch_info.get('numberRecordsFailed', 0)),
+            processing_time=None if processing_time is None
+            else int(processing_time) / 1000
+            ))
+
+    def _adaptive_record_limit(self, operation: str) -> int:
+        """ Number of records that should take `TARGET_BATCH_SECONDS` to
+        process, from the recent batches of the object and operation """
+        seconds = _PROCESSING_TIMES.get(
+            (self.bulk_url, self.object_name, operation))
+        if seconds is None:
+            return self.FIRST_ADAPTIVE_BATCH_RECORDS
+        if not seconds:
+            return BATCH_RECORD_LIMIT
+        return max(self.MIN_ADAPTIVE_BATCH_RECORDS,
+                   min(BATCH_RECORD_LIMIT,
+                       int(self.TARGET_BATCH_SECONDS / seconds)))
+
+    def _get_batch_results(
+            self,
+            job_id: str,
+            batch_id: str,
+            operation: str,
+            concurrency: int = 4
+            ) -> Iterable[Any]:
+        """ retrieve a set of results from a completed job
+
+        Query results are yielded in pages of up to `RESULT_PAGE_RECORDS`
+        records, see `_stream_query_results`.
+        """
 
         if operation in ('query', 'queryAll'):
-            for batch_result in result.json():
-                url_query_results = f'{url}/{batch_result}'
-                batch_query_result = call_salesforce(url=url_query_results,
-                                                     method='GET',
-                                                     session=self.session,
-                                                     headers=self.headers
-                                                     ).json()
-                yield batch_query_result
+            yield from self._stream_query_results(
+                self._get_result_urls(job_id, batch_id), concurrency)
+        else:
+            yield _parse_records(self._get_result_list(job_id, batch_id),
+                                 save_results=True)
+
+    def _get_result_list(self, job_id: str, batch_id: str) -> Any:
+        """ Get the results of a DML batch, or the result set ids of a
+        query batch """
+        return call_salesforce(
+            url=f'{self.bulk_url}job/{job_id}/batch/{batch_id}/result',
+            method='GET',
+            session=self.session,
+            name='bulk.get_batch_results',
+            hooks=self.hooks,
+            headers=self.headers
+            )
+
+    def _get_result_urls(self, job_id: str, batch_id: str) -> List[str]:
+        """ Urls of the result sets of a completed query batch """
+        url = f'{self.bulk_url}job/{job_id}/batch/{batch_id}/result'
+        return [f'{url}/{i}' for i in _parse_response(
+            self._get_result_list(job_id, batch_id))]
+
+    def _download_result(self,
+                         url: str,
+                         pages: 'queue.Queue[Any]',
+                         stop: threading.Event
+                         ) -> None:
+        """ Stream a query result set into `pages`, a page of records at a
+        time, followed by `None`, or by the error that stopped it. The
+        download stops as soon as the consumer gives up on the pages. """
+
+        def put(item: Any) -> None:
+            _put_page(pages, item, stop)
+
+        try:
+            records = _stream_records(call_salesforce(
+                url=url,
+                method='GET',
+                session=self.session,
+                name='bulk.get_batch_result',
+                hooks=self.hooks,
+                headers=self.headers,
+                stream=True
+                ))
+            with closing(records):
+                for page in iter(lambda: list(itertools.islice(
+                        records, RESULT_PAGE_RECORDS)), []):
+                    put(page)
+                    if stop.is_set():
+                        # release the connection rather than reading on
+                        return
+        except BaseException as error:  # pylint: disable=broad-except
+            put(error)
         else:
-            yield result.json()
+            put(None)
+
+    def _stream_query_results(self,
+                              urls: List[str],
+                              concurrency: int = 4
+                              ) -> Iterator[List[Any]]:
+        """ Yield the records of query result sets in order, a page at a
+        time
+
+        Up to `concurrency` result sets are downloaded and parsed at once,
+        as streams, each in a thread of its own rather than by the
+        executor, as a download waits on this generator whenever its queue
+        is full. Each one queues at most `RESULT_QUEUE_PAGES` pages until it
+        is its turn to be yielded, which bounds memory use whatever the size
+        of the result sets. A download only starts once the one
+        `concurrency` places before it is consumed.
+
+        Arguments:
+
+        * urls -- urls of the result sets
+        * concurrency -- number of result sets to download at once
+        """
+        stop = threading.Event()
+        queues: List['queue.Queue[Any]'] = [
+            queue.Queue(RESULT_QUEUE_PAGES) for _ in urls]
+
+        def start(index: int) -> None:
+            if index < len(urls):
+                _in_thread(self._download_result, urls[index], queues[index],
+                           stop)
+
+        for index in range(concurrency):
+            start(index)
+        try:
+            for index, pages in enumerate(queues):
+                for page in iter(pages.get, None):
+                    if isinstance(page, BaseException):
+                        raise page
+                    yield page
+                start(index + concurrency)
+        finally:
+            stop.set()
 
     def _get_batch_request_with_batch_results(self,
                                               job_id: str,
                                               batch_id: str,
                                               ) -> Iterable[Any]:
-        """ retrieve a set of results from a completed job """
+        """ retrieve the results of a completed batch, each one merged with
+        the fields of the record it was sent for, see `_merge_results` """
 
         url = f'{self.bulk_url}job/{job_id}/batch/{batch_id}/request'
 
         batch_request = call_salesforce(url=url,
                                         method='GET',
                                         session=self.session,
+                                        name='bulk.get_batch_request',
+                                        hooks=self.hooks,
                                         headers=self.headers
                                         )
 
-        batch_result = self._get_batch_results(job_id,
-                                               batch_id,
-                                               operation='batch_results'
-                                               )
-
-        results = []
-        for idx, i in enumerate(batch_result):
-            flattened_request_dict = [{
-                                          k + '.' + list(v.keys())[0]: v.get(
-                                              list(v.keys())[0]
-                                              )
-                                          } if isinstance(v,
-                                                          dict
-                                                          ) else {
-                k: v
-                }
-                                      for k, v in
-                                      batch_request.json()[idx].items()]
-            for request_field in flattened_request_dict:
-                i.update(request_field)
-            results.append(i)
-        yield results
+        batch_results = list(self._get_batch_results(job_id,
+                                                     batch_id,
+                                                     operation='batch_results'
+                                                     ))
+        yield _merge_results(batch_results, _parse_records(batch_request))
 
     def worker(self,
                batch: Dict[str, Any],
@@ -278,32 +1229,14 @@ class SFBulkType:
                bypass_results: bool = False,
                include_detailed_results: bool = False
                ) -> Iterable[Any]:
-        """ Gets batches from concurrent worker threads.
-        self._bulk_operation passes batch jobs.
-        The worker function checks each batch job waiting for it complete
-        and appends the results.
+        """ Wait for a single batch to complete and get its results.
+        self._bulk_operation polls all the batches of a job at once
+        instead, and only uses this to pass through `bypass_results`.
         """
         if not bypass_results:
-            batch_status = self._get_batch(job_id=batch['jobId'],
-                                           batch_id=batch['id']
-                                           )['state']
-
-            while batch_status not in ['Completed', 'Failed', 'NotProcessed']:
-                sleep(wait)
-                batch_status = self._get_batch(job_id=batch['jobId'],
-                                               batch_id=batch['id']
-                                               )['state']
-
-            if include_detailed_results:
-                result = self._get_batch_request_with_batch_results(
-                    job_id=batch['jobId'],
-                    batch_id=batch['id']
-                    )
-            else:
-                result = self._get_batch_results(job_id=batch['jobId'],
-                                                 batch_id=batch['id'],
-                                                 operation=operation
-                                                 )
+            self._wait_for_batch(batch, operation, wait)
+            result = self._fetch_results(batch, operation,
+                                         include_detailed_results)
         else:
             result = [{
                 'bypass_results': bypass_results,
@@ -311,14 +1244,227 @@ class SFBulkType:
                 }]
         return result
 
-    def _add_autosized_batches(
+    def _fetch_results(self,
+                       batch: Dict[str, Any],
+                       operation: str,
+                       include_detailed_results: bool = False
+                       ) -> List[Any]:
+        """ Download the results of a finished batch """
+        if include_detailed_results:
+            return list(self._get_batch_request_with_batch_results(
+                job_id=batch['jobId'],
+                batch_id=batch['id']
+                ))
+        return list(self._get_batch_results(job_id=batch['jobId'],
+                                            batch_id=batch['id'],
+                                            operation=operation
+                                            ))
+
+    @staticmethod
+    def _raise_for_state(batch_info: Dict[str, Any]) -> None:
+        """ Raise for a query batch that failed """
+        if batch_info['state'] == 'Failed':
+            raise SalesforceGeneralError('',
+                                         batch_info['state'],
+                                         batch_info['jobId'],
+                                         batch_info['stateMessage']
+                                         )
+
+    def _get_chunked_results(self,
+                             batch: Dict[str, Any],
+                             operation: str,
+                             wait: int = 5,
+                             concurrency: int = 4
+                             ) -> Iterator[Any]:
+        """ Yield the result sets of a PK chunking query job
+
+        Salesforce does not process the batch holding the query, it adds
+        one batch per chunk of record ids instead and marks the original
+        one `NotProcessed`. Those batches are discovered while polling the
+        job, in a thread of its own, and up to `concurrency` of their
+        result sets are downloaded at once, each in a thread of its own too,
+        as soon as they complete. Pages are yielded as they are downloaded,
+        so not in the order of the chunks. Polling and downloads stop once
+        the generator is closed.
+
+        Arguments:
+
+        * batch -- the batch holding the query
+        * operation -- `query` or `queryAll`
+        * wait -- seconds between the first polls
+        * concurrency -- number of result sets to download at once
+        """
+        # pages, the `None` ending each result set, errors, and at last the
+        # number of result sets once polling is over
+        pages: 'queue.Queue[Any]' = queue.Queue(
+            RESULT_QUEUE_PAGES * concurrency)
+        stop = threading.Event()
+        slots = threading.BoundedSemaphore(concurrency)
+        urls: List[str] = []
+
+        def download(url: str) -> None:
+            try:
+                self._download_result(url, pages, stop)
+            finally:
+                slots.release()
+
+        def fetch(batch_info: Dict[str, Any]) -> None:
+            self._raise_for_state(batch_info)
+            if batch_info['id'] == batch['id'] or stop.is_set():
+                return
+            for url in self._get_result_urls(batch_info['jobId'],
+                                             batch_info['id']):
+                slots.acquire()  # pylint: disable=consider-using-with
+                if stop.is_set():
+                    slots.release()
+                    return
+                urls.append(url)
+                _in_thread(download, url)
+
+        def poll() -> None:
+            try:
+                self._wait_for_batches(batch['jobId'], [batch['id']],
+                                       operation, wait, fetch, discover=True,
+                                       stop=stop)
+            except BaseException as error:  # pylint: disable=broad-except
+                _put_page(pages, error, stop)
+            else:
+                _put_page(pages, len(urls), stop)
+
+        threading.Thread(target=bind_context(poll), daemon=True).start()
+        result_sets: Optional[int] = None
+        downloaded = 0
+        try:
+            while result_sets is None or downloaded < result_sets:
+                page = pages.get()
+                if page is None:
+                    downloaded += 1
+                elif isinstance(page, BaseException):
+                    raise page
+                elif isinstance(page, int):
+                    result_sets = page
+                else:
+                    yield page
+        finally:
+            stop.set()
+
+    def _retry_locked(self,
+                      operation: str,
+                      data: Iterable[Mapping[str, Any]],
+                      lock_retries: int,
+                      failures_only: bool = False,
+                      **options: Any
+                      ) -> List[Any]:
+        """ Run a DML operation, then re-run the records that failed on
+        `RETRYABLE_ERRORS` in up to `lock_retries` follow-up jobs
+
+        Follow-up jobs run in serial mode, with the records of a parent
+        next to each other, see `_parent_key`, so their batches do not
+        contend for the same rows. The results of a retry replace the ones
+        of the earlier attempt, so results stay in the order of the
+        records. Every record is held in memory for the retries.
+
+        Arguments:
+
+        * operation -- Bulk operation to be performed by the jobs
+        * data -- records, in a list or any other iterable
+        * lock_retries -- maximum number of follow-up jobs
+        * failures_only -- only return the results of failed records
+        * options -- other arguments of `_bulk_operation`
+        """
+        records = list(_non_empty(data, operation))
+        results: List[Any] = list(
+            self._bulk_operation(operation, records, **options))
+        pending = [i for i, result in enumerate(results)
+                   if _is_retryable(result)]
+        options['use_serial'] = True
+        for _ in range(lock_retries):
+            if not pending:
+                break
+            pending.sort(key=lambda i: _parent_key(records[i]))
+            retried = self._bulk_operation(
+                operation, [records[i] for i in pending], **options)
+            for index, result in zip(pending, retried):
+                results[index] = result
+            pending = [i for i in pending if _is_retryable(results[i])]
+        if failures_only:
+            return [i for i in results if not i['success']]
+        return results
+
+    def _stream_results(self,
+                        job_id: str,
+                        uploads: _BatchUploads,
+                        operation: str,
+                        wait: int = 5,
+                        include_detailed_results: bool = False,
+                        failures_only: bool = False
+                        ) -> Iterator[Any]:
+        """ Yield the results of a DML job as its batches are processed
+
+        Batches are polled in a thread of their own while the generator
+        reads the results of one batch at a time, in the order of the
+        records, as soon as that batch is processed. So only one batch of
+        results is held in memory, however large the job.
+
+        Arguments:
+
+        * job_id -- the job, whose batches are uploaded by another thread
+        * uploads -- the batches uploaded so far
+        * operation -- Bulk operation of the job
+        * wait -- seconds between the first polls
+        * include_detailed_results -- merge the results with the records
+        * failures_only -- skip the results of successful records
+        """
+        finished = _FinishedBatches()
+
+        def poll() -> None:
+            try:
+                self._wait_for_batches(job_id, uploads, operation, wait,
+                                       on_finished=finished.add)
+            except BaseException as error:
+                finished.finish(error)
+                raise
+            finally:
+                finished.finish()
+
+        _in_thread(poll)
+        for index in itertools.count():
+            batch_id = uploads.batch(index)
+            if batch_id is None:
+                return
+            for rows in self._fetch_results(finished.get(batch_id),
+                                            operation,
+                                            include_detailed_results):
+                for row in rows:
+                    if not failures_only or not row['success']:
+                        yield row
+
+    # pylint: disable=R0913
+    def _add_batches(
             self,
-            data: BulkDataAny,
+            data: Iterable[Mapping[str, Any]],
             operation: str,
-            job: str
-            ) -> List[Any]:
+            job: str,
+            content_type: str = 'JSON',
+            record_limit: int = BATCH_RECORD_LIMIT,
+            concurrency: int = 1,
+            uploads: Optional[_BatchUploads] = None,
+            adaptive: bool = False
+            ) -> Tuple[List[Any], int]:
         """
-        Auto-create batches that respect bulk api V1 limits.
+        Stream records into batches that respect bulk api V1 limits, and
+        return the batch infos along with the number of records.
+
+        Up to `concurrency` batches are uploaded at once by the executor,
+        while this thread serializes the next one. Serialization
+        waits for a free upload slot, so at most `concurrency` batches are
+        held in memory, and no further batch is uploaded once an upload
+        failed. Accepted batches are recorded in `uploads`.
+
+        With `adaptive`, each batch holds the number of records that should
+        be processed in `TARGET_BATCH_SECONDS`, given the batches of the
+        object processed so far, by this job or earlier ones. It is still
+        capped by `record_limit`.
 
         bulk v1 api has following limits
         number of records <= 10000
@@ -334,12 +1480,11 @@ class SFBulkType:
         /salesforce_app_limits_platform_bulkapi.htm#ingest_jobs
 
         Our JSON serialization uses the default `ensure_ascii=True`, so the
-        character and byte lengths will be the same. Therefore we only need
-        to adhere to a single length limit of 10,000,000 characters.
+        character and byte lengths will be the same. CSV batches are measured
+        in bytes.
 
-        TODO: In future when simple-salesforce supports bulk api V2
-        we should detect api version and set max file size accordingly. V2
-        increases file size limit to 150MB
+        Each record is serialized once, and only the batch being built is
+        held in memory, so `data` may be a generator.
 
         TODO: support for the following limits have not been added since these
         are record / field level limits and not chunk level limits:
@@ -347,112 +1492,172 @@ class SFBulkType:
         * Maximum number of characters in a record: 400,000
         * Maximum number of characters in a field: 131,072
         """
-        record_limit = 10_000
-        char_limit = 10_000_000
-
-        batches = []
-        last_break = 0
-        record_count, char_count = 0, 0
-        for i, record in enumerate(data):
-            # 2 is added to account for the enclosing `[]` for the first record
-            # and the separator `, ` between records for subsequent records.
-            additional_chars = len(json.dumps(record,
-                                              default=str
-                                              )
-                                   ) + 2
-            if any([
-                char_count + additional_chars > char_limit,
-                record_count == record_limit
-                ]
-                    ):
-                batches.append(data[last_break:i])
-                last_break = i
-                record_count, char_count = 0, 0
-            char_count += additional_chars
-            record_count += 1
-        if last_break < len(data) - 1:
-            batches.append(data[last_break:])
-
-        return [self._add_batch(job_id=job,
-                                data=i,
-                                operation=operation
-                                ) for i in batches]
-
-    # pylint: disable=R0913,line-too-long
+        def limit() -> int:
+            if adaptive:
+                return min(record_limit, BATCH_RECORD_LIMIT,
+                           self._adaptive_record_limit(operation))
+            return min(record_limit, BATCH_RECORD_LIMIT)
+
+        builder = _BatchBuilder(content_type, record_limit=limit())
+        slots = threading.BoundedSemaphore(concurrency)
+        failed = threading.Event()
+
+        def upload(index: int, batch: _Batch) -> Any:
+            try:
+                batch_info = self._add_batch(job_id=job,
+                                             data=batch,
+                                             operation=operation,
+                                             content_type=content_type
+                                             )
+            except BaseException:
+                failed.set()
+                raise
+            finally:
+                slots.release()
+            if uploads is not None:
+                uploads.accepted(batch_info['id'], index)
+            return batch_info
+
+        futures = []
+        for index, batch in enumerate(builder.build(data)):
+            slots.acquire()  # pylint: disable=consider-using-with
+            if failed.is_set():
+                break
+            futures.append(self._executor.submit(bind_context(upload), index,
+                                                 batch))
+            builder.record_limit = limit()
+        concurrent.futures.wait(futures)
+        return [i.result() for i in futures], builder.records
+
+    # pylint: disable=R0913,R0914,line-too-long
     def _bulk_operation(
             self,
             operation: str,
-            data: BulkDataAny,
+            data: Union[Iterable[Mapping[str, Any]], str],
             use_serial: bool = False,
             external_id_field: Optional[str] = None,
             batch_size: Union[int, str] = 10000,
             wait: int = 5,
             bypass_results: bool = False,
-            include_detailed_results: bool = False
+            include_detailed_results: bool = False,
+            content_type: str = 'JSON',
+            concurrency: int = 4,
+            pk_chunking: Union[bool, int, Mapping[str, Any]] = False,
+            lazy_operation: bool = False,
+            failures_only: bool = False,
+            lock_retries: int = 0
             ) -> Iterable[Iterable[Any]]:
         """ String together helper functions to create a complete
         end-to-end bulk API request
         Arguments:
         * operation -- Bulk operation to be performed by job
-        * data -- list of dict to be passed as a batch
+        * data -- records, in a list or any other iterable, or the SOQL of
+                  query operations
         * use_serial -- Process batches in serial mode
         * external_id_field -- unique identifier field for upsert operations
         * wait -- seconds to sleep between checking batch status
-        * batch_size -- number of records to assign for each batch in the job
-                        or `auto`
+        * batch_size -- number of records to assign for each batch in the job,
+                        `auto` or `adaptive`
+        * content_type -- format of the batches and results, `JSON` or `CSV`
+        * concurrency -- number of batches to upload at once, batches of
+                         serial jobs are uploaded one by one to keep their
+                         order. For queries, the number of result sets,
+                         or PK chunks, to download at once
+        * pk_chunking -- split query jobs into batches by record id, see
+                         `_pk_chunking_header`
+        * lazy_operation -- return a generator of the results of DML jobs,
+                            see `_stream_results`
+        * failures_only -- only return the results of failed records
+        * lock_retries -- number of follow-up jobs for the records that
+                          failed on row locks, see `_retry_locked`
         """
-        # check for batch size type since now it accepts both integers
-        # & the string `auto`
-        if not (isinstance(batch_size,
-                           int
-                           ) or batch_size == 'auto'):
-            raise ValueError('batch size should be auto or an integer')
+        _check_options(batch_size, content_type)
+        if lock_retries and operation not in ('query', 'queryAll'):
+            if lazy_operation or bypass_results:
+                raise ValueError('lock_retries needs the results of every '
+                                 'record, not lazy_operation or '
+                                 'bypass_results')
+            return self._retry_locked(
+                operation, cast(Iterable[Mapping[str, Any]], data),
+                lock_retries, failures_only,
+                use_serial=use_serial,
+                external_id_field=external_id_field,
+                batch_size=batch_size,
+                wait=wait,
+                include_detailed_results=include_detailed_results,
+                content_type=content_type,
+                concurrency=concurrency
+                )
         results: Iterable[Iterable[Any]]
-        if operation not in ('query', 'queryAll'):
-            # Checks if data is present
-            if not data:
-                raise ValueError(f'data should not be empty for {operation}')
-
-            # Checks to prevent batch limit
-            if batch_size != 'auto':
-                batch_size = min(batch_size,
-                                 len(data),
-                                 10000
-                                 )
-
-            with concurrent.futures.ThreadPoolExecutor() as pool:
+        with span('bulk.operation', {
+                'salesforce.object': self.object_name,
+                'salesforce.bulk.operation': operation,
+                'salesforce.bulk.batch_size': str(batch_size),
+                }) as current:
+            if operation not in ('query', 'queryAll'):
+                records = _non_empty(
+                    cast(Iterable[Mapping[str, Any]], data), operation)
+                uploads = _BatchUploads()
+
+                def upload(job_id: str) -> Tuple[List[Any], int]:
+                    try:
+                        # `auto` batches are only cut at the API limits
+                        return self._add_batches(
+                            job=job_id,
+                            data=records,
+                            operation=operation,
+                            content_type=content_type,
+                            record_limit=BATCH_RECORD_LIMIT
+                            if batch_size in BATCH_SIZE_MODES
+                            else cast(int, batch_size),
+                            concurrency=1 if use_serial else concurrency,
+                            uploads=uploads,
+                            adaptive=batch_size == 'adaptive'
+                            )
+                    except BaseException as error:
+                        uploads.finish(error)
+                        raise
+                    finally:
+                        uploads.finish()
+                        if lazy_operation:
+                            self._close_job(job_id=job_id)
 
                 job = self._create_job(operation=operation,
                                        use_serial=use_serial,
-                                       external_id_field=external_id_field
+                                       external_id_field=external_id_field,
+                                       content_type=content_type
                                        )
-                if batch_size == 'auto':
-                    batches = self._add_autosized_batches(job=job['id'],
-                                                          data=data,
-                                                          operation=operation
-                                                          )
+                # the upload loop waits on the executor, so runs outside of it
+                uploading = _in_thread(upload, job['id'])
+
+                if lazy_operation and not bypass_results:
+                    return self._stream_results(job['id'], uploads,
+                                                operation, wait,
+                                                include_detailed_results,
+                                                failures_only)
+                if bypass_results:
+                    batches, count = uploading.result()
+                    list_of_results = [
+                        self.worker(i, operation, bypass_results=True)
+                        for i in batches]
                 else:
-                    batch_size = cast(int,
-                                      batch_size
-                                      )
-                    batches = [
-                        self._add_batch(job_id=job['id'],
-                                        data=i,
-                                        operation=operation
-                                        )
-                        for i in
-                        [data[i * batch_size:(i + 1) * batch_size]
-                         for i in range(len(data) // batch_size + 1)] if i]
-
-                multi_thread_worker = partial(self.worker,
-                                              operation=operation,
-                                              wait=wait,
-                                              bypass_results=bypass_results,
-                                              include_detailed_results=include_detailed_results
-                                              )
-                list_of_results = pool.map(multi_thread_worker,
-                                           batches
-                                           )
+                    # poll batches while later ones are still uploading,
+                    # and download results as soon as each one finishes
+                    futures = {}
+
+                    def fetch(batch_info: Dict[str, Any]) -> None:
+                        futures[batch_info['id']] = self._executor.submit(
+                            bind_context(self._fetch_results),
+                            batch_info, operation,
+                            include_detailed_results)
+
+                    self._wait_for_batches(job['id'], uploads,
+                                           operation, wait,
+                                           on_finished=fetch)
+                    batches, count = uploading.result()
+                    list_of_results = [futures[i['id']].result()
+                                       for i in batches]
+                set_attributes(current, {'salesforce.bulk.records': count})
 
                 results = [x for sublist in list_of_results for i in
                            sublist for x in i] if not bypass_results else \
@@ -460,60 +1665,192 @@ class SFBulkType:
                         k: v
                         } for sublist in list_of_results for i in
                         sublist for k, v in i.items()]
+                if failures_only and not bypass_results:
+                    results = [i for i in cast(List[Any], results)
+                               if not i['success']]
 
                 self._close_job(job_id=job['id'])
 
-        elif operation in ('query', 'queryAll'):
+            elif operation in ('query', 'queryAll'):
+                job = self._create_job(operation=operation,
+                                       use_serial=use_serial,
+                                       external_id_field=external_id_field,
+                                       content_type=content_type,
+                                       pk_chunking=pk_chunking
+                                       )
+
+                batch = self._add_batch(job_id=job['id'],
+                                        data=cast(str, data),
+                                        operation=operation,
+                                        content_type=content_type
+                                        )
+
+                self._close_job(job_id=job['id'])
+
+                if _pk_chunking_header(pk_chunking):
+                    results = self._get_chunked_results(batch, operation,
+                                                        wait, concurrency)
+                else:
+                    batch_status = self._wait_for_batch(batch, operation,
+                                                        wait)
+
+                    self._raise_for_state(batch_status)
+                    results = self._get_batch_results(job_id=batch['jobId'],
+                                                      batch_id=batch['id'],
+                                                      operation=operation,
+                                                      concurrency=concurrency
+                                                      )
+        return results
+
+    # pylint: disable=R0913
+    def submit(
+            self,
+            operation: str,
+            data: Iterable[Mapping[str, Any]],
+            external_id_field: Optional[str] = None,
+            batch_size: Union[int, str] = 10000,
+            use_serial: bool = False,
+            include_detailed_results: bool = False,
+            content_type: str = 'JSON',
+            concurrency: int = 4
+            ) -> 'BulkJob':
+        """ Create a job, upload its batches and close it, without
+        waiting for Salesforce to process them
+
+        Returns a `BulkJob` to poll, wait for, or get the results of later,
+        possibly from another process. Arguments are the ones of `insert`
+        and the other operations.
+
+        Arguments:
+
+        * operation -- `insert`, `update`, `upsert`, `delete` or
+                       `hardDelete`
+        * data -- records, in a list or any other iterable
+        * external_id_field -- unique identifier field for upsert operations
+        * batch_size -- number of records in each batch, `auto` or
+                        `adaptive`
+        * use_serial -- Process batches in serial mode
+        * include_detailed_results -- merge the results with the records
+        * content_type -- format of the batches and results, `JSON` or `CSV`
+        * concurrency -- number of batches to upload at once
+        """
+        _check_options(batch_size, content_type)
+        if operation in ('query', 'queryAll'):
+            raise ValueError('use query or query_all for query jobs')
+        records = _non_empty(data, operation)
+        with span('bulk.submit', {
+                'salesforce.object': self.object_name,
+                'salesforce.bulk.operation': operation,
+                'salesforce.bulk.batch_size': str(batch_size),
+                }) as current:
             job = self._create_job(operation=operation,
                                    use_serial=use_serial,
-                                   external_id_field=external_id_field
+                                   external_id_field=external_id_field,
+                                   content_type=content_type
                                    )
+            try:
+                batches, count = self._add_batches(
+                    job=job['id'],
+                    data=records,
+                    operation=operation,
+                    content_type=content_type,
+                    record_limit=BATCH_RECORD_LIMIT
+                    if batch_size in BATCH_SIZE_MODES
+                    else cast(int, batch_size),
+                    concurrency=1 if use_serial else concurrency,
+                    adaptive=batch_size == 'adaptive'
+                    )
+            finally:
+                self._close_job(job_id=job['id'])
+            set_attributes(current, {'salesforce.bulk.job_id': job['id'],
+                                     'salesforce.bulk.records': count})
+        return BulkJob(self,
+                       job_id=job['id'],
+                       operation=operation,
+                       batch_ids=[i['id'] for i in batches],
+                       content_type=content_type,
+                       include_detailed_results=include_detailed_results
+                       )
+
+    def writer(
+            self,
+            operation: str,
+            external_id_field: Optional[str] = None,
+            batch_size: Union[int, str] = 10000,
+            max_age: float = 60.0,
+            use_serial: bool = False,
+            include_detailed_results: bool = False,
+            content_type: str = 'JSON',
+            concurrency: int = 4,
+            wait: float = 5,
+            on_results: Optional[
+                Callable[[Dict[str, Any], List[Any]], None]] = None
+            ) -> 'BulkJobWriter':
+        """ Open a job that records are written to over time, see
+        `BulkJobWriter`
 
-            batch = self._add_batch(job_id=job['id'],
-                                    data=data,
-                                    operation=operation
-                                    )
-
-            self._close_job(job_id=job['id'])
-
-            batch_status = self._get_batch(job_id=batch['jobId'],
-                                           batch_id=batch['id']
-                                           )
+        Arguments:
 
-            while batch_status['state'] not in [
-                'Completed', 'Failed', 'NotProcessed'
-                ]:
-                sleep(wait)
-                batch_status = self._get_batch(job_id=batch['jobId'],
-                                               batch_id=batch['id']
-                                               )
-
-            if batch_status['state'] == 'Failed':
-                raise SalesforceGeneralError('',
-                                             batch_status['state'],
-                                             batch_status['jobId'],
-                                             batch_status['stateMessage']
-                                             )
-            results = self._get_batch_results(job_id=batch['jobId'],
-                                              batch_id=batch['id'],
-                                              operation=operation
-                                              )
-        return results
+        * operation -- `insert`, `update`, `upsert`, `delete` or
+                       `hardDelete`
+        * external_id_field -- unique identifier field for upsert operations
+        * batch_size -- number of records in each batch, `auto` or
+                        `adaptive`
+        * max_age -- seconds after which a batch is uploaded even if it is
+                     not full
+        * use_serial -- Process batches in serial mode
+        * include_detailed_results -- merge the results with the records
+        * content_type -- format of the batches and results, `JSON` or `CSV`
+        * concurrency -- number of batches to upload at once
+        * wait -- seconds between the first polls
+        * on_results -- called from the polling thread with the info and
+                        the results of each batch once it is processed
+        """
+        return BulkJobWriter(self,
+                             operation,
+                             external_id_field=external_id_field,
+                             batch_size=batch_size,
+                             max_age=max_age,
+                             use_serial=use_serial,
+                             include_detailed_results=include_detailed_results,
+                             content_type=content_type,
+                             concurrency=concurrency,
+                             wait=wait,
+                             on_results=on_results
+                             )
 
     # _bulk_operation wrappers to expose supported Salesforce bulk operations
     def delete(
             self,
-            data: BulkDataStr,
-            batch_size: int = 10000,
+            data: Iterable[Mapping[str, str]],
+            batch_size: Union[int, str] = 10000,
             use_serial: bool = False,
             bypass_results: bool = False,
-            include_detailed_results: bool = False
+            include_detailed_results: bool = False,
+            content_type: str = 'JSON',
+            concurrency: int = 4,
+            lazy_operation: bool = False,
+            failures_only: bool = False,
+            lock_retries: int = 0
             ) -> Iterable[Any]:
         """ soft delete records
 
         Data is batched by 10,000 records by default. To pick a lower size
         pass smaller integer to `batch_size`. to let simple-salesforce pick
-        the appropriate limit dynamically, enter `batch_size='auto'`
+        the appropriate limit dynamically, enter `batch_size='auto'`.
+        With `batch_size='adaptive'` batches are sized from the processing
+        times of earlier batches of the object, to be processed in about
+        `TARGET_BATCH_SECONDS`. Batches are also cut at 10,000,000
+        characters. `data` can be any
+        iterable, such as a generator, and is serialized batch by batch.
+        Up to `concurrency` batches are uploaded at once, except for
+        `use_serial` jobs.
+        Pass `content_type='CSV'` to send the batches as CSV.
+        With `lazy_operation` the results are yielded in the order of the
+        records, a batch at a time as soon as it is processed, and
+        `failures_only` skips the results of successful records.
+        Records that failed on row locks are sent again in up to
+        `lock_retries` follow-up jobs, in serial mode.
         """
         results = self._bulk_operation(use_serial=use_serial,
                                        operation='delete',
@@ -521,23 +1858,46 @@ class SFBulkType:
                                        batch_size=batch_size,
                                        bypass_results=bypass_results,
                                        include_detailed_results=
-                                       include_detailed_results
+                                       include_detailed_results,
+                                       content_type=content_type,
+                                       concurrency=concurrency,
+                                       lazy_operation=lazy_operation,
+                                       failures_only=failures_only,
+                                       lock_retries=lock_retries
                                        )
         return results
 
     def insert(
             self,
-            data: BulkDataAny,
-            batch_size: int = 10000,
+            data: Iterable[Mapping[str, Any]],
+            batch_size: Union[int, str] = 10000,
             use_serial: bool = False,
             bypass_results: bool = False,
-            include_detailed_results: bool = False
+            include_detailed_results: bool = False,
+            content_type: str = 'JSON',
+            concurrency: int = 4,
+            lazy_operation: bool = False,
+            failures_only: bool = False,
+            lock_retries: int = 0
             ) -> Iterable[Any]:
         """ insert records
 
         Data is batched by 10,000 records by default. To pick a lower size
         pass smaller integer to `batch_size`. to let simple-salesforce pick
-        the appropriate limit dynamically, enter `batch_size='auto'`
+        the appropriate limit dynamically, enter `batch_size='auto'`.
+        With `batch_size='adaptive'` batches are sized from the processing
+        times of earlier batches of the object, to be processed in about
+        `TARGET_BATCH_SECONDS`. Batches are also cut at 10,000,000
+        characters. `data` can be any
+        iterable, such as a generator, and is serialized batch by batch.
+        Up to `concurrency` batches are uploaded at once, except for
+        `use_serial` jobs.
+        Pass `content_type='CSV'` to send the batches as CSV.
+        With `lazy_operation` the results are yielded in the order of the
+        records, a batch at a time as soon as it is processed, and
+        `failures_only` skips the results of successful records.
+        Records that failed on row locks are sent again in up to
+        `lock_retries` follow-up jobs, in serial mode.
         """
         results = self._bulk_operation(use_serial=use_serial,
                                        operation='insert',
@@ -545,24 +1905,47 @@ class SFBulkType:
                                        batch_size=batch_size,
                                        bypass_results=bypass_results,
                                        include_detailed_results=
-                                       include_detailed_results
+                                       include_detailed_results,
+                                       content_type=content_type,
+                                       concurrency=concurrency,
+                                       lazy_operation=lazy_operation,
+                                       failures_only=failures_only,
+                                       lock_retries=lock_retries
                                        )
         return results
 
     def upsert(
             self,
-            data: BulkDataAny,
+            data: Iterable[Mapping[str, Any]],
             external_id_field: str,
-            batch_size: int = 10000,
+            batch_size: Union[int, str] = 10000,
             use_serial: bool = False,
             bypass_results: bool = False,
-            include_detailed_results: bool = False
+            include_detailed_results: bool = False,
+            content_type: str = 'JSON',
+            concurrency: int = 4,
+            lazy_operation: bool = False,
+            failures_only: bool = False,
+            lock_retries: int = 0
             ) -> Iterable[Any]:
         """ upsert records based on a unique identifier
 
         Data is batched by 10,000 records by default. To pick a lower size
         pass smaller integer to `batch_size`. to let simple-salesforce pick
-        the appropriate limit dynamically, enter `batch_size='auto'`
+        the appropriate limit dynamically, enter `batch_size='auto'`.
+        With `batch_size='adaptive'` batches are sized from the processing
+        times of earlier batches of the object, to be processed in about
+        `TARGET_BATCH_SECONDS`. Batches are also cut at 10,000,000
+        characters. `data` can be any
+        iterable, such as a generator, and is serialized batch by batch.
+        Up to `concurrency` batches are uploaded at once, except for
+        `use_serial` jobs.
+        Pass `content_type='CSV'` to send the batches as CSV.
+        With `lazy_operation` the results are yielded in the order of the
+        records, a batch at a time as soon as it is processed, and
+        `failures_only` skips the results of successful records.
+        Records that failed on row locks are sent again in up to
+        `lock_retries` follow-up jobs, in serial mode.
         """
         results = self._bulk_operation(use_serial=use_serial,
                                        operation='upsert',
@@ -571,23 +1954,46 @@ class SFBulkType:
                                        batch_size=batch_size,
                                        bypass_results=bypass_results,
                                        include_detailed_results=
-                                       include_detailed_results
+                                       include_detailed_results,
+                                       content_type=content_type,
+                                       concurrency=concurrency,
+                                       lazy_operation=lazy_operation,
+                                       failures_only=failures_only,
+                                       lock_retries=lock_retries
                                        )
         return results
 
     def update(
             self,
-            data: BulkDataAny,
-            batch_size: int = 10000,
+            data: Iterable[Mapping[str, Any]],
+            batch_size: Union[int, str] = 10000,
             use_serial: bool = False,
             bypass_results: bool = False,
-            include_detailed_results: bool = False
+            include_detailed_results: bool = False,
+            content_type: str = 'JSON',
+            concurrency: int = 4,
+            lazy_operation: bool = False,
+            failures_only: bool = False,
+            lock_retries: int = 0
             ) -> Iterable[Any]:
         """ update records
 
         Data is batched by 10,000 records by default. To pick a lower size
         pass smaller integer to `batch_size`. to let simple-salesforce pick
-        the appropriate limit dynamically, enter `batch_size='auto'`
+        the appropriate limit dynamically, enter `batch_size='auto'`.
+        With `batch_size='adaptive'` batches are sized from the processing
+        times of earlier batches of the object, to be processed in about
+        `TARGET_BATCH_SECONDS`. Batches are also cut at 10,000,000
+        characters. `data` can be any
+        iterable, such as a generator, and is serialized batch by batch.
+        Up to `concurrency` batches are uploaded at once, except for
+        `use_serial` jobs.
+        Pass `content_type='CSV'` to send the batches as CSV.
+        With `lazy_operation` the results are yielded in the order of the
+        records, a batch at a time as soon as it is processed, and
+        `failures_only` skips the results of successful records.
+        Records that failed on row locks are sent again in up to
+        `lock_retries` follow-up jobs, in serial mode.
         """
         results = self._bulk_operation(use_serial=use_serial,
                                        operation='update',
@@ -595,23 +2001,46 @@ class SFBulkType:
                                        batch_size=batch_size,
                                        bypass_results=bypass_results,
                                        include_detailed_results=
-                                       include_detailed_results
+                                       include_detailed_results,
+                                       content_type=content_type,
+                                       concurrency=concurrency,
+                                       lazy_operation=lazy_operation,
+                                       failures_only=failures_only,
+                                       lock_retries=lock_retries
                                        )
         return results
 
     def hard_delete(
             self,
-            data: BulkDataStr,
-            batch_size: int = 10000,
+            data: Iterable[Mapping[str, str]],
+            batch_size: Union[int, str] = 10000,
             use_serial: bool = False,
             bypass_results: bool = False,
-            include_detailed_results: bool = False
+            include_detailed_results: bool = False,
+            content_type: str = 'JSON',
+            concurrency: int = 4,
+            lazy_operation: bool = False,
+            failures_only: bool = False,
+            lock_retries: int = 0
             ) -> Iterable[Any]:
         """ hard delete records
 
         Data is batched by 10,000 records by default. To pick a lower size
         pass smaller integer to `batch_size`. to let simple-salesforce pick
-        the appropriate limit dynamically, enter `batch_size='auto'`
+        the appropriate limit dynamically, enter `batch_size='auto'`.
+        With `batch_size='adaptive'` batches are sized from the processing
+        times of earlier batches of the object, to be processed in about
+        `TARGET_BATCH_SECONDS`. Batches are also cut at 10,000,000
+        characters. `data` can be any
+        iterable, such as a generator, and is serialized batch by batch.
+        Up to `concurrency` batches are uploaded at once, except for
+        `use_serial` jobs.
+        Pass `content_type='CSV'` to send the batches as CSV.
+        With `lazy_operation` the results are yielded in the order of the
+        records, a batch at a time as soon as it is processed, and
+        `failures_only` skips the results of successful records.
+        Records that failed on row locks are sent again in up to
+        `lock_retries` follow-up jobs, in serial mode.
         """
         results = self._bulk_operation(use_serial=use_serial,
                                        operation='hardDelete',
@@ -619,7 +2048,12 @@ class SFBulkType:
                                        batch_size=batch_size,
                                        bypass_results=bypass_results,
                                        include_detailed_results=
-                                       include_detailed_results
+                                       include_detailed_results,
+                                       content_type=content_type,
+                                       concurrency=concurrency,
+                                       lazy_operation=lazy_operation,
+                                       failures_only=failures_only,
+                                       lock_retries=lock_retries
                                        )
         return results
 
@@ -627,12 +2061,34 @@ class SFBulkType:
             self,
             data: BulkDataStr,
             lazy_operation: bool = False,
-            wait: int = 5
+            wait: int = 5,
+            content_type: str = 'JSON',
+            pk_chunking: Union[bool, int, Mapping[str, Any]] = False,
+            concurrency: int = 4
             ) -> Iterable[Any]:
-        """ bulk query """
+        """ bulk query
+
+        Result sets are streamed, up to `concurrency` at once, and with
+        `lazy_operation` the records are yielded in lists of up to
+        `RESULT_PAGE_RECORDS`, so large results are never held in memory
+        as a whole.
+
+        With `content_type='CSV'` the results are downloaded as CSV and
+        every record is a dict of strings, with relationship fields in
+        columns such as `Account.Name`.
+
+        For very large objects pass `pk_chunking=True`, a chunk size, or a
+        dict of PK chunking options such as `{'chunkSize': 250000,
+        'parent': 'Account'}`. Salesforce then splits the query by record
+        id, and up to `concurrency` chunks are downloaded at once, in the
+        order they complete.
+        """
         results = self._bulk_operation(operation='query',
                                        data=data,
-                                       wait=wait
+                                       wait=wait,
+                                       content_type=content_type,
+                                       pk_chunking=pk_chunking,
+                                       concurrency=concurrency
                                        )
 
         if lazy_operation:
@@ -644,14 +2100,424 @@ class SFBulkType:
             self,
             data: BulkDataStr,
             lazy_operation: bool = False,
-            wait: int = 5
+            wait: int = 5,
+            content_type: str = 'JSON',
+            pk_chunking: Union[bool, int, Mapping[str, Any]] = False,
+            concurrency: int = 4
             ) -> Iterable[Any]:
-        """ bulk queryAll """
+        """ bulk queryAll
+
+        See `query` for streaming, `content_type='CSV'` and `pk_chunking`.
+        """
         results = self._bulk_operation(operation='queryAll',
                                        data=data,
-                                       wait=wait
+                                       wait=wait,
+                                       content_type=content_type,
+                                       pk_chunking=pk_chunking,
+                                       concurrency=concurrency
                                        )
 
         if lazy_operation:
             return results
         return list_from_generator(results)
+
+
+class BulkJob:
+    """ Handle on a Bulk API job returned by `SFBulkType.submit`
+
+    The job is not waited for: `poll` checks its batches once, `wait`
+    polls until they are all processed, and `results` downloads their
+    results lazily, batch by batch and in the order of the records.
+    `BulkJob.wait_all` waits for several jobs from a single thread.
+
+    `to_dict` returns a JSON serializable state, which
+    `SFBulkHandler.resume_job` turns back into a handle, e.g. in another
+    process.
+    """
+
+    # pylint: disable=too-many-instance-attributes,protected-access
+    # pylint: disable=too-many-arguments
+    def __init__(self,
+                 bulk: SFBulkType,
+                 job_id: str,
+                 operation: str,
+                 batch_ids: Iterable[str],
+                 content_type: str = 'JSON',
+                 include_detailed_results: bool = False,
+                 state: str = 'Closed'
+                 ):
+        """Initialize the instance with the given parameters.
+
+        Arguments:
+
+        * bulk -- `SFBulkType` of the object of the job
+        * job_id -- the Salesforce job Id
+        * operation -- Bulk operation of the job
+        * batch_ids -- batches of the job, in the order of the records
+        * content_type -- `JSON` or `CSV`
+        * include_detailed_results -- merge the results with the records
+        * state -- `Closed`, or `Aborted` once `abort` was called
+        """
+        self.bulk = bulk
+        self.job_id = job_id
+        self.operation = operation
+        self.batch_ids = list(batch_ids)
+        self.content_type = content_type
+        self.include_detailed_results = include_detailed_results
+        self.state = state
+        # last known info of each batch
+        self.batches: Dict[str, Dict[str, Any]] = OrderedDict()
+
+    def __repr__(self) -> str:
+        return (f'BulkJob({self.bulk.object_name!r}, {self.job_id!r}, '
+                f'{self.operation!r}, {len(self.batch_ids)} batches, '
+                f'{self.state!r})')
+
+    @property
+    def done(self) -> bool:
+        """Whether every batch reached a final state"""
+        return all(self.batches.get(i, {}).get('state') in FINAL_BATCH_STATES
+                   for i in self.batch_ids)
+
+    def _poll(self) -> int:
+        """Poll the batches once, return how many finished since the last
+        poll"""
+        finished = 0
+        for batch_info in self.bulk._get_batches(self.job_id):
+            batch_id = batch_info['id']
+            if batch_id not in self.batch_ids:
+                continue
+            previous = self.batches.get(batch_id, {}).get('state')
+            self.batches[batch_id] = batch_info
+            if batch_info['state'] in FINAL_BATCH_STATES and \
+                    previous not in FINAL_BATCH_STATES:
+                finished += 1
+                self.bulk._batch_finished(batch_info, self.operation)
+        return finished
+
+    def poll(self) -> bool:
+        """Check the state of the batches once, return whether they are
+        all processed"""
+        if not self.done:
+            self._poll()
+        return self.done
+
+    def wait(self, timeout: Optional[float] = None, wait: float = 5) -> bool:
+        """Poll until every batch is processed, or `timeout` seconds passed.
+        Return whether the job is done"""
+        return self.wait_all([self], timeout, wait)
+
+    @staticmethod
+    def wait_all(jobs: Iterable['BulkJob'],
+                 timeout: Optional[float] = None,
+                 wait: float = 5
+                 ) -> bool:
+        """Poll several jobs from the calling thread until they are all
+        done, or `timeout` seconds passed. Return whether they are done
+
+        The interval between polls starts at `wait` and grows while no
+        batch finishes, like the one of the blocking operations.
+
+        Arguments:
+
+        * jobs -- jobs to wait for
+        * timeout -- seconds to give up after, `None` to wait forever
+        * wait -- seconds between the first polls
+        """
+        pending = [i for i in jobs if not i.done]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        idle = 0
+        while pending:
+            if sum(i._poll() for i in pending):
+                idle = 0
+            pending = [i for i in pending if not i.done]
+            if not pending:
+                break
+            interval = min(wait * SFBulkType.CHECK_INTERVAL_BACKOFF ** idle,
+                           max(wait, SFBulkType.MAX_CHECK_INTERVAL_SECONDS))
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                interval = min(interval, remaining)
+            sleep(interval)
+            idle += 1
+        return True
+
+    def results(self) -> Iterator[Any]:
+        """Wait for the job, then yield the result of every record, in the
+        order of the records. Batches are downloaded as they are reached"""
+        self.wait()
+        for batch_id in self.batch_ids:
+            for result_set in self.bulk._fetch_results(
+                    self.batches[batch_id], self.operation,
+                    self.include_detailed_results):
+                yield from result_set
+
+    def abort(self) -> None:
+        """Abort the job, batches that were not processed are left
+        `NotProcessed`"""
+        self.bulk._abort_job(self.job_id)
+        self.state = 'Aborted'
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON serializable state of the handle, see
+        `SFBulkHandler.resume_job`"""
+        return {
+            'object': self.bulk.object_name,
+            'job_id': self.job_id,
+            'operation': self.operation,
+            'batch_ids': list(self.batch_ids),
+            'content_type': self.content_type,
+            'include_detailed_results': self.include_detailed_results,
+            'state': self.state,
+            }
+
+
+class BulkJobWriter:
+    """ Bulk API job kept open while records are written to it over time
+
+    Records are serialized into a batch as they are written. The batch is
+    uploaded once it is full, or `max_age` seconds after its first record
+    was written, so a slow producer does not leave records waiting. The
+    batches are polled by a background thread, which passes the results of
+    each one to `on_results` once it is processed. Up to `concurrency`
+    batches are uploaded at once, and `write` waits while they are.
+
+    Used as a context manager, the writer opens the job on entry, and on
+    exit uploads the last batch, closes the job and waits for every batch
+    to be processed. If the block raises, the writer aborts the job
+    instead, and the error of the block propagates::
+
+        with sf.bulk.Contact.writer('insert', max_age=10) as writer:
+            for record in stream:
+                writer.write(record)
+        for result in writer.job.results():
+            ...
+    """
+
+    # pylint: disable=too-many-instance-attributes,protected-access
+    # pylint: disable=too-many-arguments
+    def __init__(self,
+                 bulk: SFBulkType,
+                 operation: str,
+                 external_id_field: Optional[str] = None,
+                 batch_size: Union[int, str] = 10000,
+                 max_age: float = 60.0,
+                 use_serial: bool = False,
+                 include_detailed_results: bool = False,
+                 content_type: str = 'JSON',
+                 concurrency: int = 4,
+                 wait: float = 5,
+                 on_results: Optional[
+                     Callable[[Dict[str, Any], List[Any]], None]] = None
+                 ):
+        """Initialize the instance with the given parameters, see
+        `SFBulkType.writer`"""
+        _check_options(batch_size, content_type)
+        if operation in ('query', 'queryAll'):
+            raise ValueError('use query or query_all for query jobs')
+        self.bulk = bulk
+        self.operation = operation
+        self.external_id_field = external_id_field
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.use_serial = use_serial
+        self.include_detailed_results = include_detailed_results
+        self.content_type = content_type
+        self.wait = wait
+        self.on_results = on_results
+        self.job_id: Optional[str] = None
+        # handle on the job once it is closed
+        self.job: Optional[BulkJob] = None
+        self._builder = _BatchBuilder(content_type,
+                                      record_limit=self._record_limit())
+        # guards the builder, and wakes the thread flushing old batches
+        self._condition = threading.Condition()
+        # when the first record of the pending batch was written
+        self._started: Optional[float] = None
+        self._closed = False
+        self._slots = threading.BoundedSemaphore(
+            1 if use_serial else concurrency)
+        self._uploads = _BatchUploads()
+        self._futures: List['concurrent.futures.Future[Any]'] = []
+        self._error: Optional[BaseException] = None
+        self._polling: Optional['concurrent.futures.Future[Any]'] = None
+        # ends polling when the job is aborted
+        self._stop = threading.Event()
+
+    def __enter__(self) -> 'BulkJobWriter':
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if exc_info[0] is None:
+            self.close()
+            return
+        try:
+            self.abort()
+        except Exception:  # pylint: disable=broad-exception-caught
+            # the error of the block is the one to raise
+            logger.exception('Failed to abort bulk job %s', self.job_id)
+
+    def _record_limit(self) -> int:
+        """Number of records of the next batch"""
+        if self.batch_size == 'adaptive':
+            return min(BATCH_RECORD_LIMIT,
+                       self.bulk._adaptive_record_limit(self.operation))
+        if self.batch_size == 'auto':
+            return BATCH_RECORD_LIMIT
+        return min(BATCH_RECORD_LIMIT, cast(int, self.batch_size))
+
+    def open(self) -> None:
+        """Create the job and start the polling and flushing threads"""
+        job = self.bulk._create_job(operation=self.operation,
+                                    use_serial=self.use_serial,
+                                    external_id_field=self.external_id_field,
+                                    content_type=self.content_type
+                                    )
+        self.job_id = job['id']
+        self._polling = _in_thread(self._poll)
+        threading.Thread(target=self._flush_old, daemon=True).start()
+
+    def write(self, record: Mapping[str, Any]) -> None:
+        """Add a record to the pending batch, uploading it if it is full"""
+        with self._condition:
+            self._check()
+            batch = self._builder.add(record)
+            if batch:
+                self._upload(batch)
+            if len(self._builder) == 1:
+                self._started = time.monotonic()
+                self._condition.notify_all()
+
+    def flush(self) -> None:
+        """Upload the pending batch, even if it is not full"""
+        with self._condition:
+            self._check()
+            self._flush()
+
+    def close(self, wait: bool = True) -> BulkJob:
+        """Upload the pending batch and close the job
+
+        Arguments:
+
+        * wait -- wait for every batch to be processed and for its
+                  results to be passed to `on_results`
+        """
+        if self.job_id is None:
+            raise ValueError('BulkJobWriter is not open')
+        with self._condition:
+            if not self._closed:
+                self._flush()
+                self._closed = True
+                self._condition.notify_all()
+        concurrent.futures.wait(self._futures)
+        error = self._error
+        self._uploads.finish(error)
+        if self.job is None:
+            self.bulk._close_job(job_id=self.job_id)
+            self.job = BulkJob(self.bulk,
+                               job_id=self.job_id,
+                               operation=self.operation,
+                               batch_ids=[i.result()['id']
+                                          for i in self._futures
+                                          if not i.exception()],
+                               content_type=self.content_type,
+                               include_detailed_results=
+                               self.include_detailed_results
+                               )
+        if error is not None:
+            raise error
+        if wait and self._polling is not None:
+            self._polling.result()
+        return self.job
+
+    def abort(self) -> None:
+        """Drop the pending batch and abort the job, without waiting for
+        its batches to be processed. Batches that were not processed are
+        left `NotProcessed`."""
+        if self.job_id is None:
+            raise ValueError('BulkJobWriter is not open')
+        with self._condition:
+            self._builder.flush()
+            self._started = None
+            self._closed = True
+            self._condition.notify_all()
+        self._stop.set()
+        concurrent.futures.wait(self._futures)
+        self._uploads.finish(self._error)
+        self.bulk._abort_job(self.job_id)
+
+    def _check(self) -> None:
+        """Raise the error of a failed upload, or if the writer is closed"""
+        if self._error is not None:
+            raise self._error
+        if self._polling is not None and self._polling.done():
+            # polling only ends early on errors, such as one of on_results
+            self._polling.result()
+        if self._closed:
+            raise ValueError('write to a closed BulkJobWriter')
+        if self.job_id is None:
+            raise ValueError('BulkJobWriter is not open')
+
+    def _flush(self) -> None:
+        """Upload the pending batch, holding the condition"""
+        batch = self._builder.flush()
+        self._started = None
+        if batch:
+            self._upload(batch)
+
+    def _upload(self, batch: _Batch) -> None:
+        """Upload a batch in the executor, once an upload slot is free"""
+        self._slots.acquire()  # pylint: disable=consider-using-with
+        self._futures.append(self.bulk._executor.submit(
+            bind_context(self._add_batch), len(self._futures), batch))
+        self._builder.record_limit = self._record_limit()
+
+    def _add_batch(self, index: int, batch: _Batch) -> Any:
+        """Upload the `index`th batch of the job"""
+        try:
+            batch_info = self.bulk._add_batch(job_id=cast(str, self.job_id),
+                                              data=batch,
+                                              operation=self.operation,
+                                              content_type=self.content_type
+                                              )
+        except BaseException as error:
+            self._error = self._error or error
+            raise
+        finally:
+            self._slots.release()
+        self._uploads.accepted(batch_info['id'], index)
+        return batch_info
+
+    def _flush_old(self) -> None:
+        """Upload pending batches once they are `max_age` seconds old"""
+        with self._condition:
+            while not self._closed:
+                if self._started is None:
+                    self._condition.wait()
+                    continue
+                remaining = self._started + self.max_age - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                elif self._error is None:
+                    self._flush()
+                else:
+                    return
+
+    def _poll(self) -> None:
+        """Poll the batches until the job is closed and they are all
+        processed, passing their results to `on_results`"""
+
+        def finished(batch_info: Dict[str, Any]) -> None:
+            if self.on_results is None:
+                return
+            results = self.bulk._fetch_results(batch_info, self.operation,
+                                               self.include_detailed_results)
+            self.on_results(batch_info, [row for rows in results
+                                         for row in rows])
+
+        self.bulk._wait_for_batches(cast(str, self.job_id), self._uploads,
+                                    self.operation, self.wait,
+                                    on_finished=finished, stop=self._stop)
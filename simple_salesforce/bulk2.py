@@ -1,5 +1,6 @@
 """ Classes for interacting with Salesforce Bulk 2.0 API """
 
+import concurrent.futures
 import copy
 import csv
 import datetime
@@ -7,30 +8,35 @@ import http.client as http
 import io
 import json
 import math
+import mmap
 import os
 import re
-import sys
+import shutil
 import tempfile
-from collections import OrderedDict
-from concurrent.futures import ThreadPoolExecutor
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import Executor
 from contextlib import closing
 from enum import Enum
 from functools import partial
+from itertools import islice
 from time import sleep
-from typing import Any, AnyStr, Dict, Generator, List, MutableMapping, \
-    Optional, Tuple, Union
+from urllib.parse import parse_qs, urljoin, urlparse
+from typing import IO, Any, AnyStr, Callable, Dict, Generator, Iterable, \
+    Iterator, List, MutableMapping, Optional, Tuple, Union, cast
 from typing_extensions import Literal, NotRequired, TypedDict
 
 import requests
-from more_itertools import chunked
 from requests import Session
+from requests.utils import super_len
 
 from .exceptions import (
     SalesforceBulkV2ExtractError,
     SalesforceBulkV2LoadError,
     SalesforceOperationError,
     )
-from .util import call_salesforce
+from .tracing import add_event, bind_context, set_attributes, span
+from .util import BulkEvent, Hooks, call_salesforce, default_executor
 
 
 # pylint: disable=missing-class-docstring,invalid-name,too-many-arguments,
@@ -94,6 +100,12 @@ _line_ending_char = {
     }
 
 
+class Compression(str,
+                  Enum
+                  ):
+    gzip = "gzip"
+
+
 class ResultsType(str,
                   Enum
                   ):
@@ -126,98 +138,322 @@ class QueryResult(TypedDict,
 MAX_INGEST_JOB_FILE_SIZE = 100 * 1024 * 1024
 MAX_INGEST_JOB_PARALLELISM = 10  # TODO: ? Salesforce limits
 DEFAULT_QUERY_PAGE_SIZE = 50000
+# the first API version listing the pages of query results at once
+RESULT_PAGES_API_VERSION = 62.0
+
+
+# bytes of a CSV file scanned at once for the ends of its records
+_SCAN_BLOCK_SIZE = 1024 * 1024
+# bytes of a chunk handed to the socket at once while it is uploaded
+_UPLOAD_BLOCK_SIZE = 1024 * 1024
+# bytes of a result read from the socket, and decompressed, at once
+_DOWNLOAD_BLOCK_SIZE = 1024 * 1024
+# a block of a streamed request body
+_Buffer = Union[bytes, memoryview]
+# every byte but the quotes and line breaks that delimit CSV records
+_NOT_QUOTE_OR_NEWLINE = bytes(i for i in range(256) if i not in b'"\n')
+
+
+class _CsvChunk:
+    """Records of a CSV file behind its header row, as views of the bytes
+    of the file, so they are not copied when they are sent"""
+
+    def __init__(self, header: memoryview, body: memoryview):
+        self.header = header
+        self.body = body
+
+    def __len__(self) -> int:
+        """Size in bytes"""
+        return len(self.header) + len(self.body)
+
+    def __iter__(self) -> Iterator[memoryview]:
+        """The header, then the records in blocks, as a request body"""
+        yield self.header
+        for start in range(0, len(self.body), _UPLOAD_BLOCK_SIZE):
+            yield self.body[start:start + _UPLOAD_BLOCK_SIZE]
+
+    def tobytes(self) -> bytes:
+        """The header and records, in a single bytes object"""
+        return b"".join((self.header, self.body))
+
+
+class _StreamedBody:
+    """A request body read from a file or iterated, of a known size, so
+    that it is sent with a Content-Length rather than chunked"""
+
+    def __init__(self, data: Union[IO[bytes], Iterable[_Buffer]], size: int):
+        self.data = data
+        self.size = size
+
+    def __len__(self) -> int:
+        """Size in bytes"""
+        return self.size
+
+    def __iter__(self) -> Iterator[_Buffer]:
+        """The blocks of the body"""
+        read = getattr(self.data, "read", None)
+        if read is None:
+            return iter(self.data)
+        return iter(partial(read, _UPLOAD_BLOCK_SIZE), b"")
+
+
+class _GzipBody:
+    """A request body compressed with gzip while it is sent. Its compressed
+    size is only known once it is sent, so it is sent chunked"""
+
+    def __init__(self,
+                 data: Union[bytes, bytearray, memoryview, Iterable[_Buffer]]
+                 ):
+        self.data = data
+        self.compressed_size = 0
+
+    def __iter__(self) -> Iterator[bytes]:
+        """The compressed blocks of the body"""
+        blocks: Iterable[_Buffer]
+        if isinstance(self.data, (bytes, bytearray, memoryview)):
+            # iterating bytes-like objects would give their ints
+            view = memoryview(self.data).cast("B")
+            blocks = (view[start:start + _UPLOAD_BLOCK_SIZE]
+                      for start in range(0, len(view), _UPLOAD_BLOCK_SIZE))
+        else:
+            blocks = self.data
+        # a window of 16 + 15 bits asks zlib for a gzip header and trailer
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+        self.compressed_size = 0
+        for block in blocks:
+            compressed = compressor.compress(block)
+            if compressed:
+                self.compressed_size += len(compressed)
+                yield compressed
+        compressed = compressor.flush()
+        self.compressed_size += len(compressed)
+        yield compressed
+
+
+def _map_ordered(
+        executor: Executor,
+        func: Callable[[str], QueryResult],
+        items: Iterable[str],
+        concurrency: int
+        ) -> Iterator[QueryResult]:
+    """Yield `func` of each item, in order, with up to `concurrency` calls
+    running at once on `executor`. Calls that are not started when the
+    iteration stops are cancelled."""
+    pending: "deque[concurrent.futures.Future[QueryResult]]" = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= concurrency:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+class _IngestJob:
+    """An ingest job run by `SFBulk2Type._upload_chunks`, with the upload
+    of its data until it is done, and the time it may run until once it
+    is closed"""
+
+    def __init__(self,
+                 index: int,
+                 total: int,
+                 job_id: str,
+                 upload: "concurrent.futures.Future[None]"
+                 ):
+        self.index = index
+        self.total = total
+        self.job_id = job_id
+        self.upload: Optional["concurrent.futures.Future[None]"] = upload
+        self.expiration: Optional[datetime.datetime] = None
+
+
+def _ingest_result(job_info: Dict[str, Any], total: int) -> Dict[str, int]:
+    """The results of a completed ingest job of `total` records"""
+    return {
+        "numberRecordsFailed": int(job_info["numberRecordsFailed"]),
+        "numberRecordsProcessed": int(
+            job_info["numberRecordsProcessed"]
+            ),
+        "numberRecordsTotal": int(total),
+        "job_id": job_info["id"],
+        }
+
+
+def _append_file(bos: IO[bytes], filename: str, skip_header: bool) -> None:
+    """Move the content of a CSV file to the end of `bos`, without its
+    header row with `skip_header`"""
+    with open(filename, "rb") as bis:
+        if skip_header:
+            bis.readline()
+        shutil.copyfileobj(bis, bos, _DOWNLOAD_BLOCK_SIZE)
+    os.remove(filename)
+
+
+def _close_result(future: "concurrent.futures.Future[requests.Response]"
+                  ) -> None:
+    """Close a response that was requested but will not be read"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _record_ends(block: bytes, in_quotes: bool = False) -> Iterator[int]:
+    """Yield the offset after each line break of `block` that ends a CSV
+    record, that is, which is not within a quoted field
+
+    Splitting on quotes alternates between text outside and inside quoted
+    fields. A doubled quote within a field reads as leaving and entering
+    the field again, which keeps that alternation.
+
+    Arguments:
+        * block -- CSV bytes
+        * in_quotes -- whether `block` starts within a quoted field
+    """
+    offset = 0
+    for index, piece in enumerate(block.split(b'"')):
+        if index % 2 == in_quotes:
+            end = piece.find(b"\n")
+            while end != -1:
+                yield offset + end + 1
+                end = piece.find(b"\n", end + 1)
+        offset += len(piece) + 1
+
+
+def _count_record_ends(block: bytes, in_quotes: bool = False
+                       ) -> Tuple[int, bool]:
+    """Count the line breaks of `block` that end a CSV record, and tell
+    whether it ends within a quoted field, see `_record_ends`
+
+    Only quotes and line breaks matter, and dropping a pair of adjacent
+    quotes leaves everything else on the same side of a quoted field, so
+    the block is reduced to few pieces before splitting on quotes.
+    """
+    pieces = block.translate(None, _NOT_QUOTE_OR_NEWLINE) \
+        .replace(b'""', b"").split(b'"')
+    return (b"".join(pieces[int(in_quotes)::2]).count(b"\n"),
+            in_quotes ^ (len(pieces) % 2 == 0))
+
+
+def _last_record_end(block: bytes, in_quotes: bool = False) -> int:
+    """The offset after the last line break of `block` that ends a CSV
+    record, 0 if there is none"""
+    end = block.rfind(b"\n")
+    quotes = block.count(b'"', 0, max(end, 0)) + in_quotes
+    while end != -1 and quotes % 2:
+        previous = end
+        end = block.rfind(b"\n", 0, previous)
+        quotes -= block.count(b'"', end + 1, previous)
+    return end + 1
 
 
 def _split_csv(
         filename: Optional[str] = None,
         records: Optional[str] = None,
         max_records: Optional[int] = None
-        ) -> Generator[Tuple[int, str], None, None]:
+        ) -> Generator[Tuple[int, _CsvChunk], None, None]:
     """Split a CSV file into chunks to avoid exceeding the Salesforce
     bulk 2.0 API limits.
 
+    The file is memory-mapped and read once, as bytes, and chunks are cut
+    between records, even when quoted fields hold line breaks. Each chunk
+    is yielded with its number of records, and holds views of the mapped
+    file rather than copies.
+
+    The records of a block are counted at once, and only the block where
+    a chunk is cut is walked record by record.
+
     Arguments:
         * filename -- csv file
+        * records -- CSV data, if there is no file
         * max_records -- the number of records per chunk, None for auto size
     """
-    total_records = _count_csv(filename=filename,
-                               skip_header=True
-                               ) if \
-        filename else \
-        _count_csv(data=records,
-                   skip_header=True
-                   )
-    csv_data_size = os.path.getsize(filename) if filename else sys.getsizeof(
-        records
-        )
-    _max_records: int = max_records or total_records
-    _max_records = min(_max_records,
-                       total_records
-                       )
-    max_bytes = min(
-        csv_data_size,
-        MAX_INGEST_JOB_FILE_SIZE - 1 * 1024 * 1024
-        )  # -1 MB for sentinel
-    records_size = 0
-    bytes_size = 0
-    buff: List[str] = []
+    data: Any
     if filename:
-        with open(filename,
-                  encoding="utf-8"
-                  ) as bis:
-            header = bis.readline()
-            for line in bis:
-                records_size += 1
-                bytes_size += len(line.encode("utf-8"))
-                if records_size > _max_records or bytes_size > max_bytes:
-                    if buff:
-                        yield records_size - 1, header + "".join(buff)
-                    buff = [line]
-                    records_size = 1
-                    bytes_size = len(line.encode("utf-8"))
-                else:
-                    buff.append(line)
-            if buff:
-                yield records_size, header + "".join(buff)
+        with open(filename, "rb") as bis:
+            if not os.fstat(bis.fileno()).st_size:
+                return
+            # the map outlives the file, and is released with the last view
+            data = mmap.mmap(bis.fileno(), 0, access=mmap.ACCESS_READ)
+    elif records:
+        data = records.encode("utf-8")
     else:
-        assert records is not None
-        header = records.splitlines(True)[0]
-        for line in records.splitlines(True)[1:]:
-            records_size += 1
-            bytes_size += len(line.encode("utf-8"))
-            if records_size > _max_records or bytes_size > max_bytes:
-                if buff:
-                    yield records_size - 1, header + "".join(buff)
-                buff = [line]
-                records_size = 1
-                bytes_size = len(line.encode("utf-8"))
-            else:
-                buff.append(line)
-        if buff:
-            yield records_size, header + "".join(buff)
+        return
+    view = memoryview(data)
+    size = len(data)
+    max_bytes = MAX_INGEST_JOB_FILE_SIZE - 1 * 1024 * 1024  # -1 MB sentinel
+    header = next(_record_ends(
+        data[:max(_SCAN_BLOCK_SIZE, data.find(b"\n") + 1)]), size)
+    start = pos = header
+    # records of the pending chunk, and where the last one of them ends
+    count = 0
+    last_end: Optional[int] = None
+    in_quotes = False
+    while pos < size:
+        block = data[pos:pos + _SCAN_BLOCK_SIZE]
+        ends, ends_in_quotes = _count_record_ends(block, in_quotes)
+        if (max_records is None or count + ends < max_records) and \
+                pos + len(block) - start + header <= max_bytes:
+            if ends:
+                count += ends
+                last_end = pos + _last_record_end(block, in_quotes)
+            pos += len(block)
+            in_quotes = ends_in_quotes
+            continue
+        cut = last_end
+        for end in _record_ends(block, in_quotes):
+            if count and (count == max_records or
+                          pos + end - start + header > max_bytes):
+                break
+            cut = pos + end
+            count += 1
+        if cut is None:
+            pos += len(block)
+            in_quotes = ends_in_quotes
+            continue
+        yield count, _CsvChunk(view[:header], view[start:cut])
+        start = pos = cut
+        count = 0
+        last_end = None
+        in_quotes = False
+    if size > start:
+        # the last record may not end with a line break
+        count += data[size - 1:size] != b"\n"
+        yield count, _CsvChunk(view[:header], view[start:size])
 
 
 def _count_csv(
         filename: Optional[str] = None,
         data: Optional[str] = None,
-        skip_header: bool = False,
-        line_ending: LineEnding = LineEnding.LF
+        skip_header: bool = False
         ) -> int:
-    """Count the number of records in a CSV file."""
+    """Count the number of records in a CSV file.
+
+    Records are counted like `_split_csv` does, a block at a time, so line
+    breaks within quoted fields do not end a record."""
+    buffer: Any
     if filename:
-        with open(filename,
-                  encoding="utf-8"
-                  ) as bis:
-            count = sum(1 for _ in bis)
+        with open(filename, "rb") as bis:
+            if not os.fstat(bis.fileno()).st_size:
+                buffer = b""
+            else:
+                buffer = mmap.mmap(bis.fileno(), 0, access=mmap.ACCESS_READ)
     elif data:
-        pat = repr(_line_ending_char[line_ending])[1:-1]
-        count = sum(1 for _ in re.finditer(pat,
-                                           data
-                                           )
-                    )
+        buffer = data.encode("utf-8")
     else:
         raise ValueError("Either filename or data must be provided")
 
+    count = 0
+    in_quotes = False
+    for start in range(0, len(buffer), _SCAN_BLOCK_SIZE):
+        ends, in_quotes = _count_record_ends(
+            buffer[start:start + _SCAN_BLOCK_SIZE], in_quotes)
+        count += ends
+    # the last record may not end with a line break
+    count += buffer[len(buffer) - 1:] not in (b"", b"\n")
+    if isinstance(buffer, mmap.mmap):
+        buffer.close()
     if skip_header:
         count -= 1
     return count
@@ -257,7 +493,9 @@ class SFBulk2Handler:
             session_id: str,
             bulk2_url: str,
             proxies: Optional[MutableMapping[str, str]] = None,
-            session: Optional[Session] = None
+            session: Optional[Session] = None,
+            hooks: Optional[Hooks] = None,
+            executor: Optional[Executor] = None
             ):
         """Initialize the instance with the given parameters.
 
@@ -269,9 +507,14 @@ class SFBulk2Handler:
         * session -- Custom requests session, created in calling code. This
                      enables the use of requests Session features not otherwise
                      exposed by simple_salesforce.
+        * hooks -- `Hooks` fired around every HTTP call
+        * executor -- runs the uploads and downloads, the process wide
+                      `default_executor` if not given
         """
         self.session_id = session_id
         self.session = session or requests.Session()
+        self.hooks = hooks
+        self.executor = executor
         self.bulk2_url = bulk2_url
         # don't wipe out original proxies with None
         if not session and proxies is not None:
@@ -293,6 +536,8 @@ class SFBulk2Handler:
             bulk2_url=self.bulk2_url,
             headers=self.headers,
             session=self.session,
+            hooks=self.hooks,
+            executor=self.executor,
             )
 
 
@@ -310,7 +555,8 @@ class _Bulk2Client:
             object_name: str,
             bulk2_url: str,
             headers: Dict[str, str],
-            session: Session
+            session: Session,
+            hooks: Optional[Hooks] = None
             ):
         """
         Arguments:
@@ -322,21 +568,27 @@ class _Bulk2Client:
         * session -- Custom requests session, created in calling code. This
                      enables the use of requests Session features not otherwise
                      exposed by simple_salesforce.
+        * hooks -- `Hooks` fired around every HTTP call
         """
         self.object_name = object_name
         self.bulk2_url = bulk2_url
         self.session = session
         self.headers = headers
+        self.hooks = hooks
 
     def _get_headers(
             self,
             request_content_type: Optional[str] = None,
-            accept_content_type: Optional[str] = None
+            accept_content_type: Optional[str] = None,
+            compression: Optional[Compression] = None
             ) -> Dict[str, str]:
-        """Get headers for bulk 2.0 API request"""
+        """Get headers for bulk 2.0 API request, asking for a compressed
+        response with `compression`"""
         headers = copy.deepcopy(self.headers)
         headers["Content-Type"] = request_content_type or self.JSON_CONTENT_TYPE
         headers["ACCEPT"] = accept_content_type or self.JSON_CONTENT_TYPE
+        if compression:
+            headers["Accept-Encoding"] = Compression(compression).value
         return headers
 
     def _construct_request_url(
@@ -403,16 +655,24 @@ class _Bulk2Client:
                 )
             payload["object"] = self.object_name
             payload["contentType"] = "CSV"
-        result = call_salesforce(
-            url=url,
-            method="POST",
-            session=self.session,
-            headers=headers,
-            data=json.dumps(payload,
-                            allow_nan=False
-                            ),
-            )
-        return result.json(object_pairs_hook=OrderedDict)
+        with span("bulk2.create_job", {
+                "salesforce.object": self.object_name,
+                "salesforce.bulk.operation": Operation(operation).value,
+                }) as current:
+            result = call_salesforce(
+                url=url,
+                method="POST",
+                session=self.session,
+                name="bulk2.create_job",
+                hooks=self.hooks,
+                headers=headers,
+                data=json.dumps(payload,
+                                allow_nan=False
+                                ),
+                )
+            job = result.json(object_pairs_hook=OrderedDict)
+            set_attributes(current, {"salesforce.bulk.job_id": job.get("id")})
+        return job
 
     def wait_for_job(
             self,
@@ -428,29 +688,89 @@ class _Bulk2Client:
         job_status = JobState.in_progress if is_query else JobState.open
         delay_timeout = 0.0
         delay_cnt = 0
-        sleep(wait)
-        while datetime.datetime.now() < expiration_time:
-            job_info = self.get_job(job_id,
-                                    is_query
-                                    )
-            job_status = job_info["state"]
-            if job_status in [
-                JobState.job_complete,
-                JobState.aborted,
-                JobState.failed,
-                ]:
-                if job_status != JobState.job_complete:
-                    error_message = job_info.get("errorMessage") or job_info
-                    raise SalesforceOperationError(
-                        f"Job failure. Response content: {error_message}"
-                        )
-                return job_status  # JobComplete
+        polls = 0
+        with span("bulk2.wait_for_job", {
+                "salesforce.bulk.job_id": job_id,
+                }) as current:
+            sleep(wait)
+            while datetime.datetime.now() < expiration_time:
+                job_info = self.get_job(job_id,
+                                        is_query
+                                        )
+                polls += 1
+                job_status = job_info["state"]
+                if job_status in [
+                    JobState.job_complete,
+                    JobState.aborted,
+                    JobState.failed,
+                    ]:
+                    set_attributes(current, {
+                        "salesforce.bulk.polls": polls,
+                        "salesforce.bulk.state": job_status,
+                        "salesforce.bulk.records_processed":
+                            job_info.get("numberRecordsProcessed"),
+                        "salesforce.bulk.records_failed":
+                            job_info.get("numberRecordsFailed"),
+                        "salesforce.bulk.total_processing_time_ms":
+                            job_info.get("totalProcessingTime"),
+                        "salesforce.bulk.api_active_processing_time_ms":
+                            job_info.get("apiActiveProcessingTime"),
+                        "salesforce.bulk.apex_processing_time_ms":
+                            job_info.get("apexProcessingTime"),
+                        "salesforce.bulk.retries": job_info.get("retries"),
+                        })
+                    self.finish_job(job_info)
+                    return job_status  # JobComplete
+
+                if delay_timeout < self.MAX_CHECK_INTERVAL_SECONDS:
+                    delay_timeout = wait + math.exp(delay_cnt) / 1000.0
+                    delay_cnt += 1
+                sleep(delay_timeout)
+            set_attributes(current, {
+                "salesforce.bulk.polls": polls,
+                "salesforce.bulk.state": job_status,
+                })
+            raise SalesforceOperationError(
+                f"Job timeout. Job status: {job_status}"
+                )
 
-            if delay_timeout < self.MAX_CHECK_INTERVAL_SECONDS:
-                delay_timeout = wait + math.exp(delay_cnt) / 1000.0
-                delay_cnt += 1
-            sleep(delay_timeout)
-        raise SalesforceOperationError(f"Job timeout. Job status: {job_status}")
+    def finish_job(self,
+                   job_info: Dict[str, Any]
+                   ) -> None:
+        """Handle a job that reached a final state, raising unless it is
+        complete"""
+        self._job_finished(job_info)
+        if job_info["state"] != JobState.job_complete:
+            error_message = (
+                job_info.get("errorMessage") or job_info
+            )
+            raise SalesforceOperationError(
+                f"Job failure. Response content: {error_message}"
+                )
+
+    def _job_finished(self,
+                      job_info: Dict[str, Any]
+                      ) -> None:
+        """Notify the bulk event hooks that a job reached a final state"""
+        if not self.hooks:
+            return
+        processing_time = job_info.get("totalProcessingTime")
+        self.hooks.fire_bulk_event(
+            BulkEvent(
+                api="bulk2",
+                object_name=job_info.get("object", self.object_name),
+                operation=job_info.get("operation", ""),
+                job_id=job_info["id"],
+                batch_id=None,
+                state=job_info["state"],
+                records_processed=int(
+                    job_info.get("numberRecordsProcessed", 0)
+                    ),
+                records_failed=int(job_info.get("numberRecordsFailed", 0)),
+                processing_time=None if processing_time is None
+                else int(processing_time) / 1000,
+                )
+            )
 
     def abort_job(self,
                   job_id: str,
@@ -485,6 +805,8 @@ class _Bulk2Client:
             url=url,
             method="DELETE",
             session=self.session,
+            name="bulk2.delete_job",
+            hooks=self.hooks,
             headers=headers
             )
         return result.json(object_pairs_hook=OrderedDict)
@@ -502,15 +824,21 @@ class _Bulk2Client:
         payload = {
             "state": state
             }
-        result = call_salesforce(
-            url=url,
-            method="PATCH",
-            session=self.session,
-            headers=headers,
-            data=json.dumps(payload,
-                            allow_nan=False
-                            ),
-            )
+        with span("bulk2.set_job_state", {
+                "salesforce.bulk.job_id": job_id,
+                "salesforce.bulk.state": state,
+                }):
+            result = call_salesforce(
+                url=url,
+                method="PATCH",
+                session=self.session,
+                name="bulk2.set_job_state",
+                hooks=self.hooks,
+                headers=headers,
+                data=json.dumps(payload,
+                                allow_nan=False
+                                ),
+                )
         return result.json(object_pairs_hook=OrderedDict)
 
     def get_job(self,
@@ -522,12 +850,15 @@ class _Bulk2Client:
                                           is_query
                                           )
 
-        result = call_salesforce(
-            url=url,
-            method="GET",
-            session=self.session,
-            headers=self.headers
-            )
+        with span("bulk2.get_job", {"salesforce.bulk.job_id": job_id}):
+            result = call_salesforce(
+                url=url,
+                method="GET",
+                session=self.session,
+                name="bulk2.get_job",
+                hooks=self.hooks,
+                headers=self.headers
+                )
         return result.json(object_pairs_hook=OrderedDict)
 
     def filter_null_bytes(self,
@@ -554,7 +885,8 @@ class _Bulk2Client:
             self,
             job_id: str,
             locator: str = "",
-            max_records: int = DEFAULT_QUERY_PAGE_SIZE
+            max_records: int = DEFAULT_QUERY_PAGE_SIZE,
+            compression: Optional[Compression] = None
             ) -> QueryResult:
         """Get results for a query job"""
         url = self._construct_request_url(job_id,
@@ -567,39 +899,92 @@ class _Bulk2Client:
             params["locator"] = locator
         headers = self._get_headers(
             self.JSON_CONTENT_TYPE,
-            self.CSV_CONTENT_TYPE
-            )
-        result = call_salesforce(
-            url=url,
-            method="GET",
-            session=self.session,
-            headers=headers,
-            params=params,
+            self.CSV_CONTENT_TYPE,
+            compression
             )
-        locator = result.headers.get("Sforce-Locator",
-                                     ""
-                                     )
-        if locator == "null":
-            locator = ""
-        number_of_records = int(result.headers["Sforce-NumberOfRecords"])
+        with span("bulk2.get_query_results", {
+                "salesforce.bulk.job_id": job_id,
+                }) as current:
+            result = call_salesforce(
+                url=url,
+                method="GET",
+                session=self.session,
+                name="bulk2.get_query_results",
+                hooks=self.hooks,
+                headers=headers,
+                params=params,
+                )
+            locator, number_of_records = self.query_page(result)
+            set_attributes(current, {
+                "salesforce.bulk.records": number_of_records,
+                "salesforce.bulk.bytes": len(result.content),
+                })
         return {
             "locator": locator,
             "number_of_records": number_of_records,
             "records": self.filter_null_bytes(result.content.decode('utf-8')),
             }
 
-    def download_job_data(
+    @staticmethod
+    def query_page(result: requests.Response) -> Tuple[str, int]:
+        """The locator of the next page of query results, "" after the
+        last one, and the number of records of the page in `result`"""
+        locator = result.headers.get("Sforce-Locator",
+                                     ""
+                                     )
+        if locator == "null":
+            locator = ""
+        return locator, int(result.headers["Sforce-NumberOfRecords"])
+
+    def supports_result_pages(self) -> bool:
+        """Whether the API version lists the pages of query results, see
+        `get_result_pages`"""
+        version = re.search(r"/v(\d+\.\d+)/", self.bulk2_url)
+        return version is not None and \
+            float(version.group(1)) >= RESULT_PAGES_API_VERSION
+
+    def get_result_pages(
+            self,
+            job_id: str,
+            max_records: int = DEFAULT_QUERY_PAGE_SIZE
+            ) -> Iterator[str]:
+        """Yield the locator of each page of results of a completed query
+        job, "" for the first page, so that the pages can be requested
+        without reading each other's locators first"""
+        url = self._construct_request_url(job_id,
+                                          True
+                                          ) + "/resultPages"
+        params: Optional[QueryParameters] = {
+            "maxRecords": max_records
+            }
+        headers = self._get_headers()
+        while url:
+            result = call_salesforce(
+                url=url,
+                method="GET",
+                session=self.session,
+                name="bulk2.get_result_pages",
+                hooks=self.hooks,
+                headers=headers,
+                params=params,
+                )
+            pages = result.json()
+            for page in pages["resultPages"]:
+                link = parse_qs(urlparse(page["resultLink"]).query)
+                yield link.get("locator", [""])[0]
+            next_url = pages.get("nextRecordsUrl")
+            url = urljoin(self.bulk2_url, next_url) if next_url else ""
+            params = None
+
+    def open_query_results(
             self,
-            path: str,
             job_id: str,
             locator: str = "",
             max_records: int = DEFAULT_QUERY_PAGE_SIZE,
-            chunk_size: int = 1024,
-            ) -> QueryResult:
-        """Get results for a query job"""
-        if not os.path.exists(path):
-            raise SalesforceBulkV2LoadError(f"Path does not exist: {path}")
-
+            compression: Optional[Compression] = None
+            ) -> requests.Response:
+        """Request a page of results of a query job, as a stream that the
+        caller reads and closes"""
         url = self._construct_request_url(job_id,
                                           True
                                           ) + "/results"
@@ -610,33 +995,77 @@ class _Bulk2Client:
             params["locator"] = locator
         headers = self._get_headers(
             self.JSON_CONTENT_TYPE,
-            self.CSV_CONTENT_TYPE
+            self.CSV_CONTENT_TYPE,
+            compression
+            )
+        return call_salesforce(
+            url=url,
+            method="GET",
+            session=self.session,
+            name="bulk2.download_job_data",
+            hooks=self.hooks,
+            headers=headers,
+            params=params,
+            stream=True,
             )
+
+    def write_query_results(
+            self,
+            result: requests.Response,
+            bos: IO[bytes],
+            skip_header: bool = False,
+            chunk_size: int = _DOWNLOAD_BLOCK_SIZE
+            ) -> None:
+        """Write a page of query results, opened with `open_query_results`,
+        to a binary file
+
+        Arguments:
+
+        * result -- the response holding the page
+        * bos -- the file to write to
+        * skip_header -- leave out the header row, for a page appended to
+                         the ones before it
+        * chunk_size -- the number of bytes read and written at once
+        """
+        header = b""
+        for chunk in result.iter_content(chunk_size=chunk_size):
+            if skip_header:
+                # column names hold no line breaks
+                header += chunk
+                end = header.find(b"\n")
+                if end == -1:
+                    continue
+                chunk = header[end + 1:]
+                skip_header = False
+            bos.write(self.filter_null_bytes(chunk))
+
+    def download_job_data(
+            self,
+            path: str,
+            job_id: str,
+            locator: str = "",
+            max_records: int = DEFAULT_QUERY_PAGE_SIZE,
+            chunk_size: int = _DOWNLOAD_BLOCK_SIZE,
+            compression: Optional[Compression] = None
+            ) -> QueryResult:
+        """Get results for a query job"""
+        if not os.path.exists(path):
+            raise SalesforceBulkV2LoadError(f"Path does not exist: {path}")
+
         with closing(
-                call_salesforce(
-                    url=url,
-                    method="GET",
-                    session=self.session,
-                    headers=headers,
-                    params=params,
-                    stream=True,
-                    )
+                self.open_query_results(job_id,
+                                        locator,
+                                        max_records,
+                                        compression
+                                        )
                 ) as result, tempfile.NamedTemporaryFile(
             "wb",
             dir=path,
             suffix=".csv",
             delete=False
             ) as bos:
-            locator = result.headers.get("Sforce-Locator",
-                                         ""
-                                         )
-            if locator == "null":
-                locator = ""
-            number_of_records = int(
-                result.headers["Sforce-NumberOfRecords"]
-                )
-            for chunk in result.iter_content(chunk_size=chunk_size):
-                bos.write(self.filter_null_bytes(chunk))
+            locator, number_of_records = self.query_page(result)
+            self.write_query_results(result, bos, chunk_size=chunk_size)
             # check the file exists
             if os.path.isfile(bos.name):
                 return {
@@ -646,21 +1075,47 @@ class _Bulk2Client:
                     }
             raise SalesforceBulkV2LoadError(
                 f"The IO/Error occured while verifying binary data. "
-                f"File {bos.name} doesn't exist, url: {url}, "
+                f"File {bos.name} doesn't exist, url: {result.url}, "
                 )
 
     def upload_job_data(
             self,
             job_id: str,
-            data: str,
-            content_url: Optional[str] = None
+            data: Union[str, bytes, IO[bytes], Iterable[_Buffer]],
+            content_url: Optional[str] = None,
+            size: Optional[int] = None,
+            compression: Optional[Compression] = None
             ) -> None:
-        """Upload job data"""
-        if not data:
-            raise SalesforceBulkV2LoadError("Data is required for ingest jobs")
+        """Upload job data
+
+        Arguments:
 
-        # performance reduction here
-        data_size = len(data.encode("utf-8"))
+        * job_id -- job id
+        * data -- CSV text, its UTF-8 bytes, or a binary file or iterable
+                  of bytes that is streamed to Salesforce as it is read
+        * content_url -- the URL to upload the data to, if the job has one
+        * size -- the size in bytes of streamed data, for data without a
+                  length, such as a generator or a pipe
+        * compression -- compress the data as it is sent, the size limit
+                         applies to the data before it is compressed
+        """
+        body: Any
+        if isinstance(data, str):
+            body = data.encode("utf-8")
+        elif isinstance(data, (bytes, bytearray, memoryview)):
+            body = data
+        else:
+            body = _StreamedBody(
+                data,
+                super_len(data)  # type: ignore[no-untyped-call]
+                if size is None else size
+                )
+        data_size = len(body)
+        if not data_size:
+            raise SalesforceBulkV2LoadError(
+                "Data is required for ingest jobs, and the size of data "
+                "without a length"
+                )
         if data_size > MAX_INGEST_JOB_FILE_SIZE:
             raise SalesforceBulkV2LoadError(
                 f"Data size {data_size} exceeds the max file size accepted by "
@@ -677,13 +1132,26 @@ class _Bulk2Client:
             self.CSV_CONTENT_TYPE,
             self.JSON_CONTENT_TYPE
             )
-        result = call_salesforce(
-            url=url,
-            method="PUT",
-            session=self.session,
-            headers=headers,
-            data=data.encode("utf-8"),
-            )
+        if compression:
+            headers["Content-Encoding"] = Compression(compression).value
+            body = _GzipBody(body)
+        with span("bulk2.upload_job_data", {
+                "salesforce.bulk.job_id": job_id,
+                "salesforce.bulk.bytes": data_size,
+                }) as current:
+            result = call_salesforce(
+                url=url,
+                method="PUT",
+                session=self.session,
+                name="bulk2.upload_job_data",
+                hooks=self.hooks,
+                headers=headers,
+                data=body,
+                )
+            if compression:
+                set_attributes(current, {
+                    "salesforce.bulk.compressed_bytes": body.compressed_size,
+                    })
         if result.status_code != http.CREATED:
             raise SalesforceBulkV2LoadError(
                 f"Failed to upload job data. Error Code {result.status_code}. "
@@ -707,6 +1175,8 @@ class _Bulk2Client:
             url=url,
             method="GET",
             session=self.session,
+            name="bulk2.get_ingest_results",
+            hooks=self.hooks,
             headers=headers
             )
         return result.text
@@ -716,7 +1186,7 @@ class _Bulk2Client:
             file: str,
             job_id: str,
             results_type: str,
-            chunk_size: int = 1024
+            chunk_size: int = _DOWNLOAD_BLOCK_SIZE
             ) -> None:
         """Download record results to a file"""
         url = self._construct_request_url(
@@ -732,7 +1202,10 @@ class _Bulk2Client:
                     url=url,
                     method="GET",
                     session=self.session,
-                    headers=headers
+                    name="bulk2.download_ingest_results",
+                    hooks=self.hooks,
+                    headers=headers,
+                    stream=True,
                     )
                 ) as result, open(file,
                                   "wb"
@@ -755,7 +1228,9 @@ class SFBulk2Type:
             object_name: str,
             bulk2_url: str,
             headers: Dict[str, str],
-            session: Session
+            session: Session,
+            hooks: Optional[Hooks] = None,
+            executor: Optional[Executor] = None
             ):
         """Initialize the instance with the given parameters.
 
@@ -768,28 +1243,35 @@ class SFBulk2Type:
         * session -- Custom requests session, created in calling code. This
                      enables the use of requests Session features not otherwise
                      exposed by simple_salesforce.
+        * hooks -- `Hooks` fired around every HTTP call
+        * executor -- runs the uploads and downloads, the process wide
+                      `default_executor` if not given
         """
         self.object_name = object_name
         self.bulk2_url = bulk2_url
         self.session = session
         self.headers = headers
+        self.hooks = hooks
+        self.executor = executor
         self._client = _Bulk2Client(object_name,
                                     bulk2_url,
                                     headers,
-                                    session
+                                    session,
+                                    hooks
                                     )
 
     def _upload_data(
             self,
             operation: Operation,
-            data: Union[str, Tuple[int, str]],
+            data: Union[str, Tuple[int, _CsvChunk]],
             column_delimiter: ColumnDelimiter = ColumnDelimiter.COMMA,
             line_ending: LineEnding = LineEnding.LF,
             external_id_field: Optional[str] = None,
             wait: int = 5,
+            compression: Optional[Compression] = None,
             ) -> Dict[str, int]:
         """Upload data to Salesforce"""
-        unpacked_data: str
+        unpacked_data: Union[str, _CsvChunk]
         if isinstance(data,
                       tuple
                       ):
@@ -797,54 +1279,195 @@ class SFBulk2Type:
         else:
             total = _count_csv(
                 data=data,
-                line_ending=line_ending,
                 skip_header=True
                 )
             unpacked_data = data
-        res = self._client.create_job(
-            operation,
-            column_delimiter=column_delimiter,
-            line_ending=line_ending,
-            external_id_field=external_id_field,
-            )
-        job_id = res["id"]
-        try:
-            if res["state"] == JobState.open:
-                self._client.upload_job_data(job_id,
-                                             unpacked_data
-                                             )
-                self._client.close_job(job_id)
-                self._client.wait_for_job(job_id,
-                                          False,
-                                          wait
-                                          )
-                res = self._client.get_job(job_id,
-                                           False
-                                           )
-                return {
-                    "numberRecordsFailed": int(res["numberRecordsFailed"]),
-                    "numberRecordsProcessed": int(
-                        res["numberRecordsProcessed"]
-                        ),
-                    "numberRecordsTotal": int(total),
-                    "job_id": job_id,
-                    }
-            raise SalesforceBulkV2LoadError(
-                f"Failed to upload job data. Response content: {res}"
+        with span("bulk2.ingest_job", {
+                "salesforce.object": self.object_name,
+                "salesforce.bulk.operation": Operation(operation).value,
+                "salesforce.bulk.records": int(total),
+                }) as current:
+            res = self._client.create_job(
+                operation,
+                column_delimiter=column_delimiter,
+                line_ending=line_ending,
+                external_id_field=external_id_field,
+                )
+            job_id = res["id"]
+            set_attributes(current, {"salesforce.bulk.job_id": job_id})
+            try:
+                if res["state"] == JobState.open:
+                    self._client.upload_job_data(job_id,
+                                                 unpacked_data,
+                                                 compression=compression
+                                                 )
+                    self._client.close_job(job_id)
+                    self._client.wait_for_job(job_id,
+                                              False,
+                                              wait
+                                              )
+                    res = self._client.get_job(job_id,
+                                               False
+                                               )
+                    return _ingest_result(res, total)
+                raise SalesforceBulkV2LoadError(
+                    f"Failed to upload job data. Response content: {res}"
+                    )
+            except Exception:
+                self._abort_unfinished(job_id)
+                raise
+
+    def _abort_unfinished(self, job_id: str) -> None:
+        """Abort an ingest job that failed on the client side, unless it
+        already reached a final state"""
+        res = self._client.get_job(job_id,
+                                   False
+                                   )
+        if res["state"] in (
+                JobState.upload_complete,
+                JobState.in_progress,
+                JobState.open,
+                ):
+            self._client.abort_job(job_id,
+                                   False
+                                   )
+
+    # pylint:disable=too-many-locals
+    def _upload_chunks(
+            self,
+            operation: Operation,
+            chunks: Iterable[Tuple[int, _CsvChunk]],
+            workers: int,
+            column_delimiter: ColumnDelimiter,
+            line_ending: LineEnding,
+            external_id_field: Optional[str],
+            wait: int,
+            compression: Optional[Compression],
+            ) -> List[Dict[str, int]]:
+        """Upload chunks as jobs of their own, `workers` at a time, and
+        return the results in the order of the chunks
+
+        A chunk is only taken from `chunks` when a job finishes, so no more
+        than `workers` chunks are held at once, and the next job starts
+        without waiting for the slowest of the others. After an error, no
+        job is started, and the jobs already running are waited for.
+
+        The jobs are driven from the calling thread, which polls all of
+        them at once, and only their uploads run on the executor.
+
+        Arguments:
+
+        * operation -- Bulk operation of the jobs
+        * chunks -- the number of records and data of each chunk
+        * workers -- the number of jobs to run at once
+        * wait -- seconds between the first polls
+        * column_delimiter, line_ending, external_id_field, compression --
+          options of the jobs and their uploads, see `_upload_data`
+        """
+        executor = self.executor or default_executor()
+        numbered = enumerate(chunks)
+        running: List[_IngestJob] = []
+        results: Dict[int, Dict[str, int]] = {}
+        error: Optional[Exception] = None
+        delay, delay_cnt = 0.0, 0
+        with span("bulk2.ingest_jobs", {
+                "salesforce.object": self.object_name,
+                "salesforce.bulk.operation": Operation(operation).value,
+                }) as current:
+            while True:
+                for index, (total, data) in islice(
+                        numbered, 0 if error else workers - len(running)):
+                    try:
+                        res = self._client.create_job(
+                            operation,
+                            column_delimiter=column_delimiter,
+                            line_ending=line_ending,
+                            external_id_field=external_id_field,
+                            )
+                        if res["state"] != JobState.open:
+                            self._abort_unfinished(res["id"])
+                            raise SalesforceBulkV2LoadError(
+                                "Failed to upload job data. "
+                                f"Response content: {res}"
+                                )
+                    except Exception as job_error:  # pylint: disable=broad-exception-caught
+                        error = job_error
+                        break
+                    running.append(_IngestJob(
+                        index,
+                        total,
+                        res["id"],
+                        executor.submit(
+                            bind_context(self._client.upload_job_data),
+                            res["id"],
+                            data,
+                            compression=compression
+                            )
+                        ))
+                if not running:
+                    break
+                if delay < self._client.MAX_CHECK_INTERVAL_SECONDS:
+                    delay = wait + math.exp(delay_cnt) / 1000.0
+                    delay_cnt += 1
+                # wake up as soon as an upload is done, to close its job
+                uploads = [i.upload for i in running if i.upload is not None]
+                if uploads:
+                    concurrent.futures.wait(
+                        uploads, timeout=delay,
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+                else:
+                    sleep(delay)
+                for job in list(running):
+                    try:
+                        res = self._poll_job(job)
+                    except Exception as job_error:  # pylint: disable=broad-exception-caught
+                        running.remove(job)
+                        self._abort_unfinished(job.job_id)
+                        error = error or job_error
+                        continue
+                    if res is not None:
+                        running.remove(job)
+                        results[job.index] = _ingest_result(res, job.total)
+                        add_event(current, "bulk2.job_finished", {
+                            "salesforce.bulk.job_id": job.job_id,
+                            "salesforce.bulk.records_processed":
+                                res.get("numberRecordsProcessed"),
+                            "salesforce.bulk.records_failed":
+                                res.get("numberRecordsFailed"),
+                            })
+                        delay, delay_cnt = 0.0, 0
+            set_attributes(current, {"salesforce.bulk.jobs": len(results)})
+        if error is not None:
+            raise error
+        return [results[index] for index in range(len(results))]
+
+    def _poll_job(self, job: "_IngestJob") -> Optional[Dict[str, Any]]:
+        """Move an ingest job of `_upload_chunks` on: close it once its
+        upload is done, then return its info once it reached a final
+        state, None before"""
+        if job.upload is not None:
+            if not job.upload.done():
+                return None
+            job.upload.result()
+            job.upload = None
+            self._client.close_job(job.job_id)
+            job.expiration = datetime.datetime.now() + datetime.timedelta(
+                seconds=self._client.DEFAULT_WAIT_TIMEOUT_SECONDS)
+            return None
+        res = self._client.get_job(job.job_id,
+                                   False
+                                   )
+        if res["state"] in (JobState.job_complete,
+                            JobState.aborted,
+                            JobState.failed,
+                            ):
+            self._client.finish_job(res)
+            return cast(Dict[str, Any], res)
+        if job.expiration and datetime.datetime.now() > job.expiration:
+            raise SalesforceOperationError(
+                f"Job timeout. Job status: {res['state']}"
                 )
-        except Exception:
-            res = self._client.get_job(job_id,
-                                       False
-                                       )
-            if res["state"] in (
-                    JobState.upload_complete,
-                    JobState.in_progress,
-                    JobState.open,
-                    ):
-                self._client.abort_job(job_id,
-                                       False
-                                       )
-            raise
+        return None
 
     # pylint:disable=too-many-locals
     def _upload_file(
@@ -858,6 +1481,7 @@ class SFBulk2Type:
             external_id_field: Optional[str] = None,
             concurrency: int = 1,
             wait: int = 5,
+            compression: Optional[Compression] = None,
             ) -> List[Dict[str, int]]:
         """Upload csv file to Salesforce"""
         if csv_file and records:
@@ -896,38 +1520,36 @@ class SFBulk2Type:
             csv_file else _split_csv(records=records,
                                      max_records=batch_size
                                      )
-        if workers == 1:
-            for data in split_data:
-                result = self._upload_data(
+        with span("bulk2.load", {
+                "salesforce.object": self.object_name,
+                "salesforce.bulk.operation": Operation(operation).value,
+                "salesforce.bulk.concurrency": workers,
+                "salesforce.bulk.batch_size": batch_size,
+                }) as current:
+            if workers == 1:
+                for data in split_data:
+                    result = self._upload_data(
+                        operation,
+                        data,
+                        column_delimiter,
+                        line_ending,
+                        external_id_field,
+                        wait,
+                        compression,
+                        )
+                    results.append(result)
+            else:
+                results = self._upload_chunks(
                     operation,
-                    data,
+                    split_data,
+                    workers,
                     column_delimiter,
                     line_ending,
                     external_id_field,
                     wait,
+                    compression,
                     )
-                results.append(result)
-        else:
-            # OOM is possible if the file is too large
-            for chunks in chunked(split_data,
-                                  n=workers
-                                  ):
-                workers = min(workers,
-                              len(chunks)
-                              )
-                with ThreadPoolExecutor(max_workers=workers) as pool:
-                    multi_thread_worker = partial(
-                        self._upload_data,
-                        operation,
-                        column_delimiter=column_delimiter,
-                        line_ending=line_ending,
-                        external_id_field=external_id_field,
-                        wait=wait,
-                        )
-                    _results = pool.map(multi_thread_worker,
-                                        chunks
-                                        )
-                results.extend(list(_results))
+            set_attributes(current, {"salesforce.bulk.jobs": len(results)})
         return results
 
     def delete(
@@ -939,6 +1561,7 @@ class SFBulk2Type:
             line_ending: LineEnding = LineEnding.LF,
             external_id_field: Optional[str] = None,
             wait: int = 5,
+            compression: Optional[Compression] = None,
             ) -> List[Dict[str, int]]:
         """soft delete records"""
         return self._upload_file(
@@ -960,6 +1583,7 @@ class SFBulk2Type:
             line_ending=line_ending,
             external_id_field=external_id_field,
             wait=wait,
+            compression=compression,
             )
 
     def insert(
@@ -971,6 +1595,7 @@ class SFBulk2Type:
             column_delimiter: ColumnDelimiter = ColumnDelimiter.COMMA,
             line_ending: LineEnding = LineEnding.LF,
             wait: int = 5,
+            compression: Optional[Compression] = None,
             ) -> List[Dict[str, int]]:
         """insert records"""
         return self._upload_file(
@@ -992,6 +1617,7 @@ class SFBulk2Type:
             line_ending=line_ending,
             concurrency=concurrency,
             wait=wait,
+            compression=compression,
             )
 
     def upsert(
@@ -1003,6 +1629,7 @@ class SFBulk2Type:
             column_delimiter: ColumnDelimiter = ColumnDelimiter.COMMA,
             line_ending: LineEnding = LineEnding.LF,
             wait: int = 5,
+            compression: Optional[Compression] = None,
             ) -> List[Dict[str, int]]:
         """upsert records based on a unique identifier"""
         return self._upload_file(
@@ -1024,6 +1651,7 @@ class SFBulk2Type:
             line_ending=line_ending,
             external_id_field=external_id_field,
             wait=wait,
+            compression=compression,
             )
 
     def update(
@@ -1034,6 +1662,7 @@ class SFBulk2Type:
             column_delimiter: ColumnDelimiter = ColumnDelimiter.COMMA,
             line_ending: LineEnding = LineEnding.LF,
             wait: int = 5,
+            compression: Optional[Compression] = None,
             ) -> List[Dict[str, int]]:
         """update records"""
         return self._upload_file(
@@ -1054,6 +1683,7 @@ class SFBulk2Type:
             column_delimiter=column_delimiter,
             line_ending=line_ending,
             wait=wait,
+            compression=compression,
             )
 
     def hard_delete(
@@ -1064,6 +1694,7 @@ class SFBulk2Type:
             column_delimiter: ColumnDelimiter = ColumnDelimiter.COMMA,
             line_ending: LineEnding = LineEnding.LF,
             wait: int = 5,
+            compression: Optional[Compression] = None,
             ) -> List[Dict[str, int]]:
         """hard delete records"""
         return self._upload_file(
@@ -1084,6 +1715,7 @@ class SFBulk2Type:
             column_delimiter=column_delimiter,
             line_ending=line_ending,
             wait=wait,
+            compression=compression,
             )
 
     def query(
@@ -1093,12 +1725,18 @@ class SFBulk2Type:
             column_delimiter: ColumnDelimiter = ColumnDelimiter.COMMA,
             line_ending: LineEnding = LineEnding.LF,
             wait: int = 5,
+            compression: Optional[Compression] = None,
+            concurrency: int = 1,
             ) -> Generator[Union[str, int], None, None]:
         """bulk 2.0 query
 
         Arguments:
         * query -- SOQL query
         * max_records -- max records to retrieve per batch, default 50000
+        * compression -- have the results sent compressed, they are
+                         decompressed as they are read
+        * concurrency -- the number of batches to download at once, they
+                         are still yielded in order
 
         Returns:
         * locator  -- the locator for the next set of results
@@ -1117,16 +1755,11 @@ class SFBulk2Type:
                                   wait
                                   )
 
-        locator = "INIT"
-        while locator:
-            if locator == "INIT":
-                locator = ""
-            result = self._client.get_query_results(
-                job_id,
-                locator,
-                max_records
-                )
-            locator = result["locator"]
+        for result in self._get_query_pages(job_id,
+                                            max_records,
+                                            compression,
+                                            concurrency
+                                            ):
             yield result["records"]
 
     def query_all(
@@ -1136,12 +1769,18 @@ class SFBulk2Type:
             column_delimiter: ColumnDelimiter = ColumnDelimiter.COMMA,
             line_ending: LineEnding = LineEnding.LF,
             wait: int = 5,
+            compression: Optional[Compression] = None,
+            concurrency: int = 1,
             ) -> Generator[str, None, None]:
         """bulk 2.0 query_all
 
         Arguments:
         * query -- SOQL query
         * max_records -- max records to retrieve per batch, default 50000
+        * compression -- have the results sent compressed, they are
+                         decompressed as they are read
+        * concurrency -- the number of batches to download at once, they
+                         are still yielded in order
 
         Returns:
         * locator  -- the locator for the next set of results
@@ -1160,16 +1799,11 @@ class SFBulk2Type:
                                   wait
                                   )
 
-        locator = "INIT"
-        while locator:
-            if locator == "INIT":
-                locator = ""
-            result = self._client.get_query_results(
-                job_id,
-                locator,
-                max_records
-                )
-            locator = result["locator"]
+        for result in self._get_query_pages(job_id,
+                                            max_records,
+                                            compression,
+                                            concurrency
+                                            ):
             yield result["records"]
 
     def download(
@@ -1180,12 +1814,23 @@ class SFBulk2Type:
             column_delimiter: ColumnDelimiter = ColumnDelimiter.COMMA,
             line_ending: LineEnding = LineEnding.LF,
             wait: int = 5,
+            compression: Optional[Compression] = None,
+            single_file: bool = False,
+            prefetch: bool = False,
+            concurrency: int = 1,
             ) -> List[QueryResult]:
         """bulk 2.0 query stream to file, avoiding high memory usage
 
         Arguments:
         * query -- SOQL query
         * max_records -- max records to retrieve per batch, default 50000
+        * compression -- have the results sent compressed, they are
+                         decompressed as they are read
+        * single_file -- write every batch to one file, with one header row
+        * prefetch -- request the next batch while the current one is
+                      written
+        * concurrency -- the number of batches to download at once, they
+                         are still written in order
 
         Returns:
         * locator  -- the locator for the next set of results
@@ -1207,21 +1852,185 @@ class SFBulk2Type:
                                   wait
                                   )
 
-        results = []
-        locator = "INIT"
-        while locator:
-            if locator == "INIT":
-                locator = ""
-            result = self._client.download_job_data(
-                path,
-                job_id,
-                locator,
-                max_records
-                )
-            locator = result["locator"]
-            results.append(result)
+        if concurrency > 1 and self._client.supports_result_pages():
+            return self._download_pages(job_id,
+                                        path,
+                                        max_records,
+                                        compression,
+                                        single_file,
+                                        concurrency
+                                        )
+        results: List[QueryResult] = []
+        bos: Optional[IO[bytes]] = None
+        skip_header = False
+        try:
+            for result in self._open_query_pages(job_id,
+                                                 max_records,
+                                                 compression,
+                                                 prefetch or concurrency > 1
+                                                 ):
+                with closing(result):
+                    locator, number_of_records = self._client.query_page(
+                        result)
+                    if bos is None or not single_file:
+                        if bos is not None:
+                            bos.close()
+                        # pylint: disable-next=consider-using-with
+                        bos = tempfile.NamedTemporaryFile(
+                            "wb",
+                            dir=path,
+                            suffix=".csv",
+                            delete=False
+                            )
+                        results.append({"locator": "",
+                                        "number_of_records": 0,
+                                        "file": bos.name})
+                        skip_header = False
+                    self._client.write_query_results(result, bos, skip_header)
+                    skip_header = True
+                results[-1]["locator"] = locator
+                results[-1]["number_of_records"] += number_of_records
+        finally:
+            if bos is not None:
+                bos.close()
         return results
 
+    def _download_pages(
+            self,
+            job_id: str,
+            path: str,
+            max_records: int,
+            compression: Optional[Compression],
+            single_file: bool,
+            concurrency: int
+            ) -> List[QueryResult]:
+        """Download the pages of results of a completed query job to files
+        of their own, `concurrency` at once, see `get_result_pages`. With
+        `single_file`, the files are moved in order into one file as soon
+        as they are complete."""
+        pages = _map_ordered(
+            self.executor or default_executor(),
+            bind_context(partial(self._client.download_job_data,
+                                 path,
+                                 job_id,
+                                 max_records=max_records,
+                                 compression=compression
+                                 )),
+            self._client.get_result_pages(job_id, max_records),
+            concurrency
+            )
+        if not single_file:
+            return list(pages)
+        number_of_records = 0
+        with tempfile.NamedTemporaryFile(
+                "wb",
+                dir=path,
+                suffix=".csv",
+                delete=False
+                ) as bos:
+            first_page = True
+            for page in pages:
+                _append_file(bos, page["file"], not first_page)
+                first_page = False
+                number_of_records += page["number_of_records"]
+        return [{
+            "locator": "",
+            "number_of_records": number_of_records,
+            "file": bos.name,
+            }]
+
+    def _open_query_pages(
+            self,
+            job_id: str,
+            max_records: int,
+            compression: Optional[Compression],
+            prefetch: bool
+            ) -> Iterator[requests.Response]:
+        """Yield each page of results of a completed query job, in order,
+        as a response that is read and closed before the next one
+
+        Each page gives the locator of the next one. With `prefetch`, the
+        next page is requested as soon as the headers of the current one
+        have arrived, so it is on its way while the current one is read.
+        """
+        fetch = bind_context(partial(
+            self._client.open_query_results,
+            job_id,
+            max_records=max_records,
+            compression=compression
+            ))
+        upcoming: Optional["concurrent.futures.Future[requests.Response]"] = \
+            None
+        result = fetch("")
+        try:
+            while True:
+                locator, _ = self._client.query_page(result)
+                if locator and prefetch:
+                    upcoming = (self.executor or default_executor()
+                                ).submit(fetch, locator)
+                yield result
+                if not locator:
+                    return
+                result = upcoming.result() if upcoming else fetch(locator)
+                upcoming = None
+        finally:
+            if upcoming is not None:
+                upcoming.add_done_callback(_close_result)
+
+    def _get_query_pages(
+            self,
+            job_id: str,
+            max_records: int,
+            compression: Optional[Compression],
+            concurrency: int
+            ) -> Iterator[QueryResult]:
+        """Yield the pages of results of a completed query job in order
+
+        With `concurrency`, up to that many pages are downloaded at once if
+        the API version lists them, see `get_result_pages`. Otherwise, the
+        next page is requested while the current one is read.
+        """
+        if concurrency == 1:
+            locator = "INIT"
+            while locator:
+                if locator == "INIT":
+                    locator = ""
+                result = self._client.get_query_results(
+                    job_id,
+                    locator,
+                    max_records,
+                    compression=compression
+                    )
+                locator = result["locator"]
+                yield result
+        elif self._client.supports_result_pages():
+            yield from _map_ordered(
+                self.executor or default_executor(),
+                bind_context(partial(self._client.get_query_results,
+                                     job_id,
+                                     max_records=max_records,
+                                     compression=compression
+                                     )),
+                self._client.get_result_pages(job_id, max_records),
+                concurrency
+                )
+        else:
+            for page in self._open_query_pages(job_id,
+                                               max_records,
+                                               compression,
+                                               True
+                                               ):
+                with closing(page):
+                    locator, number_of_records = self._client.query_page(
+                        page)
+                    records = self._client.filter_null_bytes(
+                        page.content.decode("utf-8"))
+                yield {
+                    "locator": locator,
+                    "number_of_records": number_of_records,
+                    "records": records,
+                    }
+
     def _retrieve_ingest_records(
             self,
             job_id: str,
@@ -1,6 +1,7 @@
 """ Class to work with Salesforce Metadata API """
 
 from base64 import b64encode, b64decode
+from collections import OrderedDict
 from pathlib import Path
 from typing import Any, Dict, IO, List, Mapping, Optional, Tuple, Union
 from xml.etree import ElementTree as ET
@@ -8,14 +9,76 @@ from xml.etree.ElementTree import Element
 
 import requests
 from zeep.proxy import ServiceProxy
+from zeep.transports import Transport
 from zeep.xsd import AnySimpleType, ComplexType, CompoundValue
 
-from .util import Headers, call_salesforce
+from .util import Headers, Hooks, call_salesforce, send_request
 from .messages import DEPLOY_MSG, CHECK_DEPLOY_STATUS_MSG, \
     CHECK_RETRIEVE_STATUS_MSG, RETRIEVE_MSG
 from zeep import Client, Settings
 
 
+class SessionTransport(Transport):
+    """
+    Zeep transport that sends SOAP calls through an existing requests session
+
+    Reusing the session of the ``Salesforce`` instance lets Metadata API calls
+    share its connection pool, proxies, mounted adapters and hooks with the
+    REST calls. ``zeep.transports.Transport`` overwrites the session's
+    User-Agent and mounts a ``file://`` adapter on it; both are undone here so
+    that the shared session is left as the caller configured it.
+    """
+    def __init__(
+            self,
+            session: requests.Session,
+            hooks: Optional[Hooks] = None,
+            **kwargs: Any):
+        """
+        Initialize the transport
+
+        :param session: Session to send SOAP calls through
+        :type session: requests.Session
+        :param hooks: Hooks fired around every SOAP call
+        :type hooks: simple_salesforce.util.Hooks
+        :param kwargs: Parameters to pass to zeep.transports.Transport
+        """
+        self.hooks = hooks
+        user_agent = session.headers.get('User-Agent')
+        adapters = OrderedDict(session.adapters)
+        super().__init__(  # type: ignore[no-untyped-call]
+            session=session, **kwargs)
+        session.adapters = adapters
+        if user_agent is None:
+            session.headers.pop('User-Agent', None)
+        else:
+            session.headers['User-Agent'] = user_agent
+
+    def post(
+            self,
+            address: str,
+            message: Union[str, bytes],
+            headers: Headers) -> requests.Response:
+        """
+        Posts a SOAP message, firing the hooks around the call
+
+        :param address: The URL for the request
+        :param message: The content for the body
+        :param headers: a dictionary with the HTTP headers
+        """
+        if not self.hooks:
+            return super().post(  # type: ignore[no-untyped-call,no-any-return]
+                address, message, headers)
+        action = headers.get('SOAPAction', '').strip('"')
+        return send_request(self.session,
+                            'POST',
+                            address,
+                            name=f'metadata.{action}',
+                            hooks=self.hooks,
+                            data=message,
+                            headers=headers,
+                            timeout=self.operation_timeout)
+
+
 class MetadataType:
     """
     Salesforce Metadata Type
@@ -210,22 +273,28 @@ class SfdcMetadataApi:
             instance: str,
             metadata_url: str,
             headers: Headers,
-            api_version: Optional[str]):
+            api_version: Optional[str],
+            hooks: Optional[Hooks] = None):
         """ Initialize and check session """
         self.session = session
+        self.hooks = hooks
         self._session_id = session_id
         self._instance = instance
         self.metadata_url = metadata_url
         self.headers = headers
         self._api_version = api_version
         self._deploy_zip = None
+        # The WSDL is passed as a plain path so that zeep reads it from disk
+        # rather than through the shared session.
         wsdl_path = Path(__file__).parent / 'metadata.wsdl'
         self._client = Client(
-            wsdl_path.absolute().as_uri(),
+            str(wsdl_path.absolute()),
             settings=Settings(
                 strict=False,
                 xsd_ignore_sequence_order=True
-            ))  # type: ignore[no-untyped-call]
+            ),
+            transport=SessionTransport(session, hooks=hooks)
+        )  # type: ignore[no-untyped-call]
         self._service = self._client.create_service(
             "{http://soap.sforce.com/2006/04/metadata}MetadataBinding",
             self.metadata_url)  # type: ignore[no-untyped-call]
@@ -330,6 +399,8 @@ class SfdcMetadataApi:
         result = call_salesforce(url=self.metadata_url + 'deployRequest',
                                  method='POST',
                                  session=self.session,
+                                 name='metadata.deploy',
+                                 hooks=self.hooks,
                                  headers=self.headers,
                                  additional_headers=headers,
                                  data=request)
@@ -391,6 +462,8 @@ class SfdcMetadataApi:
             url=self.metadata_url + 'deployRequest/' + async_process_id,
             method='POST',
             session=self.session,
+            name='metadata.check_deploy_status',
+            hooks=self.hooks,
             headers=self.headers,
             additional_headers=headers,
             data=mt_request)
@@ -546,6 +619,8 @@ class SfdcMetadataApi:
             url=self.metadata_url + 'deployRequest/' + async_process_id,
             method='POST',
             session=self.session,
+            name='metadata.retrieve',
+            hooks=self.hooks,
             headers=self.headers,
             additional_headers=headers,
             data=request)
@@ -584,6 +659,8 @@ class SfdcMetadataApi:
             url=self.metadata_url + 'deployRequest/' + async_process_id,
             method='POST',
             session=self.session,
+            name='metadata.check_retrieve_status',
+            hooks=self.hooks,
             headers=self.headers,
             additional_headers=headers,
             data=mt_request)
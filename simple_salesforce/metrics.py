@@ -0,0 +1,462 @@
+""" Metrics for API usage, latency and bulk throughput """
+
+import math
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from typing_extensions import Protocol
+
+from .util import BulkEvent, Hooks, PerAppUsage, ResponseInfo, \
+    exception_class
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, math.inf
+    )
+# records per second, for the throughput of bulk batches and jobs
+THROUGHPUT_BUCKETS = (
+    10.0, 50.0, 100.0, 500.0, 1e3, 5e3, 1e4, 5e4, 1e5, math.inf
+    )
+
+
+class CounterChild(Protocol):
+    """A counter for one set of label values"""
+
+    def inc(self, amount: float = 1) -> None:
+        """Increment the counter by `amount`"""
+
+
+class GaugeChild(Protocol):
+    """A gauge for one set of label values"""
+
+    def set(self, value: float) -> None:
+        """Set the gauge to `value`"""
+
+
+class HistogramChild(Protocol):
+    """A histogram for one set of label values"""
+
+    def observe(self, amount: float) -> None:
+        """Record an observation"""
+
+
+class CounterMetric(Protocol):
+    """A labelled counter"""
+
+    def labels(self, *values: str) -> CounterChild:
+        """Returns the child for the given label values"""
+
+
+class GaugeMetric(Protocol):
+    """A labelled gauge"""
+
+    def labels(self, *values: str) -> GaugeChild:
+        """Returns the child for the given label values"""
+
+
+class HistogramMetric(Protocol):
+    """A labelled histogram"""
+
+    def labels(self, *values: str) -> HistogramChild:
+        """Returns the child for the given label values"""
+
+
+class Registry(Protocol):
+    """Factory for the metrics kept by `SalesforceMetrics`
+
+    `MetricsRegistry` is the built-in implementation. Any object with these
+    three methods can be passed instead, for example a thin adapter creating
+    `prometheus_client` metrics, whose `labels()` children already provide
+    `inc`, `set` and `observe`, and whose histograms take `buckets` too.
+    """
+
+    def counter(self,
+                name: str,
+                documentation: str,
+                labelnames: Sequence[str]
+                ) -> CounterMetric:
+        """Create a counter"""
+
+    def gauge(self,
+              name: str,
+              documentation: str,
+              labelnames: Sequence[str]
+              ) -> GaugeMetric:
+        """Create a gauge"""
+
+    def histogram(self,
+                  name: str,
+                  documentation: str,
+                  labelnames: Sequence[str],
+                  buckets: Sequence[float] = DEFAULT_BUCKETS
+                  ) -> HistogramMetric:
+        """Create a histogram with the given upper bounds of its buckets"""
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the Prometheus text format"""
+    return (value.replace('\\', '\\\\')
+            .replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Format label pairs as `{name="value",...}`"""
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"'
+                     for name, value in zip(names, values))
+    return f'{{{pairs}}}'
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value for the Prometheus text format"""
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    """Base class of the built-in metrics"""
+    kind = ''
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 labelnames: Sequence[str]
+                 ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _check(self, values: Sequence[str]) -> LabelValues:
+        """Validate label values against the label names"""
+        if len(values) != len(self.labelnames):
+            raise ValueError(
+                f'{self.name} expects labels {self.labelnames}, got {values}'
+                )
+        return tuple(str(i) for i in values)
+
+    @abstractmethod
+    def samples(self) -> Iterable[str]:
+        """Sample lines in the Prometheus text format"""
+
+    def render(self) -> str:
+        """Render the metric in the Prometheus text format"""
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class _Value:
+    """Counter or gauge value for one set of label values"""
+
+    def __init__(self, lock: threading.Lock):
+        self._lock = lock
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        """Increment the value by `amount`"""
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float) -> None:
+        """Set the value"""
+        with self._lock:
+            self.value = value
+
+
+class Counter(_Metric):
+    """A monotonically increasing counter"""
+    kind = 'counter'
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 labelnames: Sequence[str] = ()
+                 ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, _Value] = {}
+
+    def labels(self, *values: str) -> _Value:
+        """Returns the child for the given label values"""
+        key = self._check(values)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = _Value(self._lock)
+            return self._values[key]
+
+    def value(self, *values: str) -> float:
+        """Current value for the given label values"""
+        child = self._values.get(self._check(values))
+        return child.value if child else 0.0
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, child in items:
+            labels = _format_labels(self.labelnames, key)
+            yield f'{self.name}{labels} {_format_value(child.value)}'
+
+
+class Gauge(Counter):
+    """A value that can go up and down"""
+    kind = 'gauge'
+
+
+class _Buckets:
+    """Histogram buckets for one set of label values"""
+
+    def __init__(self, lock: threading.Lock, upper_bounds: Sequence[float]):
+        self._lock = lock
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * len(upper_bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, amount: float) -> None:
+        """Record an observation"""
+        with self._lock:
+            self.sum += amount
+            self.count += 1
+            for i, bound in enumerate(self.upper_bounds):
+                if amount <= bound:
+                    self.counts[i] += 1
+                    break
+
+
+class Histogram(_Metric):
+    """Observations counted in cumulative buckets"""
+    kind = 'histogram'
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS
+                 ):
+        super().__init__(name, documentation, labelnames)
+        bounds = sorted(float(i) for i in buckets)
+        if bounds[-1] != math.inf:
+            bounds.append(math.inf)
+        self.buckets = tuple(bounds)
+        self._values: Dict[LabelValues, _Buckets] = {}
+
+    def labels(self, *values: str) -> _Buckets:
+        """Returns the child for the given label values"""
+        key = self._check(values)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = _Buckets(self._lock, self.buckets)
+            return self._values[key]
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(key, list(child.counts), child.sum, child.count)
+                     for key, child in sorted(self._values.items())]
+        bucket_names = self.labelnames + ('le',)
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(bucket_names,
+                                        key + (_format_value(bound),))
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labelnames, key)
+            yield f'{self.name}_sum{labels} {_format_value(total)}'
+            yield f'{self.name}_count{labels} {count}'
+
+
+class MetricsRegistry:
+    """In-process registry rendering metrics in the Prometheus text format"""
+
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> None:
+        """Register a metric, refusing duplicate names"""
+        with self._lock:
+            if any(i.name == metric.name for i in self._metrics):
+                raise ValueError(f'Duplicate metric {metric.name}')
+            self._metrics.append(metric)
+
+    def counter(self,
+                name: str,
+                documentation: str,
+                labelnames: Sequence[str] = ()
+                ) -> Counter:
+        """Create and register a counter"""
+        metric = Counter(name, documentation, labelnames)
+        self._register(metric)
+        return metric
+
+    def gauge(self,
+              name: str,
+              documentation: str,
+              labelnames: Sequence[str] = ()
+              ) -> Gauge:
+        """Create and register a gauge"""
+        metric = Gauge(name, documentation, labelnames)
+        self._register(metric)
+        return metric
+
+    def histogram(self,
+                  name: str,
+                  documentation: str,
+                  labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS
+                  ) -> Histogram:
+        """Create and register a histogram"""
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._register(metric)
+        return metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics)
+        return ''.join(metric.render() + '\n' for metric in metrics)
+
+
+# pylint: disable=too-many-instance-attributes
+class SalesforceMetrics:
+    """Counters and histograms fed by the hooks of a `Salesforce` instance
+
+    Usage:
+
+        metrics = SalesforceMetrics()
+        metrics.install(sf.hooks)
+        ...
+        print(metrics.render())
+
+    Arguments:
+
+    * registry -- where metrics are created, a new `MetricsRegistry` by
+                  default. Any object implementing `Registry` can be given.
+    * prefix -- prefix of every metric name
+    """
+
+    def __init__(self,
+                 registry: Optional[Registry] = None,
+                 prefix: str = 'salesforce'
+                 ):
+        self.registry: Registry = registry or MetricsRegistry()
+        self.requests = self.registry.counter(
+            f'{prefix}_requests_total',
+            'HTTP calls made to Salesforce',
+            ('operation', 'method', 'status')
+            )
+        self.errors = self.registry.counter(
+            f'{prefix}_errors_total',
+            'HTTP calls that failed, by the exception raised for them',
+            ('operation', 'exception')
+            )
+        self.latency = self.registry.histogram(
+            f'{prefix}_request_duration_seconds',
+            'Latency of HTTP calls made to Salesforce',
+            ('operation', 'method', 'endpoint')
+            )
+        self.bytes = self.registry.counter(
+            f'{prefix}_transferred_bytes_total',
+            'Bytes uploaded to or downloaded from Salesforce',
+            ('operation', 'direction')
+            )
+        self.api_usage = self.registry.gauge(
+            f'{prefix}_api_usage',
+            'API requests used in the last 24 hours, per Sforce-Limit-Info',
+            ('app',)
+            )
+        self.api_limit = self.registry.gauge(
+            f'{prefix}_api_limit',
+            'API request limit for 24 hours, per Sforce-Limit-Info',
+            ('app',)
+            )
+        self.bulk_batches = self.registry.counter(
+            f'{prefix}_bulk_batches_total',
+            'Bulk API batches that reached a final state',
+            ('object', 'operation', 'state')
+            )
+        self.bulk2_jobs = self.registry.counter(
+            f'{prefix}_bulk2_jobs_total',
+            'Bulk 2.0 jobs that reached a final state',
+            ('object', 'operation', 'state')
+            )
+        self.bulk_records = self.registry.counter(
+            f'{prefix}_bulk_records_total',
+            'Records processed by bulk batches and jobs',
+            ('api', 'object', 'operation', 'result')
+            )
+        self.bulk_throughput = self.registry.histogram(
+            f'{prefix}_bulk_records_per_second',
+            'Server side throughput of finished bulk batches and jobs',
+            ('api', 'object', 'operation'),
+            buckets=THROUGHPUT_BUCKETS
+            )
+
+    def install(self, hooks: Hooks) -> None:
+        """Register the metric hooks, e.g. `metrics.install(sf.hooks)`"""
+        hooks.register_after_response(self.observe_response)
+        hooks.register_bulk_event(self.observe_bulk_event)
+
+    def observe_response(self, info: ResponseInfo) -> None:
+        """Record a completed HTTP call"""
+        operation = info.name or info.url_template
+        self.requests.labels(operation, info.method, str(info.status)).inc()
+        self.latency.labels(
+            operation, info.method, info.url_template
+            ).observe(info.elapsed)
+        if info.exception is not None:
+            self.errors.labels(
+                operation, type(info.exception).__name__
+                ).inc()
+        elif info.status >= 300:
+            self.errors.labels(
+                operation, exception_class(info.status).__name__
+                ).inc()
+        if info.request_bytes:
+            self.bytes.labels(operation, 'upload').inc(info.request_bytes)
+        if info.response_bytes:
+            self.bytes.labels(operation, 'download').inc(info.response_bytes)
+        for usage in info.api_usage.values():
+            app = usage.name if isinstance(usage, PerAppUsage) else ''
+            self.api_usage.labels(app).set(usage.used)
+            self.api_limit.labels(app).set(usage.total)
+
+    def observe_bulk_event(self, event: BulkEvent) -> None:
+        """Record a finished bulk batch or job"""
+        states: CounterMetric = (
+            self.bulk_batches if event.api == 'bulk' else self.bulk2_jobs
+            )
+        states.labels(event.object_name, event.operation, event.state).inc()
+        succeeded = event.records_processed - event.records_failed
+        if succeeded:
+            self.bulk_records.labels(
+                event.api, event.object_name, event.operation, 'success'
+                ).inc(succeeded)
+        if event.records_failed:
+            self.bulk_records.labels(
+                event.api, event.object_name, event.operation, 'failure'
+                ).inc(event.records_failed)
+        if event.processing_time and event.records_processed:
+            self.bulk_throughput.labels(
+                event.api, event.object_name, event.operation
+                ).observe(event.records_processed / event.processing_time)
+
+    def render(self) -> str:
+        """Render the metrics in the Prometheus text exposition format
+
+        Only available with the built-in `MetricsRegistry`.
+        """
+        if not isinstance(self.registry, MetricsRegistry):
+            raise TypeError(
+                'render() needs the built-in MetricsRegistry, use the '
+                'exporter of the registry that was passed instead'
+                )
+        return self.registry.render()
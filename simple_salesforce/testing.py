@@ -0,0 +1,1534 @@
+""" Local stand-in for a Salesforce org, for tests and benchmarks
+
+`FakeOrg` keeps records in memory and answers the REST, Bulk and Bulk 2.0
+endpoints used by this package. It is mounted on a `requests.Session` as a
+transport adapter, so a regular `Salesforce` client talks to it without any
+network access:
+
+    org = FakeOrg()
+    org.add_records('Contact', [{'LastName': 'Doe'}])
+    sf = org.client()
+    sf.query_all('SELECT Id, LastName FROM Contact')
+"""
+
+import base64
+import csv
+import gzip
+import io
+import json
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Mapping, \
+    NamedTuple, Optional, Pattern, Sequence, Tuple, Union
+from urllib.parse import parse_qs, unquote, urlparse
+from xml.etree import ElementTree
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from .api import DEFAULT_API_VERSION, Salesforce
+
+# Request handlers are named after, and documented by, their routes.
+# pylint: disable=missing-function-docstring
+
+Record = Dict[str, Any]
+Reply = Tuple[int, Dict[str, str], bytes]
+Latency = Union[float, Callable[[str, str], float]]
+
+KEY_PREFIXES = {
+    'account': '001',
+    'contact': '003',
+    'user': '005',
+    'opportunity': '006',
+    'lead': '00Q',
+    'task': '00T',
+    'case': '500',
+    }
+JOB_PREFIX = '750'
+BATCH_PREFIX = '751'
+RESULT_PREFIX = '752'
+QUERY_LOCATOR_PREFIX = '01g'
+ASYNC_API_NAMESPACE = 'http://www.force.com/2009/06/asyncapi/dataload'
+
+BULK_BATCH_RECORD_LIMIT = 10_000
+BULK_BATCH_CHAR_LIMIT = 10_000_000
+BULK_PK_CHUNK_SIZE = 100_000
+BULK2_UPLOAD_BYTE_LIMIT = 150 * 1024 * 1024
+BULK2_RESULT_PAGE_LINKS = 1000
+BULK2_RESULT_PAGES_VERSION = 62.0
+
+_DELIMITERS = {
+    'BACKQUOTE': '`',
+    'CARET': '^',
+    'COMMA': ',',
+    'PIPE': '|',
+    'SEMICOLON': ';',
+    'TAB': '\t',
+    }
+_LINE_ENDINGS = {'LF': '\n', 'CRLF': '\r\n'}
+
+
+class FakeRequest(NamedTuple):
+    """An HTTP request as seen by `FakeOrg`"""
+    method: str
+    path: str
+    params: Dict[str, str]
+    headers: Mapping[str, str]
+    body: bytes
+
+    def json(self) -> Any:
+        """Decode the body as JSON"""
+        return json.loads(self.body.decode('utf-8') or 'null')
+
+    @property
+    def text(self) -> str:
+        """The body as text"""
+        return self.body.decode('utf-8')
+
+
+class FakeFault(NamedTuple):
+    """An error the org will answer with instead of handling a request"""
+    status: int
+    error_code: str
+    message: str
+    method: Optional[str]
+    path: Optional[Pattern[str]]
+
+
+class SalesforceFakeError(Exception):
+    """Raised by handlers to answer with a Salesforce error"""
+
+    def __init__(self, status: int, error_code: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.error_code = error_code
+        self.message = message
+
+
+def _json(status: int, content: Any) -> Reply:
+    return (status, {'Content-Type': 'application/json;charset=UTF-8'},
+            json.dumps(content).encode('utf-8'))
+
+
+def _to_xml(parent: ElementTree.Element, content: Any, item_tag: str
+            ) -> None:
+    if isinstance(content, dict):
+        for key, value in content.items():
+            if value is not None:
+                _to_xml(ElementTree.SubElement(parent, key), value, item_tag)
+    elif isinstance(content, list):
+        for value in content:
+            _to_xml(ElementTree.SubElement(parent, item_tag), value, item_tag)
+    elif isinstance(content, bool):
+        parent.text = 'true' if content else 'false'
+    else:
+        parent.text = str(content)
+
+
+def _xml(status: int, root: str, content: Any, item_tag: str = '') -> Reply:
+    element = ElementTree.Element(root, xmlns=ASYNC_API_NAMESPACE)
+    _to_xml(element, content, item_tag)
+    return (status, {'Content-Type': 'application/xml'},
+            ElementTree.tostring(element, encoding='utf-8'))
+
+
+def _csv(content: str, headers: Optional[Dict[str, str]] = None) -> Reply:
+    return (200, dict(headers or {}, **{'Content-Type': 'text/csv'}),
+            content.encode('utf-8'))
+
+
+def _now() -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%S.000+0000', time.gmtime())
+
+
+def _error(status_code: str, message: str, fields: Sequence[str] = ()
+           ) -> Dict[str, Any]:
+    return {'statusCode': status_code, 'message': message,
+            'fields': list(fields)}
+
+
+# ---------------------------------------------------------------- SOQL ---
+
+_SOQL = re.compile(
+    r'^\s*SELECT\s+(?P<fields>.+?)\s+FROM\s+(?P<sobject>\w+)'
+    r'(?:\s+WHERE\s+(?P<where>.+?))?'
+    r'(?:\s+ORDER\s+BY\s+(?P<order>\w+)(?:\s+(?P<direction>ASC|DESC))?)?'
+    r'(?:\s+LIMIT\s+(?P<limit>\d+))?'
+    r'(?:\s+OFFSET\s+(?P<offset>\d+))?\s*$',
+    re.IGNORECASE | re.DOTALL
+    )
+_VALUE = r"'(?:[^'\\]|\\.)*'|\([^)]*\)|[\w.:+-]+"
+_CONDITION = re.compile(
+    rf'\s*(?P<field>\w+)\s*(?P<op>!=|<>|<=|>=|=|<|>|NOT\s+IN|IN|LIKE)\s*'
+    rf'(?P<value>{_VALUE})\s*(?P<conj>AND\s+|$)',
+    re.IGNORECASE
+    )
+_LIST_ITEM = re.compile(_VALUE)
+
+
+def _literal(token: str) -> Any:
+    """Decode a SOQL literal"""
+    if token.startswith("'"):
+        return re.sub(r'\\(.)', r'\1', token[1:-1])
+    lowered = token.lower()
+    if lowered == 'null':
+        return None
+    if lowered in ('true', 'false'):
+        return lowered == 'true'
+    try:
+        return int(token)
+    except ValueError:
+        pass
+    try:
+        return float(token)
+    except ValueError:
+        return token
+
+
+def _like(value: Any, pattern: str) -> bool:
+    regex = ''.join('.*' if c == '%' else '.' if c == '_' else re.escape(c)
+                    for c in pattern)
+    return re.fullmatch(regex, str(value or ''), re.IGNORECASE) is not None
+
+
+def _compare(value: Any, operator: str, expected: Any) -> bool:
+    # pylint: disable=too-many-return-statements
+    operator = ' '.join(operator.upper().split())
+    if operator == '=':
+        return bool(value == expected)
+    if operator in ('!=', '<>'):
+        return bool(value != expected)
+    if operator == 'IN':
+        return value in expected
+    if operator == 'NOT IN':
+        return value not in expected
+    if operator == 'LIKE':
+        return _like(value, expected)
+    if value is None or expected is None:
+        return False
+    if operator == '<':
+        return bool(value < expected)
+    if operator == '>':
+        return bool(value > expected)
+    if operator == '<=':
+        return bool(value <= expected)
+    return bool(value >= expected)
+
+
+class Soql(NamedTuple):
+    """A parsed query in the subset of SOQL understood by `FakeOrg`
+
+    Supported: field lists or `COUNT()`, a single object, `WHERE` conditions
+    joined by `AND` (`=`, `!=`, `<`, `>`, `<=`, `>=`, `IN`, `NOT IN`,
+    `LIKE`), `ORDER BY` one field, `LIMIT` and `OFFSET`.
+    """
+    fields: List[str]
+    sobject: str
+    conditions: List[Tuple[str, str, Any]]
+    order: Optional[Tuple[str, bool]]
+    limit: Optional[int]
+    offset: int
+
+    @property
+    def is_count(self) -> bool:
+        """Whether this is a `SELECT COUNT()` query"""
+        return [i.upper() for i in self.fields] == ['COUNT()']
+
+    @classmethod
+    def parse(cls, query: str) -> 'Soql':
+        """Parse `query`, raising `SalesforceFakeError` if unsupported"""
+        match = _SOQL.match(query)
+        if not match:
+            raise SalesforceFakeError(400, 'MALFORMED_QUERY',
+                                      f'Unsupported query: {query}')
+        conditions = []
+        where = match.group('where') or ''
+        position = 0
+        while position < len(where):
+            condition = _CONDITION.match(where, position)
+            if not condition:
+                raise SalesforceFakeError(400, 'MALFORMED_QUERY',
+                                          f'Unsupported condition: {where}')
+            value = condition.group('value')
+            parsed = [_literal(i) for i in
+                      _LIST_ITEM.findall(value[1:-1])] \
+                if value.startswith('(') else _literal(value)
+            conditions.append((condition.group('field'),
+                               condition.group('op'), parsed))
+            position = condition.end()
+        order = None
+        if match.group('order'):
+            order = (match.group('order'),
+                     (match.group('direction') or '').upper() == 'DESC')
+        return cls(
+            fields=[i.strip() for i in match.group('fields').split(',')],
+            sobject=match.group('sobject'),
+            conditions=conditions,
+            order=order,
+            limit=int(match.group('limit')) if match.group('limit') else None,
+            offset=int(match.group('offset') or 0),
+            )
+
+
+def _field(record: Record, name: str) -> Any:
+    """Case insensitive field lookup, following relationship paths"""
+    value: Any = record
+    for part in name.split('.'):
+        if not isinstance(value, dict):
+            return None
+        if part in value:
+            value = value[part]
+            continue
+        lowered = part.lower()
+        value = next((v for k, v in value.items() if k.lower() == lowered),
+                     None)
+    return value
+
+
+# --------------------------------------------------------------- jobs ---
+
+class _BulkBatch:
+    """Bulk API batch"""
+
+    # pylint: disable=too-many-instance-attributes,too-few-public-methods
+    def __init__(self, batch_id: str, job_id: str, data: Any):
+        self.batch_id = batch_id
+        self.job_id = job_id
+        self.data = data
+        self.request = ''
+        self.columns: List[str] = []
+        self.chunk: Optional[List[Record]] = None
+        self.state = 'Queued'
+        self.state_message = ''
+        self.polls = 0
+        self.created = _now()
+        self.results: List[Any] = []
+        self.result_ids: List[str] = []
+        self.processed = 0
+        self.failed = 0
+        self.processing_ms = 0
+
+    def info(self) -> Record:
+        """The batch info returned by the API"""
+        info = OrderedDict([
+            ('id', self.batch_id),
+            ('jobId', self.job_id),
+            ('state', self.state),
+            ('createdDate', self.created),
+            ('systemModstamp', _now()),
+            ('numberRecordsProcessed', self.processed),
+            ('numberRecordsFailed', self.failed),
+            ('totalProcessingTime', self.processing_ms),
+            ('apiActiveProcessingTime', self.processing_ms),
+            ('apexProcessingTime', 0),
+            ])
+        if self.state_message:
+            info['stateMessage'] = self.state_message
+        return info
+
+
+class _Job:
+    """Bulk API or Bulk 2.0 job"""
+
+    # pylint: disable=too-many-instance-attributes,too-few-public-methods
+    def __init__(self, job_id: str, spec: Record, state: str):
+        self.job_id = job_id
+        self.spec = spec
+        self.state = state
+        self.created = _now()
+        self.batches: 'OrderedDict[str, _BulkBatch]' = OrderedDict()
+        self.polls = 0
+        self.error_message = ''
+        self.upload: List[str] = []
+        self.successful: List[Record] = []
+        self.failed: List[Record] = []
+        self.unprocessed: List[Record] = []
+        self.columns: List[str] = []
+        self.query_rows: List[Record] = []
+        self.processing_ms = 0
+        self.chunk_size = 0
+
+    @property
+    def operation(self) -> str:
+        """The job operation"""
+        return str(self.spec.get('operation', ''))
+
+    @property
+    def is_csv(self) -> bool:
+        """Whether batches of this Bulk API job are CSV"""
+        return self.spec.get('contentType') == 'CSV'
+
+
+# -------------------------------------------------------------- the org --
+
+class FakeOrg:
+    """An in-memory Salesforce org
+
+    Arguments:
+
+    * instance -- host name the client is pointed at
+    * session_id -- the only session id accepted, others get a 401
+    * version -- API version of the client returned by `client()`
+    * api_limit -- daily API request limit reported in `Sforce-Limit-Info`.
+                   Calls beyond it are refused with `REQUEST_LIMIT_EXCEEDED`
+    * query_page_size -- records per REST query page
+    * processing_polls -- how many status checks a bulk batch or job stays
+                          queued or in progress before it is processed
+    * latency -- seconds to wait before answering each request, or a
+                 callable taking the method and path and returning them
+    * lock_error_rate -- probability of a record write failing with
+                         `UNABLE_TO_LOCK_ROW`
+    * seed -- seed for the lock error randomness
+    """
+
+    # pylint: disable=too-many-instance-attributes,too-many-public-methods
+    # pylint: disable=too-many-arguments
+    def __init__(self,
+                 instance: str = 'fake.my.salesforce.com',
+                 session_id: str = '00DFAKE0000000000!session',
+                 version: str = DEFAULT_API_VERSION,
+                 api_limit: int = 15_000,
+                 query_page_size: int = 2000,
+                 processing_polls: int = 0,
+                 latency: Latency = 0.0,
+                 lock_error_rate: float = 0.0,
+                 seed: Optional[int] = None
+                 ):
+        self.instance = instance
+        self.session_id = session_id
+        self.version = version
+        self.api_limit = api_limit
+        self.api_usage = 0
+        self.query_page_size = query_page_size
+        self.processing_polls = processing_polls
+        self.latency = latency
+        self.lock_error_rate = lock_error_rate
+        self.required_fields: Dict[str, List[str]] = {}
+        self.request_log: List[Tuple[str, str]] = []
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._objects: Dict[str, 'OrderedDict[str, Record]'] = {}
+        self._names: Dict[str, str] = {}
+        self._prefixes: Dict[str, str] = {}
+        self._counter = 0
+        self._faults: List[List[Any]] = []
+        self._lock_errors = 0
+        self._cursors: Dict[str, Tuple[List[Record], int]] = {}
+        self._jobs: Dict[str, _Job] = {}
+        self._results: Dict[str, List[Record]] = {}
+        self._routes = self._build_routes()
+
+    # ----------------------------------------------------------- setup ---
+
+    def client(self, **kwargs: Any) -> Salesforce:
+        """A `Salesforce` client connected to this org"""
+        session = self.mount(kwargs.pop('session', None) or requests.Session())
+        kwargs.setdefault('version', self.version)
+        return Salesforce(instance_url=f'https://{self.instance}',
+                          session_id=self.session_id,
+                          session=session,
+                          **kwargs)
+
+    def mount(self, session: requests.Session) -> requests.Session:
+        """Route the requests of `session` for this org's instance here"""
+        session.mount(f'https://{self.instance}/', FakeOrgAdapter(self))
+        return session
+
+    def add_records(self, sobject: str, records: Iterable[Record]
+                    ) -> List[str]:
+        """Store records directly, returning their new Ids"""
+        with self._lock:
+            ids = []
+            for record in records:
+                record_id = self._new_id(sobject)
+                self._table(sobject)[record_id] = self._stored(
+                    sobject, record_id, record)
+                ids.append(record_id)
+            return ids
+
+    def get_records(self, sobject: str, include_deleted: bool = False
+                    ) -> List[Record]:
+        """Copies of the stored records of `sobject`"""
+        with self._lock:
+            return [dict(i) for i in self._table(sobject).values()
+                    if include_deleted or not i['IsDeleted']]
+
+    def inject_error(self,
+                     status: int,
+                     error_code: str = '',
+                     message: str = '',
+                     times: int = 1,
+                     method: Optional[str] = None,
+                     path: Optional[str] = None
+                     ) -> None:
+        """Answer the next matching requests with an error
+
+        Arguments:
+
+        * status -- HTTP status, e.g. 401, 503
+        * error_code -- Salesforce error code, derived from status if empty
+        * message -- error message
+        * times -- number of requests to fail
+        * method -- only fail requests with this HTTP method
+        * path -- only fail requests whose path matches this regex
+        """
+        default_codes = {
+            400: 'MALFORMED_REQUEST',
+            401: 'INVALID_SESSION_ID',
+            403: 'REQUEST_LIMIT_EXCEEDED',
+            404: 'NOT_FOUND',
+            503: 'SERVER_UNAVAILABLE',
+            }
+        fault = FakeFault(
+            status=status,
+            error_code=error_code or default_codes.get(status, 'UNKNOWN'),
+            message=message or 'Injected error',
+            method=method.upper() if method else None,
+            path=re.compile(path) if path else None,
+            )
+        with self._lock:
+            self._faults.append([fault, times])
+
+    def inject_lock_errors(self, times: int = 1) -> None:
+        """Fail the next `times` record writes with `UNABLE_TO_LOCK_ROW`"""
+        with self._lock:
+            self._lock_errors += times
+
+    # -------------------------------------------------------- dispatch ---
+
+    def handle(self,
+               method: str,
+               url: str,
+               headers: Mapping[str, str],
+               body: Union[str, bytes, None]
+               ) -> Reply:
+        """Answer one HTTP request"""
+        parsed = urlparse(url)
+        if body and CaseInsensitiveDict(headers).get(
+                'Content-Encoding') == 'gzip':
+            body = gzip.decompress(body.encode('utf-8')
+                                   if isinstance(body, str) else body)
+        request = FakeRequest(
+            method=method.upper(),
+            path=unquote(parsed.path),
+            params={k: v[-1] for k, v in parse_qs(parsed.query).items()},
+            headers=CaseInsensitiveDict(headers),
+            body=body.encode('utf-8') if isinstance(body, str)
+            else body or b'',
+            )
+        latency = self.latency(request.method, request.path) \
+            if callable(self.latency) else self.latency
+        if latency:
+            time.sleep(latency)
+        with self._lock:
+            self.request_log.append((request.method, request.path))
+            self.api_usage += 1
+            try:
+                status, reply_headers, content = self._dispatch(request)
+            except SalesforceFakeError as error:
+                status, reply_headers, content = self._error_reply(
+                    request, error)
+            reply_headers['Sforce-Limit-Info'] = (
+                f'api-usage={self.api_usage}/{self.api_limit}')
+            return status, reply_headers, content
+
+    def _dispatch(self, request: FakeRequest) -> Reply:
+        for index, (fault, remaining) in enumerate(self._faults):
+            if (fault.method in (None, request.method) and
+                    (fault.path is None or fault.path.search(request.path))):
+                if remaining <= 1:
+                    del self._faults[index]
+                else:
+                    self._faults[index][1] -= 1
+                raise SalesforceFakeError(fault.status, fault.error_code,
+                                          fault.message)
+        token = request.headers.get('X-SFDC-Session') or \
+            request.headers.get('Authorization', '')[len('Bearer '):]
+        if token != self.session_id:
+            raise SalesforceFakeError(401, 'INVALID_SESSION_ID',
+                                      'Session expired or invalid')
+        if self.api_usage > self.api_limit:
+            raise SalesforceFakeError(403, 'REQUEST_LIMIT_EXCEEDED',
+                                      'TotalRequests Limit exceeded.')
+        for method, pattern, handler in self._routes:
+            if method != request.method:
+                continue
+            match = pattern.match(request.path)
+            if match:
+                return handler(request, **match.groupdict())
+        raise SalesforceFakeError(404, 'NOT_FOUND',
+                                  'The requested resource does not exist')
+
+    @staticmethod
+    def _error_reply(request: FakeRequest,
+                     error: SalesforceFakeError
+                     ) -> Reply:
+        if error.status == 503:
+            return (503, {'Content-Type': 'text/html'},
+                    error.message.encode('utf-8'))
+        if '/services/async/' in request.path:
+            return _json(error.status, {'exceptionCode': error.error_code,
+                                        'exceptionMessage': error.message})
+        return _json(error.status, [{'errorCode': error.error_code,
+                                     'message': error.message}])
+
+    def _build_routes(self) -> List[Tuple[str, Pattern[str],
+                                          Callable[..., Reply]]]:
+        data = r'^/services/data/v[\d.]+/'
+        asyn = r'^/services/async/[\d.]+/'
+        ingest = data + r'jobs/ingest'
+        query = data + r'jobs/query'
+        routes: List[Tuple[str, str, Callable[..., Reply]]] = [
+            ('GET', data + r'(?P<endpoint>query|queryAll)/?$', self._query),
+            ('GET', data + r'(?P<endpoint>query|queryAll)/(?P<locator>[^/]+)$',
+             self._query_more),
+            ('GET', data + r'limits/?$', self._limits),
+            ('GET', data + r'sobjects/?$', self._describe_global),
+            ('GET', data + r'sobjects/(?P<sobject>\w+)/describe/?$',
+             self._describe),
+            ('POST', data + r'sobjects/(?P<sobject>\w+)/?$', self._create),
+            ('GET', data + r'sobjects/(?P<sobject>\w+)/(?P<record_id>\w+)$',
+             self._get),
+            ('PATCH', data + r'sobjects/(?P<sobject>\w+)/(?P<record_id>\w+)$',
+             self._update),
+            ('DELETE',
+             data + r'sobjects/(?P<sobject>\w+)/(?P<record_id>\w+)$',
+             self._delete),
+            ('GET',
+             data + r'sobjects/(?P<sobject>\w+)/(?P<field>\w+)/(?P<value>.+)$',
+             self._get_by_field),
+            ('PATCH',
+             data + r'sobjects/(?P<sobject>\w+)/(?P<field>\w+)/(?P<value>.+)$',
+             self._upsert),
+            ('POST', data + r'composite/sobjects/?$',
+             self._collection_create),
+            ('PATCH', data + r'composite/sobjects/?$',
+             self._collection_update),
+            ('DELETE', data + r'composite/sobjects/?$',
+             self._collection_delete),
+            ('GET', data + r'composite/sobjects/(?P<sobject>\w+)/?$',
+             self._collection_get),
+            ('PATCH', data + r'composite/sobjects/(?P<sobject>\w+)/'
+                             r'(?P<field>\w+)/?$',
+             self._collection_upsert),
+            ('POST', asyn + r'job/?$', self._bulk_create_job),
+            ('GET', asyn + r'job/(?P<job_id>\w+)$', self._bulk_get_job),
+            ('POST', asyn + r'job/(?P<job_id>\w+)$', self._bulk_update_job),
+            ('POST', asyn + r'job/(?P<job_id>\w+)/batch/?$',
+             self._bulk_add_batch),
+            ('GET', asyn + r'job/(?P<job_id>\w+)/batch/?$',
+             self._bulk_get_batches),
+            ('GET', asyn + r'job/(?P<job_id>\w+)/batch/(?P<batch_id>\w+)$',
+             self._bulk_get_batch),
+            ('GET', asyn + r'job/(?P<job_id>\w+)/batch/(?P<batch_id>\w+)/'
+                           r'request$',
+             self._bulk_get_batch_request),
+            ('GET', asyn + r'job/(?P<job_id>\w+)/batch/(?P<batch_id>\w+)/'
+                           r'result$',
+             self._bulk_get_batch_result),
+            ('GET', asyn + r'job/(?P<job_id>\w+)/batch/(?P<batch_id>\w+)/'
+                           r'result/(?P<result_id>\w+)$',
+             self._bulk_get_query_result),
+            ('POST', ingest + r'/?$', self._bulk2_create_job),
+            ('PUT', ingest + r'/(?P<job_id>\w+)/batches/?$',
+             self._bulk2_upload),
+            ('PATCH', ingest + r'/(?P<job_id>\w+)/?$', self._bulk2_set_state),
+            ('GET', ingest + r'/(?P<job_id>\w+)/?$', self._bulk2_get_job),
+            ('DELETE', ingest + r'/(?P<job_id>\w+)/?$',
+             self._bulk2_delete_job),
+            ('GET', ingest + r'/(?P<job_id>\w+)/(?P<results>successfulResults'
+                             r'|failedResults|unprocessedrecords)/?$',
+             self._bulk2_ingest_results),
+            ('POST', query + r'/?$', self._bulk2_create_job),
+            ('PATCH', query + r'/(?P<job_id>\w+)/?$', self._bulk2_set_state),
+            ('GET', query + r'/(?P<job_id>\w+)/?$', self._bulk2_get_job),
+            ('DELETE', query + r'/(?P<job_id>\w+)/?$',
+             self._bulk2_delete_job),
+            ('GET', query + r'/(?P<job_id>\w+)/results/?$',
+             self._bulk2_query_results),
+            ('GET', query + r'/(?P<job_id>\w+)/resultPages/?$',
+             self._bulk2_result_pages),
+            ]
+        return [(method, re.compile(pattern), handler)
+                for method, pattern, handler in routes]
+
+    # --------------------------------------------------------- records ---
+
+    def _table(self, sobject: str) -> 'OrderedDict[str, Record]':
+        name = self._names.setdefault(sobject.lower(), sobject)
+        return self._objects.setdefault(name, OrderedDict())
+
+    def _new_id(self, sobject: str) -> str:
+        lowered = sobject.lower()
+        if lowered not in self._prefixes:
+            self._prefixes[lowered] = KEY_PREFIXES.get(
+                lowered, f'a{len(self._prefixes):02d}')
+        return self._new_key(self._prefixes[lowered])
+
+    def _new_key(self, prefix: str) -> str:
+        self._counter += 1
+        return f'{prefix}{self._counter:012d}AAA'
+
+    def _stored(self, sobject: str, record_id: str, record: Record
+                ) -> Record:
+        stored: Record = OrderedDict(
+            (k, v) for k, v in record.items() if k != 'attributes')
+        stored['Id'] = record_id
+        stored['IsDeleted'] = False
+        stored['attributes'] = {
+            'type': self._names.get(sobject.lower(), sobject),
+            'url': f'/services/data/v{self.version}/sobjects/'
+                   f'{sobject}/{record_id}',
+            }
+        return stored
+
+    def _find(self, sobject: Optional[str], record_id: str
+              ) -> Tuple[str, Record]:
+        tables = [self._names.get(sobject.lower(), sobject)] if sobject \
+            else list(self._objects)
+        for name in tables:
+            record = self._objects.get(name, OrderedDict()).get(
+                record_id + 'AAA' if len(record_id) == 15 else record_id)
+            if record is not None and not record['IsDeleted']:
+                return name, record
+        raise SalesforceFakeError(404, 'NOT_FOUND',
+                                  'The requested resource does not exist')
+
+    def _check_write(self, sobject: str, fields: Record, creating: bool
+                     ) -> Optional[Dict[str, Any]]:
+        """The error a write of `fields` fails with, if any"""
+        if self._lock_errors or (self.lock_error_rate and
+                                 self._random.random() < self.lock_error_rate):
+            self._lock_errors = max(0, self._lock_errors - 1)
+            return _error('UNABLE_TO_LOCK_ROW',
+                          'unable to obtain exclusive access to this record')
+        if creating:
+            missing = [i for i in self.required_fields.get(sobject, [])
+                       if _field(fields, i) in (None, '')]
+            if missing:
+                return _error('REQUIRED_FIELD_MISSING',
+                              f'Required fields are missing: {missing}',
+                              missing)
+        return None
+
+    def _insert(self, sobject: str, fields: Record
+                ) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        error = self._check_write(sobject, fields, True)
+        if error:
+            return None, [error]
+        record_id = self._new_id(sobject)
+        self._table(sobject)[record_id] = self._stored(sobject, record_id,
+                                                       fields)
+        return record_id, []
+
+    def _modify(self, sobject: Optional[str], record_id: str, fields: Record
+                ) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        try:
+            name, record = self._find(sobject, record_id)
+        except SalesforceFakeError:
+            return None, [_error('ENTITY_IS_DELETED' if record_id else
+                                 'MISSING_ARGUMENT',
+                                 'entity is deleted or does not exist')]
+        error = self._check_write(name, fields, False)
+        if error:
+            return None, [error]
+        record.update((k, v) for k, v in fields.items()
+                      if k not in ('attributes', 'Id'))
+        return record['Id'], []
+
+    def _remove(self, sobject: Optional[str], record_id: str
+                ) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        try:
+            name, record = self._find(sobject, record_id)
+        except SalesforceFakeError:
+            return None, [_error('ENTITY_IS_DELETED',
+                                 'entity is deleted or does not exist')]
+        error = self._check_write(name, {}, False)
+        if error:
+            return None, [error]
+        record['IsDeleted'] = True
+        return record['Id'], []
+
+    def _upsert_record(self, sobject: str, field: str, fields: Record
+                       ) -> Tuple[Optional[str], bool, List[Dict[str, Any]]]:
+        value = _field(fields, field)
+        if field.lower() == 'id':
+            if value:
+                record_id, errors = self._modify(sobject, value, fields)
+                return record_id, False, errors
+            record_id, errors = self._insert(sobject, fields)
+            return record_id, True, errors
+        matches = [i for i in self._table(sobject).values()
+                   if not i['IsDeleted'] and _field(i, field) == value]
+        if len(matches) > 1:
+            return None, False, [_error(
+                'DUPLICATE_EXTERNAL_ID',
+                f'{field}: more than one record found for external id field')]
+        if matches:
+            record_id, errors = self._modify(sobject, matches[0]['Id'],
+                                             fields)
+            return record_id, False, errors
+        record_id, errors = self._insert(sobject, fields)
+        return record_id, True, errors
+
+    def _run_query(self, query: str, include_deleted: bool
+                   ) -> Tuple[Soql, List[Record]]:
+        soql = Soql.parse(query)
+        rows = [i for i in self._table(soql.sobject).values()
+                if (include_deleted or not i['IsDeleted']) and
+                all(_compare(_field(i, field), op, value)
+                    for field, op, value in soql.conditions)]
+        if soql.order:
+            field, descending = soql.order
+            rows.sort(key=lambda i: (_field(i, field) is None,
+                                     _field(i, field)),
+                      reverse=descending)
+        rows = rows[soql.offset:]
+        if soql.limit is not None:
+            rows = rows[:soql.limit]
+        if soql.is_count:
+            return soql, rows
+        selected = []
+        for row in rows:
+            out: Record = OrderedDict(attributes=dict(row['attributes']))
+            for field in soql.fields:
+                out[field] = _field(row, field)
+            selected.append(out)
+        return soql, selected
+
+    # ------------------------------------------------------------ REST ---
+
+    def _query_page(self, endpoint: str, rows: List[Record], total: int,
+                    offset: int, locator: str) -> Reply:
+        end = offset + self.query_page_size
+        page: Record = OrderedDict([
+            ('totalSize', total),
+            ('done', end >= len(rows)),
+            ])
+        if end < len(rows):
+            page['nextRecordsUrl'] = (f'/services/data/v{self.version}/'
+                                      f'{endpoint}/{locator}-{end}')
+        page['records'] = rows[offset:end]
+        return _json(200, page)
+
+    def _query(self, request: FakeRequest, endpoint: str) -> Reply:
+        if 'q' not in request.params:
+            raise SalesforceFakeError(400, 'MALFORMED_QUERY',
+                                      'Missing query parameter q')
+        soql, rows = self._run_query(request.params['q'],
+                                     endpoint == 'queryAll')
+        if soql.is_count:
+            return _json(200, {'totalSize': len(rows), 'done': True,
+                               'records': []})
+        locator = self._new_key(QUERY_LOCATOR_PREFIX)[:15]
+        self._cursors[locator] = (rows, len(rows))
+        return self._query_page(endpoint, rows, len(rows), 0, locator)
+
+    def _query_more(self, _: FakeRequest, endpoint: str, locator: str
+                    ) -> Reply:
+        cursor, offset = locator.rsplit('-', 1) if '-' in locator \
+            else (locator, '')
+        if cursor not in self._cursors or not offset.isdigit():
+            raise SalesforceFakeError(400, 'INVALID_QUERY_LOCATOR',
+                                      'invalid query locator')
+        rows, total = self._cursors[cursor]
+        return self._query_page(endpoint, rows, total, int(offset), cursor)
+
+    def _limits(self, _: FakeRequest) -> Reply:
+        return _json(200, {'DailyApiRequests': {
+            'Max': self.api_limit,
+            'Remaining': max(0, self.api_limit - self.api_usage),
+            }})
+
+    def _describe_global(self, _: FakeRequest) -> Reply:
+        return _json(200, {'encoding': 'UTF-8', 'maxBatchSize': 200,
+                           'sobjects': [{'name': name}
+                                        for name in self._objects]})
+
+    def _describe(self, _: FakeRequest, sobject: str) -> Reply:
+        fields = OrderedDict([('Id', None), ('IsDeleted', None)])
+        for record in self._table(sobject).values():
+            fields.update((k, None) for k in record if k != 'attributes')
+        return _json(200, {'name': self._names[sobject.lower()],
+                           'fields': [{'name': i} for i in fields]})
+
+    def _create(self, request: FakeRequest, sobject: str) -> Reply:
+        record_id, errors = self._insert(sobject, request.json())
+        if errors:
+            return _json(400, [{'errorCode': i['statusCode'],
+                                'message': i['message'],
+                                'fields': i['fields']} for i in errors])
+        return _json(201, {'id': record_id, 'success': True, 'errors': []})
+
+    def _get(self, request: FakeRequest, sobject: str, record_id: str
+             ) -> Reply:
+        _, record = self._find(sobject, record_id)
+        fields = request.params.get('fields')
+        if fields:
+            record = OrderedDict(
+                [('attributes', record['attributes'])] +
+                [(i, _field(record, i)) for i in fields.split(',')])
+        return _json(200, record)
+
+    def _write_reply(self, errors: List[Dict[str, Any]]) -> Reply:
+        if errors:
+            return _json(400, [{'errorCode': i['statusCode'],
+                                'message': i['message'],
+                                'fields': i['fields']} for i in errors])
+        return 204, {}, b''
+
+    def _update(self, request: FakeRequest, sobject: str, record_id: str
+                ) -> Reply:
+        self._find(sobject, record_id)
+        _, errors = self._modify(sobject, record_id, request.json())
+        return self._write_reply(errors)
+
+    def _delete(self, _: FakeRequest, sobject: str, record_id: str) -> Reply:
+        self._find(sobject, record_id)
+        errors = self._remove(sobject, record_id)[1]
+        return self._write_reply(errors)
+
+    def _get_by_field(self, _: FakeRequest, sobject: str, field: str,
+                      value: str) -> Reply:
+        for record in self._table(sobject).values():
+            if not record['IsDeleted'] and str(_field(record, field)) == value:
+                return _json(200, record)
+        raise SalesforceFakeError(404, 'NOT_FOUND',
+                                  'The requested resource does not exist')
+
+    def _upsert(self, request: FakeRequest, sobject: str, field: str,
+                value: str) -> Reply:
+        fields = dict(request.json(), **{field: value})
+        record_id, created, errors = self._upsert_record(sobject, field,
+                                                         fields)
+        if errors:
+            return self._write_reply(errors)
+        if created:
+            return _json(201, {'id': record_id, 'success': True,
+                               'errors': [], 'created': True})
+        return 204, {}, b''
+
+    @staticmethod
+    def _save_result(record_id: Optional[str], errors: List[Any],
+                     created: Optional[bool] = None) -> Record:
+        result: Record = OrderedDict([('id', record_id),
+                                      ('success', not errors),
+                                      ('errors', errors)])
+        if created is not None:
+            result['created'] = created
+        return result
+
+    def _collection(self,
+                    write: Callable[[Any], Tuple[Optional[str], List[Any]]],
+                    records: Sequence[Any],
+                    all_or_none: bool) -> Reply:
+        if len(records) > 200:
+            raise SalesforceFakeError(400, 'EXCEEDED_ID_LIMIT',
+                                      'record limit reached. cannot submit '
+                                      'more than 200 records into this call')
+        snapshot = {name: OrderedDict((k, dict(v)) for k, v in table.items())
+                    for name, table in self._objects.items()} \
+            if all_or_none else None
+        results = [self._save_result(*write(i)) for i in records]
+        if snapshot is not None and any(not i['success'] for i in results):
+            self._objects = {k: OrderedDict(v) for k, v in snapshot.items()}
+            rolled_back = _error('ALL_OR_NONE_OPERATION_ROLLED_BACK',
+                                 'Record rolled back because not all '
+                                 'records were valid and the request was '
+                                 'using AllOrNone header')
+            results = [self._save_result(None, i['errors'] or [rolled_back])
+                       for i in results]
+        return _json(200, results)
+
+    def _collection_create(self, request: FakeRequest) -> Reply:
+        payload = request.json()
+        return self._collection(
+            lambda i: self._insert(i['attributes']['type'], i),
+            payload.get('records', []),
+            payload.get('allOrNone', False))
+
+    def _collection_update(self, request: FakeRequest) -> Reply:
+        payload = request.json()
+        return self._collection(
+            lambda i: self._modify(i['attributes']['type'], i.get('Id', ''),
+                                   i),
+            payload.get('records', []),
+            payload.get('allOrNone', False))
+
+    def _collection_delete(self, request: FakeRequest) -> Reply:
+        ids = [i for i in request.params.get('ids', '').split(',') if i]
+        return self._collection(
+            lambda i: self._remove(None, i),
+            ids,
+            request.params.get('allOrNone', 'false') == 'true')
+
+    def _collection_get(self, request: FakeRequest, sobject: str) -> Reply:
+        fields = request.params.get('fields', 'Id').split(',')
+        results: List[Optional[Record]] = []
+        for record_id in request.params.get('ids', '').split(','):
+            try:
+                _, record = self._find(sobject, record_id)
+            except SalesforceFakeError:
+                results.append(None)
+                continue
+            results.append(OrderedDict(
+                [('attributes', record['attributes'])] +
+                [(i, _field(record, i)) for i in fields]))
+        return _json(200, results)
+
+    def _collection_upsert(self, request: FakeRequest, sobject: str,
+                           field: str) -> Reply:
+        payload = request.json()
+
+        def write(record: Record) -> Tuple[Optional[str], List[Any]]:
+            record_id, created, errors = self._upsert_record(sobject, field,
+                                                             record)
+            created_flags.append(created)
+            return record_id, errors
+
+        created_flags: List[bool] = []
+        status, headers, content = self._collection(
+            write, payload.get('records', []),
+            payload.get('allOrNone', False))
+        results = json.loads(content)
+        for result, created in zip(results, created_flags):
+            result['created'] = created and result['success']
+        return status, headers, json.dumps(results).encode('utf-8')
+
+    # ------------------------------------------------------------ Bulk ---
+
+    def _bulk_job(self, job_id: str) -> _Job:
+        job = self._jobs.get(job_id)
+        if job is None or 'contentType' not in job.spec or \
+                job.spec.get('jobType') == 'V2':
+            raise SalesforceFakeError(400, 'InvalidJob',
+                                      f'Unable to find job {job_id}')
+        return job
+
+    def _bulk_job_info(self, job: _Job) -> Record:
+        for batch in list(job.batches.values()):
+            self._advance_batch(job, batch, poll=False)
+        batches = list(job.batches.values())
+        counts = {state: sum(1 for i in batches if i.state == state)
+                  for state in ('Queued', 'InProgress', 'Completed',
+                                'Failed', 'NotProcessed')}
+        return OrderedDict([
+            ('id', job.job_id),
+            ('operation', job.operation),
+            ('object', job.spec.get('object')),
+            ('createdDate', job.created),
+            ('state', job.state),
+            ('externalIdFieldName', job.spec.get('externalIdFieldName')),
+            ('concurrencyMode', 'Serial'
+             if job.spec.get('concurrencyMode') in (1, 'Serial')
+             else 'Parallel'),
+            ('contentType', job.spec.get('contentType', 'JSON')),
+            ('numberBatchesQueued', counts['Queued']),
+            ('numberBatchesInProgress', counts['InProgress']),
+            ('numberBatchesCompleted', counts['Completed']),
+            ('numberBatchesFailed', counts['Failed']),
+            ('numberBatchesTotal', len(batches)),
+            ('numberRecordsProcessed', sum(i.processed for i in batches)),
+            ('numberRecordsFailed', sum(i.failed for i in batches)),
+            ('totalProcessingTime', sum(i.processing_ms for i in batches)),
+            ('apiActiveProcessingTime',
+             sum(i.processing_ms for i in batches)),
+            ('apexProcessingTime', 0),
+            ('apiVersion', float(self.version)),
+            ])
+
+    def _bulk_create_job(self, request: FakeRequest) -> Reply:
+        spec = request.json()
+        if spec.get('contentType', 'JSON') not in ('JSON', 'CSV'):
+            raise SalesforceFakeError(400, 'InvalidJob',
+                                      'Only JSON and CSV content is supported')
+        if spec.get('operation') not in ('insert', 'update', 'upsert',
+                                         'delete', 'hardDelete', 'query',
+                                         'queryAll'):
+            raise SalesforceFakeError(400, 'InvalidJob',
+                                      'Invalid operation')
+        job = _Job(self._new_key(JOB_PREFIX), dict(spec), 'Open')
+        job.spec.setdefault('contentType', 'JSON')
+        chunking = request.headers.get('Sforce-Enable-PKChunking', 'false')
+        if chunking.lower() != 'false' and \
+                job.operation in ('query', 'queryAll'):
+            options = dict(i.strip().split('=', 1)
+                           for i in chunking.split(';') if '=' in i)
+            job.chunk_size = int(options.get('chunkSize',
+                                             BULK_PK_CHUNK_SIZE))
+        self._jobs[job.job_id] = job
+        return _json(201, self._bulk_job_info(job))
+
+    def _bulk_get_job(self, _: FakeRequest, job_id: str) -> Reply:
+        return _json(200, self._bulk_job_info(self._bulk_job(job_id)))
+
+    def _bulk_update_job(self, request: FakeRequest, job_id: str) -> Reply:
+        job = self._bulk_job(job_id)
+        state = request.json().get('state')
+        if state not in ('Closed', 'Aborted'):
+            raise SalesforceFakeError(400, 'InvalidJobState',
+                                      f'Invalid state {state}')
+        if state == 'Aborted':
+            for batch in job.batches.values():
+                if batch.state in ('Queued', 'InProgress'):
+                    batch.state = 'NotProcessed'
+        job.state = state
+        return _json(200, self._bulk_job_info(job))
+
+    def _bulk_add_batch(self, request: FakeRequest, job_id: str) -> Reply:
+        job = self._bulk_job(job_id)
+        if job.state != 'Open':
+            raise SalesforceFakeError(400, 'InvalidJobState',
+                                      f'Job is {job.state}')
+        if job.operation in ('query', 'queryAll'):
+            data: Any = request.text
+        else:
+            if len(request.body) > BULK_BATCH_CHAR_LIMIT:
+                raise SalesforceFakeError(
+                    400, 'InvalidBatch',
+                    f'Exceeded max size limit of {BULK_BATCH_CHAR_LIMIT}')
+            if job.is_csv:
+                data = [{k: None if v == '#N/A' else v
+                         for k, v in row.items() if v != ''}
+                        for row in csv.DictReader(
+                            io.StringIO(request.text, newline=''))]
+            else:
+                data = request.json()
+            if len(data) > BULK_BATCH_RECORD_LIMIT:
+                raise SalesforceFakeError(
+                    400, 'InvalidBatch',
+                    f'Records in batch exceed {BULK_BATCH_RECORD_LIMIT}')
+        batch = _BulkBatch(self._new_key(BATCH_PREFIX), job.job_id, data)
+        batch.request = request.text
+        job.batches[batch.batch_id] = batch
+        return self._batch_info_reply(job, 201, batch.info())
+
+    @staticmethod
+    def _batch_info_reply(job: _Job, status: int, info: Record) -> Reply:
+        """Batch info, which is XML for CSV jobs"""
+        if job.is_csv:
+            return _xml(status, 'batchInfo', info)
+        return _json(status, info)
+
+    def _bulk_batch(self, job_id: str, batch_id: str) -> _BulkBatch:
+        batch = self._bulk_job(job_id).batches.get(batch_id)
+        if batch is None:
+            raise SalesforceFakeError(400, 'InvalidBatch',
+                                      f'Unable to find batch {batch_id}')
+        return batch
+
+    def _advance_batch(self, job: _Job, batch: _BulkBatch, poll: bool = True
+                       ) -> _BulkBatch:
+        """Move a batch through Queued, InProgress and Completed"""
+        if batch.state not in ('Queued', 'InProgress'):
+            return batch
+        if poll:
+            batch.polls += 1
+        if batch.polls <= self.processing_polls:
+            if batch.polls:
+                batch.state = 'InProgress'
+            return batch
+        started = time.perf_counter()
+        if job.operation in ('query', 'queryAll'):
+            if batch.chunk is None:
+                try:
+                    soql, rows = self._run_query(batch.data,
+                                                 job.operation == 'queryAll')
+                except SalesforceFakeError as error:
+                    batch.state = 'Failed'
+                    batch.state_message = (f'{error.error_code}: '
+                                           f'{error.message}')
+                    return batch
+                batch.columns = soql.fields
+                if job.chunk_size:
+                    self._split_batch(job, batch, rows)
+                    return batch
+            else:
+                rows = batch.chunk
+            batch.processed = len(rows)
+            for start in range(0, max(len(rows), 1), 10_000):
+                result_id = self._new_key(RESULT_PREFIX)
+                self._results[result_id] = rows[start:start + 10_000]
+                batch.result_ids.append(result_id)
+        else:
+            for record in batch.data:
+                record_id, created, errors = self._write_bulk_record(
+                    job, record)
+                result = self._save_result(record_id, errors, created)
+                batch.results.append(result)
+                batch.processed += 1
+                batch.failed += bool(errors)
+        batch.processing_ms = int((time.perf_counter() - started) * 1000)
+        batch.state = 'Completed'
+        return batch
+
+    def _split_batch(self, job: _Job, batch: _BulkBatch, rows: List[Record]
+                     ) -> None:
+        """Replace a PK chunking query batch by a batch per chunk"""
+        for start in range(0, max(len(rows), 1), job.chunk_size):
+            chunk = _BulkBatch(self._new_key(BATCH_PREFIX), job.job_id,
+                               batch.data)
+            chunk.columns = batch.columns
+            chunk.chunk = rows[start:start + job.chunk_size]
+            job.batches[chunk.batch_id] = chunk
+        batch.state = 'NotProcessed'
+
+    def _write_bulk_record(self, job: _Job, record: Record
+                           ) -> Tuple[Optional[str], bool, List[Any]]:
+        sobject = str(job.spec.get('object'))
+        operation = job.operation
+        if operation == 'insert':
+            record_id, errors = self._insert(sobject, record)
+            return record_id, not errors, errors
+        if operation == 'upsert':
+            return self._upsert_record(
+                sobject, str(job.spec.get('externalIdFieldName') or 'Id'),
+                record)
+        record_id = str(_field(record, 'Id') or '')
+        if operation == 'update':
+            result_id, errors = self._modify(sobject, record_id, record)
+        else:
+            result_id, errors = self._remove(sobject, record_id)
+        return result_id or record_id or None, False, errors
+
+    def _bulk_get_batches(self, _: FakeRequest, job_id: str) -> Reply:
+        job = self._bulk_job(job_id)
+        for batch in list(job.batches.values()):
+            self._advance_batch(job, batch)
+        infos = [i.info() for i in job.batches.values()]
+        if job.is_csv:
+            return _xml(200, 'batchInfoList', infos, 'batchInfo')
+        return _json(200, {'batchInfo': infos})
+
+    def _bulk_get_batch(self, _: FakeRequest, job_id: str, batch_id: str
+                        ) -> Reply:
+        job = self._bulk_job(job_id)
+        return self._batch_info_reply(job, 200, self._advance_batch(
+            job, self._bulk_batch(job_id, batch_id)).info())
+
+    def _bulk_get_batch_request(self, _: FakeRequest, job_id: str,
+                                batch_id: str) -> Reply:
+        batch = self._bulk_batch(job_id, batch_id)
+        if self._jobs[job_id].is_csv:
+            return _csv(batch.request)
+        return _json(200, batch.data)
+
+    def _bulk_get_batch_result(self, _: FakeRequest, job_id: str,
+                               batch_id: str) -> Reply:
+        batch = self._bulk_batch(job_id, batch_id)
+        if batch.state != 'Completed':
+            raise SalesforceFakeError(400, 'InvalidBatch',
+                                      f'Batch not completed: {batch.state}')
+        job = self._jobs[job_id]
+        if job.operation in ('query', 'queryAll'):
+            if job.is_csv:
+                return _xml(200, 'result-list', batch.result_ids, 'result')
+            return _json(200, batch.result_ids)
+        if job.is_csv:
+            return _csv(self._write_csv(job, ['Id', 'Success', 'Created',
+                                              'Error'], [
+                {'Id': i['id'], 'Success': i['success'],
+                 'Created': i['created'],
+                 'Error': ':'.join([i['errors'][0]['statusCode'],
+                                    i['errors'][0]['message']])
+                 if i['errors'] else None}
+                for i in batch.results]))
+        return _json(200, batch.results)
+
+    def _bulk_get_query_result(self, _: FakeRequest, job_id: str,
+                               batch_id: str, result_id: str) -> Reply:
+        batch = self._bulk_batch(job_id, batch_id)
+        if result_id not in batch.result_ids:
+            raise SalesforceFakeError(400, 'InvalidBatch',
+                                      f'Unknown result {result_id}')
+        if self._jobs[job_id].is_csv:
+            return _csv(self._write_csv(self._jobs[job_id], batch.columns,
+                                        self._results[result_id]))
+        return _json(200, self._results[result_id])
+
+    # -------------------------------------------------------- Bulk 2.0 ---
+
+    def _bulk2_job(self, job_id: str) -> _Job:
+        job = self._jobs.get(job_id)
+        if job is None or job.spec.get('jobType') != 'V2':
+            raise SalesforceFakeError(404, 'NOT_FOUND',
+                                      f'Unable to find job {job_id}')
+        return job
+
+    def _bulk2_job_info(self, job: _Job) -> Record:
+        is_query = job.operation in ('query', 'queryAll')
+        info = OrderedDict([
+            ('id', job.job_id),
+            ('operation', job.operation),
+            ('object', job.spec.get('object') or
+             (Soql.parse(job.spec['query']).sobject if is_query else None)),
+            ('createdDate', job.created),
+            ('systemModstamp', _now()),
+            ('state', job.state),
+            ('concurrencyMode', 'Parallel'),
+            ('contentType', 'CSV'),
+            ('apiVersion', float(self.version)),
+            ('jobType', 'V2Query' if is_query else 'V2Ingest'),
+            ('lineEnding', job.spec.get('lineEnding', 'LF')),
+            ('columnDelimiter', job.spec.get('columnDelimiter', 'COMMA')),
+            ('retries', 0),
+            ('totalProcessingTime', job.processing_ms),
+            ])
+        if is_query:
+            info['numberRecordsProcessed'] = len(job.query_rows)
+        else:
+            info['externalIdFieldName'] = job.spec.get('externalIdFieldName')
+            info['contentUrl'] = (f'services/data/v{self.version}/jobs/'
+                                  f'ingest/{job.job_id}/batches')
+            info['numberRecordsProcessed'] = (len(job.successful) +
+                                              len(job.failed))
+            info['numberRecordsFailed'] = len(job.failed)
+            info['apiActiveProcessingTime'] = job.processing_ms
+            info['apexProcessingTime'] = 0
+        if job.error_message:
+            info['errorMessage'] = job.error_message
+        return info
+
+    def _bulk2_create_job(self, request: FakeRequest) -> Reply:
+        spec = dict(request.json(), jobType='V2')
+        is_query = '/jobs/query' in request.path
+        if is_query:
+            if spec.get('operation') not in ('query', 'queryAll'):
+                raise SalesforceFakeError(400, 'INVALIDJOB',
+                                          'Invalid operation')
+            Soql.parse(spec.get('query', ''))
+            state = 'UploadComplete'
+        else:
+            if spec.get('operation') not in ('insert', 'update', 'upsert',
+                                             'delete', 'hardDelete'):
+                raise SalesforceFakeError(400, 'INVALIDJOB',
+                                          'Invalid operation')
+            state = 'Open'
+        job = _Job(self._new_key(JOB_PREFIX), spec, state)
+        self._jobs[job.job_id] = job
+        return _json(200, self._bulk2_job_info(job))
+
+    def _bulk2_upload(self, request: FakeRequest, job_id: str) -> Reply:
+        job = self._bulk2_job(job_id)
+        if job.state != 'Open':
+            raise SalesforceFakeError(400, 'INVALIDJOBSTATE',
+                                      f'Job is {job.state}')
+        if len(request.body) > BULK2_UPLOAD_BYTE_LIMIT:
+            raise SalesforceFakeError(400, 'INVALIDBATCH',
+                                      'Data exceeds the upload limit')
+        job.upload.append(request.text)
+        return 201, {}, b''
+
+    def _bulk2_set_state(self, request: FakeRequest, job_id: str) -> Reply:
+        job = self._bulk2_job(job_id)
+        state = request.json().get('state')
+        if state == 'Aborted':
+            if job.state in ('JobComplete', 'Failed'):
+                raise SalesforceFakeError(400, 'INVALIDJOBSTATE',
+                                          f'Job is {job.state}')
+            job.unprocessed = self._bulk2_rows(job)[1] \
+                if job.operation not in ('query', 'queryAll') else []
+        elif state != 'UploadComplete' or job.state != 'Open':
+            raise SalesforceFakeError(400, 'INVALIDJOBSTATE',
+                                      f'Cannot move job from {job.state} '
+                                      f'to {state}')
+        job.state = state
+        return _json(200, self._bulk2_job_info(job))
+
+    def _bulk2_get_job(self, _: FakeRequest, job_id: str) -> Reply:
+        job = self._bulk2_job(job_id)
+        if job.state in ('UploadComplete', 'InProgress'):
+            job.polls += 1
+            if job.polls <= self.processing_polls:
+                job.state = 'InProgress'
+            else:
+                self._bulk2_process(job)
+        return _json(200, self._bulk2_job_info(job))
+
+    def _bulk2_delete_job(self, _: FakeRequest, job_id: str) -> Reply:
+        job = self._bulk2_job(job_id)
+        if job.state in ('Open', 'UploadComplete', 'InProgress'):
+            raise SalesforceFakeError(400, 'INVALIDJOBSTATE',
+                                      f'Job is {job.state}')
+        del self._jobs[job_id]
+        return 204, {}, b''
+
+    def _bulk2_rows(self, job: _Job) -> Tuple[List[str], List[Record]]:
+        """Parse the uploaded CSV data of an ingest job"""
+        delimiter = _DELIMITERS[job.spec.get('columnDelimiter', 'COMMA')]
+        columns: List[str] = []
+        rows: List[Record] = []
+        for upload in job.upload:
+            reader = csv.reader(io.StringIO(upload, newline=''),
+                                delimiter=delimiter)
+            header = next(reader, [])
+            columns = columns or header
+            rows.extend(OrderedDict(zip(header, i)) for i in reader if i)
+        return columns, rows
+
+    def _bulk2_process(self, job: _Job) -> None:
+        started = time.perf_counter()
+        if job.operation in ('query', 'queryAll'):
+            try:
+                soql, job.query_rows = self._run_query(
+                    job.spec['query'], job.operation == 'queryAll')
+            except SalesforceFakeError as error:
+                job.state = 'Failed'
+                job.error_message = error.message
+                return
+            job.columns = soql.fields
+        else:
+            job.columns, rows = self._bulk2_rows(job)
+            for row in rows:
+                fields = {k: None if v == '#N/A' else v
+                          for k, v in row.items() if v != ''}
+                record_id, created, errors = self._write_bulk_record(
+                    job, fields)
+                if errors:
+                    job.failed.append(OrderedDict(
+                        [('sf__Id', record_id or ''),
+                         ('sf__Error', ':'.join(
+                             [errors[0]['statusCode'],
+                              errors[0]['message']]))] +
+                        list(row.items())))
+                else:
+                    job.successful.append(OrderedDict(
+                        [('sf__Id', record_id),
+                         ('sf__Created', 'true' if created else 'false')] +
+                        list(row.items())))
+        job.processing_ms = int((time.perf_counter() - started) * 1000)
+        job.state = 'JobComplete'
+
+    @staticmethod
+    def _write_csv(job: _Job, columns: List[str],
+                   rows: Iterable[Record]) -> str:
+        out = io.StringIO()
+        writer = csv.writer(
+            out,
+            delimiter=_DELIMITERS[job.spec.get('columnDelimiter', 'COMMA')],
+            lineterminator=_LINE_ENDINGS[job.spec.get('lineEnding', 'LF')],
+            quoting=csv.QUOTE_ALL)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([
+                '' if row.get(i) is None else
+                str(row[i]).lower() if isinstance(row[i], bool) else row[i]
+                for i in columns])
+        return out.getvalue()
+
+    def _bulk2_ingest_results(self, _: FakeRequest, job_id: str,
+                              results: str) -> Reply:
+        job = self._bulk2_job(job_id)
+        if results == 'unprocessedrecords':
+            return _csv(self._write_csv(job, job.columns, job.unprocessed))
+        if job.state != 'JobComplete':
+            raise SalesforceFakeError(400, 'INVALIDJOBSTATE',
+                                      f'Job is {job.state}')
+        if results == 'successfulResults':
+            return _csv(self._write_csv(
+                job, ['sf__Id', 'sf__Created'] + job.columns,
+                job.successful))
+        return _csv(self._write_csv(
+            job, ['sf__Id', 'sf__Error'] + job.columns, job.failed))
+
+    @staticmethod
+    def _bulk2_offset(request: FakeRequest) -> int:
+        locator = request.params.get('locator', '')
+        try:
+            return int(base64.b64decode(locator).decode()) if locator else 0
+        except ValueError as error:
+            raise SalesforceFakeError(400, 'INVALIDLOCATOR',
+                                      'Invalid locator') from error
+
+    def _bulk2_query_results(self, request: FakeRequest, job_id: str
+                             ) -> Reply:
+        job = self._bulk2_job(job_id)
+        if job.state != 'JobComplete':
+            raise SalesforceFakeError(400, 'INVALIDJOBSTATE',
+                                      f'Job is {job.state}')
+        offset = self._bulk2_offset(request)
+        max_records = int(request.params.get('maxRecords', 50_000))
+        page = job.query_rows[offset:offset + max_records]
+        end = offset + len(page)
+        next_locator = base64.b64encode(str(end).encode()).decode() \
+            if end < len(job.query_rows) else 'null'
+        return _csv(self._write_csv(job, job.columns, page), {
+            'Sforce-Locator': next_locator,
+            'Sforce-NumberOfRecords': str(len(page)),
+            })
+
+    def _bulk2_result_pages(self, request: FakeRequest, job_id: str
+                            ) -> Reply:
+        version = re.search(r'/v([\d.]+)/', request.path)
+        if version is None or \
+                float(version.group(1)) < BULK2_RESULT_PAGES_VERSION:
+            raise SalesforceFakeError(404, 'NOT_FOUND',
+                                      'The requested resource does not exist')
+        job = self._bulk2_job(job_id)
+        if job.state != 'JobComplete':
+            raise SalesforceFakeError(400, 'INVALIDJOBSTATE',
+                                      f'Job is {job.state}')
+        max_records = int(request.params.get('maxRecords', 50_000))
+        offsets = range(0, max(len(job.query_rows), 1), max_records)
+        start = self._bulk2_offset(request)
+        end = start + BULK2_RESULT_PAGE_LINKS
+        results = request.path.rsplit('/', 1)[0] + '/results'
+
+        def link(path: str, offset: int) -> str:
+            locator = base64.b64encode(str(offset).encode()).decode()
+            return f'{path}?maxRecords={max_records}' + (
+                f'&locator={locator}' if offset else '')
+
+        return _json(200, {
+            'resultPages': [{'resultLink': link(results, i)}
+                            for i in offsets[start:end]],
+            'nextRecordsUrl': link(request.path, end)
+            if end < len(offsets) else None,
+            })
+
+
+class FakeOrgAdapter(BaseAdapter):
+    """Transport adapter answering requests from a `FakeOrg`"""
+
+    def __init__(self, org: FakeOrg):
+        super().__init__()
+        self.org = org
+
+    # pylint: disable=too-many-arguments
+    def send(self,
+             request: requests.PreparedRequest,
+             stream: bool = False,
+             timeout: Any = None,
+             verify: Any = True,
+             cert: Any = None,
+             proxies: Any = None
+             ) -> requests.Response:
+        """Answer `request` from the fake org"""
+        body: Any = request.body
+        if hasattr(body, 'read'):
+            body = body.read()
+        elif body is not None and not isinstance(body, (str, bytes)):
+            # a streamed body, sent block by block
+            body = b''.join(body)
+        status, headers, content = self.org.handle(
+            str(request.method), str(request.url), request.headers, body)
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response.headers.setdefault('Content-Length', str(len(content)))
+        response.url = str(request.url)
+        response.request = request
+        response.reason = 'OK' if status < 400 else 'Error'
+        response.encoding = 'utf-8'
+        response.raw = io.BytesIO(content)
+        # pylint: disable=protected-access
+        response._content = content
+        response._content_consumed = True  # type: ignore[attr-defined]
+        return response
+
+    def close(self) -> None:
+        """Nothing to release"""
@@ -5,6 +5,7 @@ import re
 import unittest
 import decimal
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from unittest.mock import patch
@@ -607,6 +608,61 @@ class TestSalesforce(unittest.TestCase):
 
         self.assertDictEqual(client.api_usage, {'api-usage': Usage(18, 5000)})
 
+    @responses.activate
+    def test_hooks_shared_with_sobjects_and_bulk(self):
+        """Make sure REST and bulk calls fire the instance hooks"""
+        responses.add(
+            responses.GET,
+            re.compile(r'^https://.*/query/.*$'),
+            body='{"records": [], "done": true, "totalSize": 0}',
+            adding_headers={"Sforce-Limit-Info": "api-usage=18/5000"},
+            status=http.OK
+            )
+        responses.add(
+            responses.GET,
+            re.compile(r'^https://.*/sobjects/Contact/describe$'),
+            body='{}',
+            status=http.OK
+            )
+        responses.add(
+            responses.GET,
+            re.compile(r'^https://.*/job/Job-1$'),
+            body='{"id": "Job-1"}',
+            status=http.OK
+            )
+        client = Salesforce(session_id=tests.SESSION_ID,
+                            instance_url=tests.SERVER_URL,
+                            session=requests.Session())
+        calls = []
+        client.hooks.register_after_response(calls.append)
+
+        client.query('SELECT Id FROM Contact')
+        client.Contact.describe()
+        client.bulk.Contact._get_job('Job-1')  # pylint: disable=W0212
+
+        self.assertEqual([i.name for i in calls],
+                         ['query', 'Contact', 'bulk.get_job'])
+        self.assertEqual(calls[0].api_usage, {'api-usage': Usage(18, 5000)})
+        self.assertEqual(calls[1].url_template,
+                         '/services/data/v59.0/sobjects/Contact/describe')
+
+    def test_close_owned_executor(self):
+        """Make sure only a pool created for max_workers is shut down"""
+        with Salesforce(session_id=tests.SESSION_ID,
+                        instance_url=tests.SERVER_URL,
+                        max_workers=2) as client:
+            self.assertEqual(client.executor.submit(sum, [1, 2]).result(), 3)
+        with self.assertRaises(RuntimeError):
+            client.executor.submit(sum, [1, 2])
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            Salesforce(session_id=tests.SESSION_ID,
+                       instance_url=tests.SERVER_URL,
+                       executor=executor).close()
+            self.assertEqual(executor.submit(sum, [1, 2]).result(), 3)
+        Salesforce(session_id=tests.SESSION_ID,
+                   instance_url=tests.SERVER_URL).close()
+
     @responses.activate
     def test_api_usage_per_app(self):
         """Make sure a header response is recorded"""
@@ -811,6 +867,45 @@ class TestSalesforce(unittest.TestCase):
 
         self.assertEqual(result, tests.ORGANIZATION_LIMITS_RESPONSE)
 
+    @responses.activate
+    def test_md_soap_calls_use_session(self):
+        """Test that zeep Metadata API calls go through the shared session"""
+        mock_response = '<?xml version="1.0" ' \
+                        'encoding="UTF-8"?><soapenv:Envelope ' \
+                        'xmlns:soapenv="http://schemas.xmlsoap.org/soap' \
+                        '/envelope/" ' \
+                        'xmlns="http://soap.sforce.com/2006/04/metadata' \
+                        '"><soapenv:Body><describeMetadataResponse><result>' \
+                        '<organizationNamespace></organizationNamespace>' \
+                        '<partialSaveAllowed>true</partialSaveAllowed>' \
+                        '<testRequired>false</testRequired></result>' \
+                        '</describeMetadataResponse></soapenv:Body>' \
+                        '</soapenv:Envelope>'
+        responses.add(
+            responses.POST,
+            re.compile(r'^https://.*/services/Soap/m/'),
+            body=mock_response,
+            content_type='text/xml',
+            status=200
+            )
+
+        session = requests.Session()
+        user_agent = session.headers['User-Agent']
+        adapters = list(session.adapters)
+        client = Salesforce(session_id=tests.SESSION_ID,
+                            instance_url=tests.INSTANCE_URL,
+                            session=session)
+        # pylint: disable=protected-access
+        self.assertIs(client.mdapi._client.transport.session, session)
+        self.assertEqual(session.headers['User-Agent'], user_agent)
+        self.assertEqual(list(session.adapters), adapters)
+
+        with patch.object(session, 'post', wraps=session.post) as post:
+            result = client.mdapi.describe_metadata()
+        self.assertTrue(result.partialSaveAllowed)
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(post.call_args[0][0], client.metadata_url)
+
     @responses.activate
     def test_md_deploy_success(self):
         """"
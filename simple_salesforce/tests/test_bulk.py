@@ -1,11 +1,16 @@
 """Test for bulk.py"""
+import csv
 import http.client as http
+import io
 import json
 
 import itertools
 import random
 import re
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from unittest import mock
 from unittest.mock import patch
 
@@ -13,8 +18,11 @@ import requests
 import responses
 from simple_salesforce import tests
 from simple_salesforce.api import Salesforce
-from simple_salesforce.bulk import SFBulkType
-from simple_salesforce.exceptions import SalesforceGeneralError
+from simple_salesforce.bulk import BulkJob, SFBulkType, _BatchBuilder, \
+    _ProcessingTimes, _iter_json_array, _merge_results, _stream_records
+from simple_salesforce.exceptions import (SalesforceGeneralError,
+                                          SalesforceMalformedRequest)
+from simple_salesforce.testing import FakeOrg
 
 
 class TestSFBulkHandler(unittest.TestCase):
@@ -107,14 +115,18 @@ class TestSFBulkType(unittest.TestCase):
         )
         responses.add(
             responses.GET,
-            re.compile(r'^https://[^/job].*/job/Job-1/batch/Batch-1$'),
-            body='{"id": "Batch-1","jobId": "Job-1","state": "InProgress"}',
+            re.compile(r'^https://[^/job].*/job/Job-1/batch$'),
+            body='{"batchInfo": ['
+            '{"id": "Batch-1","jobId": "Job-1","state": "InProgress"}'
+            ']}',
             status=http.OK
         )
         responses.add(
             responses.GET,
-            re.compile(r'^https://[^/job].*/job/Job-1/batch/Batch-1$'),
-            body='{"id": "Batch-1","jobId": "Job-1","state": "Completed"}',
+            re.compile(r'^https://[^/job].*/job/Job-1/batch$'),
+            body='{"batchInfo": ['
+            '{"id": "Batch-1","jobId": "Job-1","state": "Completed"}'
+            ']}',
             status=http.OK
         )
         responses.add(
@@ -165,14 +177,18 @@ class TestSFBulkType(unittest.TestCase):
         )
         responses.add(
             responses.GET,
-            re.compile(r'^https://[^/job].*/job/Job-1/batch/Batch-1$'),
-            body='{"id": "Batch-1","jobId": "Job-1","state": "InProgress"}',
+            re.compile(r'^https://[^/job].*/job/Job-1/batch$'),
+            body='{"batchInfo": ['
+            '{"id": "Batch-1","jobId": "Job-1","state": "InProgress"}'
+            ']}',
             status=http.OK
         )
         responses.add(
             responses.GET,
-            re.compile(r'^https://[^/job].*/job/Job-1/batch/Batch-1$'),
-            body='{"id": "Batch-1","jobId": "Job-1","state": "Completed"}',
+            re.compile(r'^https://[^/job].*/job/Job-1/batch$'),
+            body='{"batchInfo": ['
+            '{"id": "Batch-1","jobId": "Job-1","state": "Completed"}'
+            ']}',
             status=http.OK
         )
         responses.add(
@@ -203,6 +219,65 @@ class TestSFBulkType(unittest.TestCase):
         contact = client.bulk.Contact.insert(data)
         self.assertEqual(self.expected, contact)
 
+    @responses.activate
+    def test_insert_bulk_event(self):
+        """Test that a finished batch fires the bulk event hooks"""
+        responses.add(
+            responses.POST,
+            re.compile(r'^https://[^/job].*/job$'),
+            body='{"apiVersion": 42.0, "concurrencyMode": "Parallel",'
+            '"contentType": "JSON","id": "Job-1","object": "Contact",'
+            '"operation": "insert","state": "Open"}',
+            status=http.OK)
+        responses.add(
+            responses.POST,
+            re.compile(r'^https://[^/job].*/job/Job-1/batch$'),
+            body='{"id": "Batch-1","jobId": "Job-1","state": "Queued"}',
+            status=http.OK
+        )
+        responses.add(
+            responses.POST,
+            re.compile(r'^https://[^/job].*/job/Job-1$'),
+            body='{"apiVersion" : 42.0, "concurrencyMode" : "Parallel",'
+            '"contentType" : "JSON","id" : "Job-1","object" : "Contact",'
+            '"operation" : "insert","state" : "Closed"}',
+            status=http.OK
+        )
+        responses.add(
+            responses.GET,
+            re.compile(r'^https://[^/job].*/job/Job-1/batch$'),
+            body='{"batchInfo": [{"id": "Batch-1","jobId": "Job-1",'
+            '"state": "Completed","numberRecordsProcessed": 2,'
+            '"numberRecordsFailed": 1,"totalProcessingTime": 250}]}',
+            status=http.OK
+        )
+        responses.add(
+            responses.GET,
+            re.compile(
+                r'^https://[^/job].*/job/Job-1/batch/Batch-1/result$'),
+            body='[{"success": true,"created": true,"id": "001xx000003DHP0AAO",'
+            '"errors": []},{"success": false,"created": false,'
+            '"id": null,"errors": ["REQUIRED_FIELD_MISSING"]}]',
+            status=http.OK
+        )
+        client = Salesforce(session_id=tests.SESSION_ID,
+                            instance_url=tests.SERVER_URL,
+                            session=requests.Session())
+        events = []
+        client.hooks.register_bulk_event(events.append)
+
+        client.bulk.Contact.insert([{'LastName': 'x'}, {'Email': 'y'}])
+
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].api, 'bulk')
+        self.assertEqual(events[0].object_name, 'Contact')
+        self.assertEqual(events[0].operation, 'insert')
+        self.assertEqual(events[0].batch_id, 'Batch-1')
+        self.assertEqual(events[0].state, 'Completed')
+        self.assertEqual(events[0].records_processed, 2)
+        self.assertEqual(events[0].records_failed, 1)
+        self.assertEqual(events[0].processing_time, 0.25)
+
     @responses.activate
     def test_upsert(self):
         """Test bulk upsert records"""
@@ -230,14 +305,18 @@ class TestSFBulkType(unittest.TestCase):
         )
         responses.add(
             responses.GET,
-            re.compile(r'^https://[^/job].*/job/Job-1/batch/Batch-1$'),
-            body='{"id": "Batch-1","jobId": "Job-1","state": "InProgress"}',
+            re.compile(r'^https://[^/job].*/job/Job-1/batch$'),
+            body='{"batchInfo": ['
+            '{"id": "Batch-1","jobId": "Job-1","state": "InProgress"}'
+            ']}',
             status=http.OK
         )
         responses.add(
             responses.GET,
-            re.compile(r'^https://[^/job].*/job/Job-1/batch/Batch-1$'),
-            body='{"id": "Batch-1","jobId": "Job-1","state": "Completed"}',
+            re.compile(r'^https://[^/job].*/job/Job-1/batch$'),
+            body='{"batchInfo": ['
+            '{"id": "Batch-1","jobId": "Job-1","state": "Completed"}'
+            ']}',
             status=http.OK
         )
         responses.add(
@@ -297,14 +376,18 @@ class TestSFBulkType(unittest.TestCase):
         )
         responses.add(
             responses.GET,
-            re.compile(r'^https://[^/job].*/job/Job-1/batch/Batch-1$'),
-            body='{"id": "Batch-1","jobId": "Job-1","state": "InProgress"}',
+            re.compile(r'^https://[^/job].*/job/Job-1/batch$'),
+            body='{"batchInfo": ['
+            '{"id": "Batch-1","jobId": "Job-1","state": "InProgress"}'
+            ']}',
             status=http.OK
         )
         responses.add(
             responses.GET,
-            re.compile(r'^https://[^/job].*/job/Job-1/batch/Batch-1$'),
-            body='{"id": "Batch-1","jobId": "Job-1","state": "Completed"}',
+            re.compile(r'^https://[^/job].*/job/Job-1/batch$'),
+            body='{"batchInfo": ['
+            '{"id": "Batch-1","jobId": "Job-1","state": "Completed"}'
+            ']}',
             status=http.OK
         )
         responses.add(
@@ -620,9 +703,193 @@ class TestSFBulkType(unittest.TestCase):
         self.assertEqual(self.expected_query, contact)
 
     @responses.activate
-    @mock.patch('simple_salesforce.bulk.SFBulkType._add_autosized_batches')
-    def test_bulk_operation_auto_batch_size(self, add_autosized_batches):
-        """Test that batch_size="auto" leads to using _add_autosized_batches"""
+    @patch('simple_salesforce.bulk.sleep')
+    def test_insert_csv(self, _):
+        """Test bulk insert records as CSV"""
+        batch_info = (
+            '<batchInfo xmlns="http://www.force.com/2009/06/asyncapi/'
+            'dataload"><id>Batch-1</id><jobId>Job-1</jobId>'
+            '<state>{}</state><numberRecordsProcessed>2'
+            '</numberRecordsProcessed></batchInfo>')
+        responses.add(
+            responses.POST,
+            re.compile(r'^https://[^/job].*/job$'),
+            body='{"contentType": "CSV","id": "Job-1","object": "Contact",'
+            '"operation": "insert","state": "Open"}',
+            status=http.OK)
+        responses.add(
+            responses.POST,
+            re.compile(r'^https://[^/job].*/job/Job-1/batch$'),
+            body='<?xml version="1.0" encoding="UTF-8"?>' +
+            batch_info.format('Queued'),
+            content_type='application/xml',
+            status=http.OK
+        )
+        responses.add(
+            responses.POST,
+            re.compile(r'^https://[^/job].*/job/Job-1$'),
+            body='{"id": "Job-1","state": "Closed"}',
+            status=http.OK
+        )
+        responses.add(
+            responses.GET,
+            re.compile(r'^https://[^/job].*/job/Job-1/batch$'),
+            body='<batchInfoList xmlns="http://www.force.com/2009/06/'
+            f'asyncapi/dataload">{batch_info.format("Completed")}'
+            '</batchInfoList>',
+            content_type='application/xml',
+            status=http.OK
+        )
+        responses.add(
+            responses.GET,
+            re.compile(
+                r'^https://[^/job].*/job/Job-1/batch/Batch-1/result$'),
+            body='"Id","Success","Created","Error"\n'
+            '"001xx000003DHP0AAO","true","true",""\n'
+            '"","false","false","REQUIRED_FIELD_MISSING:Required fields '
+            'are missing: [LastName]"\n',
+            content_type='text/csv',
+            status=http.OK
+        )
+        client = Salesforce(session_id=tests.SESSION_ID,
+                            instance_url=tests.SERVER_URL,
+                            session=requests.Session())
+
+        results = client.bulk.Contact.insert(
+            [{'LastName': 'x', 'Account': {'External__c': 'A-1'},
+              'DoNotCall': True},
+             {'FirstName': 'Bob, "Jr"', 'Email': None}],
+            content_type='CSV')
+
+        self.assertEqual(
+            json.loads(responses.calls[0].request.body)['contentType'],
+            'CSV')
+        batch = responses.calls[1].request
+        self.assertEqual(batch.headers['Content-Type'], 'text/csv')
+        self.assertEqual(
+            batch.body,
+            'LastName,Account.External__c,DoNotCall,FirstName,Email\n'
+            'x,A-1,true,,\n'
+            ',,,"Bob, ""Jr""",#N/A\n')
+        self.assertEqual(
+            results,
+            [{'success': True, 'created': True, 'id': '001xx000003DHP0AAO',
+              'errors': []},
+             {'success': False, 'created': False, 'id': None,
+              'errors': [{'statusCode': 'REQUIRED_FIELD_MISSING',
+                          'message': 'Required fields are missing: '
+                                     '[LastName]',
+                          'fields': []}]}])
+
+    @responses.activate
+    @patch('simple_salesforce.bulk.sleep')
+    def test_query_csv(self, _):
+        """Test bulk query records as CSV"""
+        responses.add(
+            responses.POST,
+            re.compile(r'^https://[^/job].*/job$'),
+            body='{"contentType": "CSV","id": "Job-1","object": "Contact",'
+            '"operation": "query","state": "Open"}',
+            status=http.OK)
+        responses.add(
+            responses.POST,
+            re.compile(r'^https://[^/job].*/job/Job-1/batch$'),
+            body='<batchInfo xmlns="http://www.force.com/2009/06/asyncapi/'
+            'dataload"><id>Batch-1</id><jobId>Job-1</jobId>'
+            '<state>Queued</state></batchInfo>',
+            content_type='application/xml',
+            status=http.OK
+        )
+        responses.add(
+            responses.POST,
+            re.compile(r'^https://[^/job].*/job/Job-1$'),
+            body='{"id": "Job-1","state": "Closed"}',
+            status=http.OK
+        )
+        responses.add(
+            responses.GET,
+            re.compile(r'^https://[^/job].*/job/Job-1/batch/Batch-1$'),
+            body='<batchInfo xmlns="http://www.force.com/2009/06/asyncapi/'
+            'dataload"><id>Batch-1</id><jobId>Job-1</jobId>'
+            '<state>Completed</state></batchInfo>',
+            content_type='application/xml',
+            status=http.OK
+        )
+        responses.add(
+            responses.GET,
+            re.compile(
+                r'^https://[^/job].*/job/Job-1/batch/Batch-1/result$'),
+            body='<result-list xmlns="http://www.force.com/2009/06/asyncapi/'
+            'dataload"><result>752x000000000F1</result>'
+            '<result>752x000000000F2</result></result-list>',
+            content_type='application/xml',
+            status=http.OK
+        )
+        for result_id, name in (('752x000000000F1', 'Bob'),
+                                ('752x000000000F2', 'Al\u00efce')):
+            responses.add(
+                responses.GET,
+                re.compile(r'^https://[^/job].*/job/Job-1/batch/Batch-1'
+                           f'/result/{result_id}$'),
+                body=f'"Id","FirstName","Account.Name"\n'
+                f'"{result_id}","{name}","Multi\nline"\n'.encode('utf-8'),
+                content_type='text/csv',
+                status=http.OK
+            )
+        client = Salesforce(session_id=tests.SESSION_ID,
+                            instance_url=tests.SERVER_URL,
+                            session=requests.Session())
+
+        rows = client.bulk.Contact.query(
+            'SELECT Id, FirstName, Account.Name FROM Contact',
+            content_type='CSV')
+
+        self.assertEqual(
+            rows,
+            [{'Id': '752x000000000F1', 'FirstName': 'Bob',
+              'Account.Name': 'Multi\nline'},
+             {'Id': '752x000000000F2', 'FirstName': 'Al\u00efce',
+              'Account.Name': 'Multi\nline'}])
+
+    @patch('simple_salesforce.bulk.sleep')
+    def test_include_detailed_results(self, _):
+        """Test that results are merged with the records sent for them"""
+        org = FakeOrg()
+        org.required_fields['Contact'] = ['LastName']
+        contact = org.client().bulk.Contact
+        data = [{'LastName': f'Last {i}', 'Email': f'{i}@example.com'}
+                for i in range(5)] + [{'Email': 'missing@example.com'}]
+
+        for content_type in ('JSON', 'CSV'):
+            results = contact.insert(data, batch_size=4,
+                                     include_detailed_results=True,
+                                     content_type=content_type)
+            self.assertEqual([i['Email'] for i in results],
+                             [i['Email'] for i in data])
+            self.assertEqual([i['success'] for i in results],
+                             [True] * 5 + [False])
+            self.assertEqual(results[0]['LastName'], 'Last 0')
+
+        merged = list(_merge_results(
+            [[{'success': True}], [{'success': False}]],
+            [{'Id': '1', 'Account': {'Ext__c': 'a'}}, {'Id': '2'}]))
+        self.assertEqual(merged, [
+            {'success': True, 'Id': '1', 'Account.Ext__c': 'a'},
+            {'success': False, 'Id': '2'}])
+
+    def test_invalid_content_type(self):
+        """Test that unknown content types are refused"""
+        client = Salesforce(session_id=tests.SESSION_ID,
+                            instance_url=tests.SERVER_URL,
+                            session=requests.Session())
+        with self.assertRaises(ValueError):
+            client.bulk.Contact.insert([{'LastName': 'x'}],
+                                       content_type='XML')
+
+    @responses.activate
+    @mock.patch('simple_salesforce.bulk.SFBulkType._add_batches')
+    def test_bulk_operation_auto_batch_size(self, add_batches):
+        """Test that batch_size="auto" only cuts batches at the API limits"""
         session = requests.Session()
         client = Salesforce(session_id=tests.SESSION_ID,
                             instance_url=tests.SERVER_URL,
@@ -651,40 +918,283 @@ class TestSFBulkType(unittest.TestCase):
             'FirstName': 'Bob',
             'LastName': 'x'
         }]
-        add_autosized_batches.return_value = []
-        client.bulk.Contact._bulk_operation(  # pylint: disable=protected-access
-            operation, data, batch_size="auto"
-        )
-        add_autosized_batches.assert_called_once_with(
-            job='Job-1', data=data, operation=operation
-        )
+        add_batches.return_value = [], 1
+        for batch_size, record_limit in (('auto', 10_000), (500, 500)):
+            client.bulk.Contact._bulk_operation(  # pylint: disable=protected-access
+                operation, data, batch_size=batch_size
+            )
+            _, kwargs = add_batches.call_args
+            self.assertEqual(list(kwargs['data']), data)
+            self.assertEqual(kwargs['record_limit'], record_limit)
+
+    @patch('simple_salesforce.bulk.sleep')
+    def test_wait_for_batches(self, sleep):
+        """Test that batches are polled together with a growing interval"""
+        def batches(*states):
+            return [{'id': f'Batch-{i}', 'jobId': 'Job-1', 'state': state}
+                    for i, state in enumerate(states, 1)]
+        bulk_type = SFBulkType('Contact', tests.SERVER_URL, {}, None)
+        finished = []
+        with patch.object(bulk_type, '_get_batches', side_effect=[
+                batches('Queued', 'InProgress', 'Queued'),
+                batches('InProgress', 'InProgress', 'InProgress'),
+                batches('InProgress', 'Completed', 'InProgress'),
+                batches('InProgress', 'Completed', 'InProgress'),
+                batches('Failed', 'Completed', 'Completed'),
+                ]) as get_batches:
+            result = bulk_type._wait_for_batches(  # pylint: disable=protected-access
+                'Job-1', ['Batch-1', 'Batch-2', 'Batch-3'], 'insert', wait=2,
+                on_finished=lambda i: finished.append(i['id']))
+
+        self.assertEqual(get_batches.call_count, 5)
+        self.assertEqual([i.args[0] for i in sleep.call_args_list],
+                         [2, 3.0, 2, 3.0])
+        self.assertEqual(finished, ['Batch-2', 'Batch-1', 'Batch-3'])
+        self.assertEqual(result['Batch-1']['state'], 'Failed')
+
+    @patch('simple_salesforce.bulk.sleep')
+    def test_concurrent_uploads(self, _):
+        """Test that batches are uploaded concurrently, results in order"""
+        org = FakeOrg()
+        contact = org.client().bulk.Contact
+        add_batch = contact._add_batch  # pylint: disable=protected-access
+        lock = threading.Lock()
+        active = [0]
+        most_active = [0]
+
+        def slow_add_batch(*args, **kwargs):
+            with lock:
+                active[0] += 1
+                most_active[0] = max(most_active[0], active[0])
+            time.sleep(0.05)
+            try:
+                return add_batch(*args, **kwargs)
+            finally:
+                with lock:
+                    active[0] -= 1
+
+        data = [{'LastName': f'Last {i}'} for i in range(10)]
+        with patch.object(contact, '_add_batch', side_effect=slow_add_batch):
+            results = contact.insert(data, batch_size=2, concurrency=3)
+        self.assertEqual(most_active[0], 3)
+        names = {i['Id']: i['LastName'] for i in org.get_records('Contact')}
+        self.assertEqual([names[i['id']] for i in results],
+                         [i['LastName'] for i in data])
+
+        most_active[0] = 0
+        with patch.object(contact, '_add_batch', side_effect=slow_add_batch):
+            contact.insert(data, batch_size=2, use_serial=True)
+        self.assertEqual(most_active[0], 1)
+
+    def test_upload_failure(self):
+        """Test that a failed upload stops the operation"""
+        org = FakeOrg()
+        org.inject_error(400, method='POST', path='/batch$')
+        with self.assertRaises(SalesforceMalformedRequest):
+            org.client().bulk.Contact.insert(
+                ({'LastName': f'Last {i}'} for i in range(100)),
+                batch_size=1, concurrency=1)
+        self.assertLess(len(org.get_records('Contact')), 100)
+
+    @patch('simple_salesforce.bulk.sleep')
+    def test_query_pk_chunking(self, _):
+        """Test that the batches of a PK chunking query are discovered"""
+        org = FakeOrg(processing_polls=1)
+        ids = org.add_records('Contact', [{'LastName': f'Last {i}'}
+                                          for i in range(5)])
+        contact = org.client().bulk.Contact
+
+        with patch.object(org, 'handle', wraps=org.handle) as handle:
+            rows = contact.query('SELECT Id FROM Contact',
+                                 pk_chunking={'chunkSize': 2,
+                                              'parent': 'Contact'},
+                                 concurrency=2)
+
+        self.assertEqual(handle.call_args_list[0].args[2][
+            'Sforce-Enable-PKChunking'], 'chunkSize=2; parent=Contact')
+        self.assertEqual(sorted(i['Id'] for i in rows), ids)
+        # one download per chunk, none for the batch holding the query
+        self.assertEqual(len([i for _, i in org.request_log
+                              if i.endswith('/result')]), 3)
+
+    @patch('simple_salesforce.bulk.sleep')
+    @patch('simple_salesforce.bulk.RESULT_PAGE_RECORDS', 100)
+    def test_closed_query_pk_chunking(self, _):
+        """Test that a closed PK chunking query stops polling and
+        downloading"""
+        org = FakeOrg()
+        org.add_records('Contact', ({'LastName': str(i)}
+                                    for i in range(25_000)))
+        contact = org.client().bulk.Contact
+        wait_for_batches = SFBulkType._wait_for_batches  # pylint: disable=W0212
+        polled = threading.Event()
+
+        def wait(*args, **kwargs):
+            try:
+                return wait_for_batches(*args, **kwargs)
+            finally:
+                polled.set()
+
+        with patch.object(SFBulkType, '_wait_for_batches', wait):
+            rows = contact.query('SELECT Id FROM Contact', pk_chunking=5000,
+                                 lazy_operation=True, concurrency=2)
+            next(rows)
+            sent = len(org.request_log)
+            rows.close()
+            self.assertTrue(polled.wait(10))
+
+        # only the downloads already started may still send their request
+        self.assertLessEqual(len(org.request_log) - sent, 2)
+
+    @patch('simple_salesforce.bulk.sleep')
+    def test_query_pk_chunking_fail(self, _):
+        """Test that a failed PK chunking query raises"""
+        org = FakeOrg()
+        with self.assertRaises(SalesforceGeneralError):
+            org.client().bulk.Contact.query('SELECT Id FROM Contact '
+                                            'GROUP BY Id',
+                                            pk_chunking=True)
+
+    @patch('simple_salesforce.bulk.sleep')
+    def test_lazy_results(self, _):
+        """Test that DML results are streamed in order, or only failures"""
+        org = FakeOrg(processing_polls=1)
+        org.required_fields['Contact'] = ['LastName']
+        contact = org.client().bulk.Contact
+        records = [{'LastName': f'Last {i}'} for i in range(5)]
+        records.insert(2, {'FirstName': 'No last name'})
+
+        results = contact.insert(records, batch_size=2, lazy_operation=True)
+
+        self.assertNotIsInstance(results, list)
+        self.assertEqual([i['success'] for i in results],
+                         [True, True, False, True, True, True])
+        self.assertEqual(
+            len(contact.insert(records, batch_size=2, failures_only=True)),
+            1)
+        failures = list(contact.insert(records, batch_size=2,
+                                       include_detailed_results=True,
+                                       lazy_operation=True,
+                                       failures_only=True))
+        self.assertEqual(failures[0]['FirstName'], 'No last name')
+        self.assertEqual(failures[0]['errors'][0]['statusCode'],
+                         'REQUIRED_FIELD_MISSING')
 
-    @mock.patch('simple_salesforce.bulk.SFBulkType._add_batch')
-    def test_add_autosized_batches(self, add_batch):
-        """Test that _add_autosized_batches batches all records correctly"""
-        # _add_autosized_batches passes the return values from add_batch, so we
-        # can pass the data it was given back so that we can test it
-        add_batch.side_effect = lambda job_id, data, operation: data
-        sf_bulk_type = SFBulkType(None, None, None, None)
+    @patch('simple_salesforce.bulk.sleep')
+    def test_lock_retries(self, _):
+        """Test that records failing on row locks are retried in order"""
+        org = FakeOrg()
+        contact = org.client().bulk.Contact
+        records = [{'LastName': f'Last {i}', 'AccountId': f'001{i % 2}'}
+                   for i in range(6)]
+        org.inject_lock_errors(4)
+
+        with patch.object(
+                contact, '_bulk_operation',
+                wraps=contact._bulk_operation  # pylint: disable=protected-access
+                ) as operation:
+            results = contact.insert(records, lock_retries=2,
+                                     include_detailed_results=True)
+
+        self.assertEqual([i['LastName'] for i in results],
+                         [i['LastName'] for i in records])
+        self.assertTrue(all(i['success'] for i in results))
+        # the 4 failed records, grouped by account, in a serial job
+        retry = operation.call_args_list[2]
+        self.assertEqual([i['LastName'] for i in retry.args[1]],
+                         ['Last 0', 'Last 2', 'Last 1', 'Last 3'])
+        self.assertTrue(retry.kwargs['use_serial'])
+        self.assertEqual(operation.call_count, 3)
+
+        org.inject_lock_errors(100)
+        failures = contact.update(
+            [{'Id': i['id'], 'LastName': 'x'} for i in results[:2]],
+            lock_retries=2, failures_only=True)
+        self.assertEqual([i['errors'][0]['statusCode'] for i in failures],
+                         ['UNABLE_TO_LOCK_ROW'] * 2)
+        with self.assertRaises(ValueError):
+            contact.insert(records, lock_retries=1, lazy_operation=True)
+
+    @patch('simple_salesforce.bulk.sleep')
+    def test_adaptive_batch_size(self, _):
+        """Test that adaptive batches are sized from processing times"""
+        org = FakeOrg()
+        contact = org.client().bulk.Contact
+        # pylint: disable=protected-access
+        limit = contact._adaptive_record_limit
+        times = _ProcessingTimes()
+        key = (contact.bulk_url, 'Contact', 'insert')
+
+        with patch('simple_salesforce.bulk._PROCESSING_TIMES', times):
+            self.assertEqual(limit('insert'), 2000)
+            times.add(key, {'numberRecordsProcessed': 100,
+                            'totalProcessingTime': 100_000})
+            self.assertEqual(limit('insert'), 200)
+            times.add(key, {'numberRecordsProcessed': 100,
+                            'totalProcessingTime': 0})
+            self.assertEqual(limit('insert'), 240)
+
+            with patch.object(times, 'add'), \
+                    patch.object(contact, '_add_batch',
+                                 wraps=contact._add_batch) as add_batch:
+                contact.insert([{'LastName': f'Last {i}'}
+                                for i in range(500)],
+                               batch_size='adaptive')
+            self.assertEqual(
+                sorted(i.kwargs['data'].records
+                       for i in add_batch.call_args_list),
+                [20, 240, 240])
+
+            contact.insert([{'LastName': 'x'}], batch_size='adaptive')
+            self.assertLess(times.get(key), 0.5)
+
+    @patch('simple_salesforce.bulk.sleep')
+    def test_executor(self, _):
+        """Test that the requests of a client run in its executor"""
+        org = FakeOrg()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pool = mock.Mock(wraps=executor)
+            client = org.client(executor=pool)
+
+            results = client.bulk.Contact.insert(
+                [{'LastName': f'Last {i}'} for i in range(5)], batch_size=2)
+            self.assertEqual(pool.submit.call_count, 6)
+            # result sets are downloaded in threads of their own, as they
+            # wait on the consumer of the query
+            rows = client.bulk.Contact.query('SELECT Id FROM Contact',
+                                             pk_chunking=2)
+
+        self.assertEqual(pool.submit.call_count, 6)
+        self.assertEqual(sorted(i['Id'] for i in rows),
+                         sorted(i['id'] for i in results))
+        self.assertIs(client.bulk2.Contact.executor, pool)
+        self.assertIsInstance(org.client(max_workers=2).bulk.Contact.executor,
+                              ThreadPoolExecutor)
+        self.assertIsNone(org.client().bulk.Contact.executor)
+
+    def test_batch_builder(self):
+        """Test that _BatchBuilder batches all records correctly"""
+        # Expected serialized record size of 16 to 1516. Idea is that
+        # earlier record batches are split on record count, whereas later
+        # batches are split for hitting the byte limit.
         data = [
-            # Expected serialized record size of 13 to 1513. Idea is that
-            # earlier record batches are split on record count, whereas later
-            # batches are split for hitting the byte limit.
             {'key': 'value' * random.randint(0, i // 50)}
             for i in range(30000)
         ]
-        result = sf_bulk_type._add_autosized_batches(  # pylint: disable=protected-access
-            data=data, operation="update", job="Job-1"
-        )
-        reconstructed_data = list(itertools.chain(*result))
+        builder = _BatchBuilder()
+        result = list(builder.build(iter(data)))
+        batches = [json.loads(i.data) for i in result]
         # all data was put in a batch
-        self.assertEqual(len(data), len(reconstructed_data))
-        self.assertEqual(data, list(itertools.chain(*result)))
+        self.assertEqual(builder.records, len(data))
+        self.assertEqual(data, list(itertools.chain(*batches)))
 
         for i, batch in enumerate(result):
-            record_count = len(batch)
-            size_in_bytes = len(json.dumps(batch))
+            record_count = batch.records
+            size_in_bytes = len(batch.data)
             is_last_batch = i == len(result) - 1
+            serialized = ','.join(json.dumps(j) for j in batches[i])
+            self.assertEqual(batch.data, f'[{serialized}]')
+            self.assertEqual(record_count, len(batches[i]))
             # Check that all batches are within limits
             self.assertLessEqual(record_count, 10_000)
             self.assertLessEqual(size_in_bytes, 10_000_000)
@@ -693,6 +1203,258 @@ class TestSFBulkType(unittest.TestCase):
             self.assertTrue(
                 is_last_batch or
                 record_count == 10_000 or
-                (size_in_bytes + len(json.dumps(result[i + 1][0])) + 2
+                (size_in_bytes + len(json.dumps(batches[i + 1][0])) + 1
                     > 10_000_000)
             )
+
+    def test_batch_builder_csv(self):
+        """Test CSV batches with columns that appear in later records"""
+        builder = _BatchBuilder('CSV', record_limit=2, char_limit=70)
+        result = list(builder.build([
+            {'Id': '1', 'Name': 'a'},
+            {'Id': '2', 'Email': 'b@example.com', 'Name': None},
+            {'Id': '3', 'Account': {'Ext__c': 'x,"y"'}},
+            {'Id': '4', 'Name': 'caf\u00e9 ' * 8},
+            ]))
+
+        self.assertEqual([i.data for i in result], [
+            'Id,Name,Email\n1,a,\n2,#N/A,b@example.com\n',
+            'Id,Name,Email,Account.Ext__c\n3,,,"x,""y"""\n',
+            'Id,Name,Email,Account.Ext__c\n4,' + 'caf\u00e9 ' * 8 + ',,\n',
+            ])
+        self.assertEqual([i.records for i in result], [2, 1, 1])
+        self.assertTrue(all(len(i.data.encode('utf-8')) <= 70 or i.records == 1
+                            for i in result))
+
+    def test_batch_builder_csv_line_breaks(self):
+        """Test that values with line breaks are quoted in CSV batches"""
+        records = [{'LastName': 'Doe', 'MailingStreet': '1 Main St\nSuite 2'},
+                   {'LastName': 'Roe', 'MailingStreet': 'PO Box 1\r\nA'}]
+        result = list(_BatchBuilder('CSV').build(records))
+
+        self.assertEqual(len(result), 1)
+        self.assertEqual(
+            list(csv.DictReader(io.StringIO(result[0].data, newline=''))),
+            records)
+
+    @patch('simple_salesforce.bulk.STREAM_CHUNK_SIZE', 3)
+    def test_iter_json_array(self):
+        """Test that JSON arrays are decoded item by item across chunks"""
+        items = [{'Name': 'a, [b]', 'Amount': 12.5}, 1234, 'x', None,
+                 {'Nested': {'Id': '001'}}]
+        text = json.dumps(items, indent=1)
+
+        self.assertEqual(list(_iter_json_array(io.StringIO(text))), items)
+        self.assertEqual(list(_iter_json_array(io.StringIO(' [ ] '))), [])
+        with self.assertRaises(ValueError):
+            list(_iter_json_array(io.StringIO(text[:-3])))
+        with self.assertRaises(ValueError):
+            list(_iter_json_array(io.StringIO('{"a": 1}')))
+
+    def test_iter_json_array_numbers(self):
+        """Test that numbers cut by the end of a chunk are decoded whole"""
+        for text, items in (('[-1.5, 2]', [-1.5, 2]),
+                            ('[1.5e10]', [1.5e10]),
+                            ('[12,-3.25e-2 ,\n0]', [12, -3.25e-2, 0]),
+                            ('[1, {"a": 2}, [3.5], "4"]',
+                             [1, {'a': 2}, [3.5], '4'])):
+            for size in range(1, 8):
+                with self.subTest(text=text, size=size), \
+                        patch('simple_salesforce.bulk.STREAM_CHUNK_SIZE',
+                              size):
+                    self.assertEqual(
+                        list(_iter_json_array(io.StringIO(text))), items)
+
+    @patch('simple_salesforce.bulk.RESULT_PAGE_RECORDS', 4000)
+    def test_query_result_sets(self):
+        """Test that result sets are streamed in order, a page at a time"""
+        org = FakeOrg()
+        ids = org.add_records('Contact', ({'LastName': str(i)}
+                                          for i in range(25_000)))
+        contact = org.client().bulk.Contact
+
+        for content_type in ('JSON', 'CSV'):
+            pages = list(contact.query('SELECT Id FROM Contact',
+                                       lazy_operation=True,
+                                       content_type=content_type,
+                                       concurrency=3))
+            self.assertEqual([len(i) for i in pages],
+                             [4000, 4000, 2000] * 2 + [4000, 1000])
+            self.assertEqual([i['Id'] for page in pages for i in page], ids)
+
+    @patch('simple_salesforce.bulk.RESULT_PAGE_RECORDS', 100)
+    def test_closed_lazy_query(self):
+        """Test that downloads stop once the lazy query is closed"""
+        org = FakeOrg()
+        org.add_records('Contact', ({'LastName': str(i)}
+                                    for i in range(30_000)))
+        read, closed = [], threading.Semaphore(0)
+
+        def counted(result):
+            try:
+                for record in _stream_records(result):
+                    read.append(record)
+                    yield record
+            finally:
+                closed.release()
+
+        with patch('simple_salesforce.bulk._stream_records', counted):
+            rows = org.client().bulk.Contact.query('SELECT Id FROM Contact',
+                                                   lazy_operation=True)
+            next(rows)
+            rows.close()
+            for _ in range(3):
+                # pylint: disable-next=consider-using-with
+                self.assertTrue(closed.acquire(timeout=10))
+
+        self.assertLess(len(read), 3_000)
+
+    @patch('simple_salesforce.bulk.RESULT_PAGE_RECORDS', 100)
+    def test_interleaved_lazy_queries(self):
+        """Test that lazy queries waiting on their consumer do not hold
+        the workers of the executor"""
+        org = FakeOrg()
+        org.add_records('Contact', ({'LastName': str(i)}
+                                    for i in range(30_000)))
+        contact = org.client(max_workers=1).bulk.Contact
+        first, second = (contact.query('SELECT Id FROM Contact',
+                                       lazy_operation=True)
+                         for _ in range(2))
+        pages = []
+
+        def consume():
+            pages.extend([next(first), next(second)])
+            pages.extend(itertools.chain(first, second))
+
+        thread = threading.Thread(target=consume, daemon=True)
+        thread.start()
+        thread.join(60)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(sum(len(i) for i in pages), 60_000)
+
+
+class TestBulkJob(unittest.TestCase):
+    """Test jobs submitted without waiting for them"""
+
+    @patch('simple_salesforce.bulk.sleep')
+    def test_submit_and_wait_all(self, sleep):
+        """Test that jobs of several objects are waited for together"""
+        org = FakeOrg(processing_polls=2)
+        bulk = org.client().bulk
+        contacts = [{'LastName': f'Last {i}'} for i in range(5)]
+
+        jobs = [bulk.Contact.submit('insert', contacts, batch_size=2),
+                bulk.Account.submit('insert', [{'Name': 'Acme'}])]
+
+        self.assertEqual(len(jobs[0].batch_ids), 3)
+        self.assertFalse(jobs[0].done)
+        self.assertTrue(BulkJob.wait_all(jobs, wait=2))
+        self.assertEqual([i.args[0] for i in sleep.call_args_list],
+                         [2, 3.0])
+        names = {i['Id']: i['LastName'] for i in org.get_records('Contact')}
+        self.assertEqual([names[i['id']] for i in jobs[0].results()],
+                         [i['LastName'] for i in contacts])
+        self.assertEqual(len(list(jobs[1].results())), 1)
+
+    @patch('simple_salesforce.bulk.sleep')
+    def test_resume_job(self, _):
+        """Test that a job handle can be resumed from its serialized state"""
+        org = FakeOrg()
+        job = org.client().bulk.Contact.submit(
+            'insert', [{'LastName': 'Doe'}], include_detailed_results=True,
+            content_type='CSV')
+
+        state = json.loads(json.dumps(job.to_dict()))
+        resumed = org.client().bulk.resume_job(state)
+
+        self.assertEqual(resumed.to_dict(), job.to_dict())
+        result, = resumed.results()
+        self.assertTrue(result['success'])
+        self.assertEqual(result['LastName'], 'Doe')
+
+    def test_timeout_and_abort(self):
+        """Test that waiting gives up after the timeout, and aborting"""
+        org = FakeOrg(processing_polls=100)
+        job = org.client().bulk.Contact.submit(
+            'insert', [{'LastName': 'Doe'}])
+
+        self.assertFalse(job.wait(timeout=0))
+        job.abort()
+
+        self.assertEqual(job.state, 'Aborted')
+        self.assertTrue(job.poll())
+        self.assertEqual([i['state'] for i in job.batches.values()],
+                         ['NotProcessed'])
+        self.assertEqual(org.get_records('Contact'), [])
+
+    @patch('simple_salesforce.bulk.sleep')
+    def test_writer(self, _):
+        """Test that records written over time share a single job"""
+        org = FakeOrg()
+        contact = org.client().bulk.Contact
+        processed = []
+        contacts = [{'LastName': f'Last {i}'} for i in range(5)]
+
+        with contact.writer('insert', batch_size=2,
+                            on_results=lambda info, rows:
+                            processed.extend(rows)) as writer:
+            for record in contacts:
+                writer.write(record)
+
+        self.assertEqual(len([i for i in org.request_log
+                              if i == ('POST', '/services/async/59.0/job')]),
+                         1)
+        self.assertEqual(len(writer.job.batch_ids), 3)
+        self.assertEqual(len(processed), 5)
+        names = {i['Id']: i['LastName'] for i in org.get_records('Contact')}
+        self.assertEqual([names[i['id']] for i in writer.job.results()],
+                         [i['LastName'] for i in contacts])
+        with self.assertRaises(ValueError):
+            writer.write(contacts[0])
+
+    @patch('simple_salesforce.bulk.sleep')
+    def test_writer_error(self, _):
+        """Test that an error in the block aborts the job and propagates"""
+        org = FakeOrg(processing_polls=100)
+        contact = org.client().bulk.Contact
+
+        with self.assertRaises(RuntimeError):
+            with contact.writer('insert', batch_size=2) as writer:
+                for i in range(3):
+                    writer.write({'LastName': f'Last {i}'})
+                raise RuntimeError('producer failed')
+
+        self.assertIsNone(writer.job)
+        # pylint: disable-next=protected-access
+        self.assertEqual(contact._get_job(writer.job_id)['state'], 'Aborted')
+        self.assertEqual(org.get_records('Contact'), [])
+        self.assertEqual(len([i for i in org.request_log
+                              if i[1].endswith('/batch')
+                              and i[0] == 'POST']), 1)
+
+        with patch.object(SFBulkType, '_abort_job',
+                          side_effect=SalesforceGeneralError(
+                              '', 500, 'job', {})), \
+                self.assertLogs('simple_salesforce.bulk', level='ERROR'), \
+                self.assertRaises(RuntimeError):
+            with contact.writer('insert') as writer:
+                raise RuntimeError('producer failed')
+
+    @patch('simple_salesforce.bulk.sleep')
+    def test_writer_max_age(self, _):
+        """Test that a batch is uploaded once it is old enough"""
+        org = FakeOrg()
+        writer = org.client().bulk.Contact.writer('insert', max_age=0.01)
+        writer.open()
+        writer.write({'LastName': 'Doe'})
+
+        deadline = time.monotonic() + 5
+        while not org.get_records('Contact') and time.monotonic() < deadline:
+            time.sleep(0.01)
+            # pylint: disable-next=protected-access
+            writer.bulk._get_batches(writer.job_id)
+        self.assertEqual(len(org.get_records('Contact')), 1)
+
+        job = writer.close()
+        self.assertEqual(len(job.batch_ids), 1)
@@ -1,12 +1,16 @@
 """Test for bulk2.py"""
 import csv
+import gzip
 import http.client as http
+import io
 import json
 import os
 import re
 import tempfile
 import textwrap
+import threading
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from functools import partial
 from unittest.mock import patch
@@ -16,7 +20,10 @@ import responses
 
 from simple_salesforce import tests
 from simple_salesforce.api import Salesforce
-from simple_salesforce.bulk2 import JobState, Operation
+from simple_salesforce.bulk2 import Compression, JobState, Operation, \
+    _Bulk2Client, _GzipBody, _count_csv, _split_csv
+from simple_salesforce.exceptions import SalesforceBulkV2LoadError
+from simple_salesforce.testing import FakeOrg
 
 # pylint: disable=line-too-long,missing-docstring
 
@@ -278,6 +285,144 @@ class TestSFBulk2Type(unittest.TestCase):
             results,
         )
 
+    @responses.activate
+    def test_insert_streamed(self):
+        """Test that files are streamed to Salesforce with their size"""
+        ingest_responses(Operation.insert, processed=2)
+        client = Salesforce(
+            session_id=tests.SESSION_ID,
+            instance_url=tests.SERVER_URL,
+            session=requests.Session(),
+        )
+        with to_csv_file(self.insert_data) as csv_file:
+            client.bulk2.Contact.insert(csv_file)
+            with open(csv_file, "rb") as bis:
+                expected = bis.read()
+        request = [i.request for i in responses.calls
+                   if i.request.method == responses.PUT][0]
+        self.assertNotIsInstance(request.body, bytes)
+        self.assertEqual(b"".join(request.body), expected)
+        self.assertEqual(request.headers["Content-Length"], str(len(expected)))
+
+        # pylint: disable=protected-access
+        client.bulk2.Contact._client.upload_job_data(
+            "Job-1", (line.encode() for line in ["Id\n", "ID-13\n"]), size=9)
+        request = responses.calls[-1].request
+        self.assertEqual(request.headers["Content-Length"], "9")
+        self.assertNotIn("Transfer-Encoding", request.headers)
+        self.assertEqual(b"".join(request.body), b"Id\nID-13\n")
+
+    def test_insert_concurrency(self):
+        """Test that a slow job does not hold back the next ones"""
+        lock = threading.Lock()
+        uploads = []
+
+        def latency(method, path):
+            with lock:
+                if method != "PUT":
+                    return 0
+                uploads.append(path)
+                return 0.5 if len(uploads) == 1 else 0
+
+        org = FakeOrg(latency=latency)
+        records = [{"LastName": f"Last {i}"} for i in range(10)]
+
+        results = org.client().bulk2.Contact.insert(
+            records=records, batch_size=3, concurrency=2, wait=0)
+
+        self.assertEqual([i["numberRecordsProcessed"] for i in results],
+                         [3, 3, 3, 1])
+        self.assertEqual(
+            [path for method, path in org.request_log if method == "PUT"],
+            uploads[1:] + uploads[:1])
+
+    def test_insert_concurrency_executor(self):
+        """Test that concurrent jobs only submit their uploads to the
+        executor"""
+        threads = []
+
+        def latency(method, _):
+            threads.append((method, threading.current_thread().name))
+            return 0
+
+        org = FakeOrg(latency=latency)
+        records = [{"LastName": f"Last {i}"} for i in range(10)]
+        with ThreadPoolExecutor(max_workers=1,
+                                thread_name_prefix="executor") as executor:
+            results = org.client(executor=executor).bulk2.Contact.insert(
+                records=records, batch_size=3, concurrency=2, wait=0)
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(
+            {method for method, name in threads
+             if name.startswith("executor")},
+            {"PUT"})
+        self.assertEqual(
+            len([method for method, _ in threads if method == "PUT"]), 4)
+
+    def test_insert_concurrency_error(self):
+        """Test that a failed upload aborts its job and starts no other"""
+        org = FakeOrg()
+        records = [{"LastName": f"Last {i}"} for i in range(10)]
+        upload_job_data = _Bulk2Client.upload_job_data
+        uploads = []
+
+        def upload(client, job_id, data, **kwargs):
+            uploads.append(job_id)
+            if len(uploads) == 2:
+                raise SalesforceBulkV2LoadError("upload failed")
+            return upload_job_data(client, job_id, data, **kwargs)
+
+        with patch.object(_Bulk2Client, "upload_job_data", upload), \
+                self.assertRaises(SalesforceBulkV2LoadError):
+            org.client().bulk2.Contact.insert(
+                records=records, batch_size=3, concurrency=2, wait=0)
+
+        self.assertEqual(len(uploads), 2)
+        self.assertEqual(
+            [method for method, path in org.request_log
+             if path.endswith("/ingest")], ["POST", "POST"])
+        # the first job is closed, the second one aborted
+        self.assertEqual(
+            len([method for method, path in org.request_log
+                 if method == "PATCH"]), 2)
+
+    @responses.activate
+    def test_compression(self):
+        """Test gzip-compressed uploads and query results"""
+        ingest_responses(Operation.insert, processed=2)
+        client = Salesforce(
+            session_id=tests.SESSION_ID,
+            instance_url=tests.SERVER_URL,
+            session=requests.Session(),
+        )
+        with to_csv_file(self.insert_data) as csv_file:
+            client.bulk2.Contact.insert(csv_file,
+                                        compression=Compression.gzip)
+            with open(csv_file, "rb") as bis:
+                expected = bis.read()
+        request = [i.request for i in responses.calls
+                   if i.request.method == responses.PUT][0]
+        self.assertEqual(request.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(b"".join(request.body)), expected)
+
+        responses.add(
+            responses.GET,
+            re.compile(r"^https://.*/jobs/query/Job-1/results"),
+            body=gzip.compress(self.expected_query[0].encode()),
+            headers={
+                "Content-Encoding": "gzip",
+                "Sforce-NumberOfRecords": "4",
+            },
+            status=http.OK,
+        )
+        # pylint: disable=protected-access
+        result = client.bulk2.Contact._client.get_query_results(
+            "Job-1", compression=Compression.gzip)
+        self.assertEqual(responses.calls[-1].request.headers["Accept-Encoding"],
+                         "gzip")
+        self.assertEqual(result["records"], self.expected_query[0])
+
     @responses.activate
     def test_upsert(self):
         """Test bulk2 upsert records"""
@@ -569,3 +714,119 @@ class TestSFBulk2Type(unittest.TestCase):
             client.bulk2.Contact.get_unprocessed_records("Job-1", file=csv_file)
             with open(csv_file, "r", encoding="utf-8") as bis:
                 self.assertEqual(expected_results, bis.read())
+
+
+    def test_download_single_file_empty_first_page(self):
+        """Test that pages are joined under one header, even after a page
+        without records"""
+        # pylint: disable=protected-access
+        client = Salesforce(
+            session_id=tests.SESSION_ID,
+            instance_url=tests.SERVER_URL,
+            session=requests.Session(),
+        )
+        contact = client.bulk2.Contact
+        pages = {"": (b'"Id"\n', 0), "2": (b'"Id"\n"1"\n"2"\n', 2)}
+
+        def download(path, _, locator, **__):
+            filename = os.path.join(path, f"page{locator}.csv")
+            with open(filename, "wb") as bos:
+                bos.write(pages[locator][0])
+            return {"locator": locator,
+                    "number_of_records": pages[locator][1],
+                    "file": filename}
+
+        with tempfile.TemporaryDirectory() as path, \
+                patch.object(contact._client, "get_result_pages",
+                             return_value=iter(pages)), \
+                patch.object(contact._client, "download_job_data",
+                             side_effect=download):
+            results = contact._download_pages("Job-1", path, 2, None, True, 2)
+            with open(results[0]["file"], "rb") as bis:
+                self.assertEqual(bis.read(), b'"Id"\n"1"\n"2"\n')
+        self.assertEqual(results[0]["number_of_records"], 2)
+
+class TestSplitCsv(unittest.TestCase):
+    """Test for _split_csv"""
+
+    def setUp(self):
+        self.records = [
+            {"Id": str(i), "Description": 'line "one"\nline two' * (i % 3)}
+            for i in range(50)
+        ]
+
+    def split(self, **kwargs):
+        """Split the records, check each chunk and return the record counts"""
+        counts = []
+        rows = []
+        with to_csv_file(self.records) as filename:
+            for count, chunk in _split_csv(filename=filename, **kwargs):
+                chunk_rows = list(csv.DictReader(
+                    chunk.tobytes().decode("utf-8").splitlines(True)))
+                self.assertEqual(count, len(chunk_rows))
+                counts.append(count)
+                rows.extend(chunk_rows)
+        self.assertEqual(rows, self.records)
+        return counts
+
+    def test_split_csv(self):
+        """Test that chunks are cut between records with quoted newlines"""
+        self.assertEqual(self.split(), [50])
+        self.assertEqual(self.split(max_records=20), [20, 20, 10])
+
+    def test_split_csv_blocks(self):
+        """Test records that span the blocks the file is scanned in"""
+        with patch("simple_salesforce.bulk2._SCAN_BLOCK_SIZE", 7):
+            self.assertEqual(self.split(), [50])
+            self.assertEqual(self.split(max_records=20), [20, 20, 10])
+
+    def test_split_csv_max_bytes(self):
+        """Test that chunks are cut to the maximum job size"""
+        with patch("simple_salesforce.bulk2.MAX_INGEST_JOB_FILE_SIZE",
+                   1024 * 1024 + 200):
+            counts = self.split()
+        self.assertGreater(len(counts), 1)
+        self.assertEqual(sum(counts), 50)
+
+
+    def test_count_csv(self):
+        """Test that records with quoted newlines are counted once"""
+        with to_csv_file(self.records) as filename:
+            with open(filename, encoding="utf-8") as bis:
+                data = bis.read()
+            self.assertEqual(_count_csv(filename=filename,
+                                        skip_header=True), 50)
+        self.assertEqual(_count_csv(data=data, skip_header=True), 50)
+        self.assertEqual(_count_csv(data=data.rstrip("\n"),
+                                    skip_header=True), 50)
+        with patch("simple_salesforce.bulk2._SCAN_BLOCK_SIZE", 7):
+            self.assertEqual(_count_csv(data=data, skip_header=True), 50)
+
+
+class TestWriteQueryResults(unittest.TestCase):
+    """Test for _Bulk2Client.write_query_results"""
+
+    def test_skip_header(self):
+        """Test that the header row is left out, whatever the chunk size"""
+        client = _Bulk2Client("Contact", tests.SERVER_URL, {},
+                              requests.Session())
+        for chunk_size in (1, 5, 1024):
+            result = requests.Response()
+            result.raw = io.BytesIO(b'"Id","Name"\n1,"a\x00\nb"\n2,c\n')
+            bos = io.BytesIO()
+            client.write_query_results(result, bos, skip_header=True,
+                                       chunk_size=chunk_size)
+            self.assertEqual(bos.getvalue(), b'1,"a\nb"\n2,c\n')
+
+
+class TestGzipBody(unittest.TestCase):
+    """Test for _GzipBody"""
+
+    def test_bytes_like(self):
+        """Test that bytes-like data and blocks are compressed"""
+        data = b"Id\n1\n"
+        for body in (data, bytearray(data), memoryview(data),
+                     [data[:3], memoryview(data)[3:]]):
+            with self.subTest(body=type(body).__name__):
+                compressed = b"".join(_GzipBody(body))
+                self.assertEqual(gzip.decompress(compressed), data)
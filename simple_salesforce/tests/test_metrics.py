@@ -0,0 +1,192 @@
+"""Tests for metrics.py"""
+import http.client as http
+import re
+import unittest
+
+import requests
+import responses
+from simple_salesforce.metrics import MetricsRegistry, SalesforceMetrics
+from simple_salesforce.util import (BulkEvent, Hooks, PerAppUsage,
+                                    ResponseInfo, Usage, call_salesforce)
+
+
+def _response(status=http.OK, api_usage=None, **kwargs):
+    """Build a ResponseInfo with sensible defaults"""
+    values = {
+        'name': 'query',
+        'method': 'GET',
+        'url': 'https://na1.salesforce.com/services/data/v59.0/query/',
+        'url_template': '/services/data/v59.0/query/',
+        'request_bytes': 0,
+        'response_bytes': 120,
+        'status': status,
+        'elapsed': 0.3,
+        'retries': 0,
+        'api_usage': api_usage or {},
+        }
+    values.update(kwargs)
+    return ResponseInfo(**values)
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Test the Prometheus text rendering"""
+
+    def test_counter_render(self):
+        """Test that counters render HELP, TYPE and escaped labels"""
+        registry = MetricsRegistry()
+        counter = registry.counter('calls_total', 'Calls', ('name',))
+        counter.labels('a"b').inc()
+        counter.labels('a"b').inc(2)
+
+        self.assertEqual(
+            registry.render(),
+            '# HELP calls_total Calls\n'
+            '# TYPE calls_total counter\n'
+            'calls_total{name="a\\"b"} 3\n'
+            )
+
+    def test_histogram_render(self):
+        """Test that histogram buckets are cumulative"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram('latency_seconds', 'Latency', (),
+                                       buckets=(0.1, 1))
+        histogram.labels().observe(0.05)
+        histogram.labels().observe(0.5)
+        histogram.labels().observe(5)
+
+        self.assertEqual(
+            registry.render().splitlines()[2:],
+            ['latency_seconds_bucket{le="0.1"} 1',
+             'latency_seconds_bucket{le="1"} 2',
+             'latency_seconds_bucket{le="+Inf"} 3',
+             'latency_seconds_sum 5.55',
+             'latency_seconds_count 3']
+            )
+
+    def test_wrong_labels(self):
+        """Test that the label count is checked"""
+        counter = MetricsRegistry().counter('calls_total', 'Calls', ('name',))
+        with self.assertRaises(ValueError):
+            counter.labels('a', 'b')
+
+    def test_duplicate_name(self):
+        """Test that a metric name can only be registered once"""
+        registry = MetricsRegistry()
+        registry.counter('calls_total', 'Calls')
+        with self.assertRaises(ValueError):
+            registry.gauge('calls_total', 'Calls')
+
+
+class TestSalesforceMetrics(unittest.TestCase):
+    """Test the hooks feeding SalesforceMetrics"""
+
+    def test_observe_response(self):
+        """Test request counts, bytes and API usage gauges"""
+        metrics = SalesforceMetrics()
+        metrics.observe_response(_response(api_usage={
+            'api-usage': Usage(18, 5000),
+            'per-app-api-usage': PerAppUsage(17, 250, 'sample-app'),
+            }))
+        metrics.observe_response(_response())
+
+        self.assertEqual(
+            metrics.requests.value('query', 'GET', '200'), 2
+            )
+        self.assertEqual(metrics.bytes.value('query', 'download'), 240)
+        self.assertEqual(metrics.bytes.value('query', 'upload'), 0)
+        self.assertEqual(metrics.api_usage.value(''), 18)
+        self.assertEqual(metrics.api_limit.value(''), 5000)
+        self.assertEqual(metrics.api_usage.value('sample-app'), 17)
+        self.assertEqual(metrics.api_limit.value('sample-app'), 250)
+
+    def test_observe_error(self):
+        """Test that failed calls are counted by exception class"""
+        metrics = SalesforceMetrics()
+        metrics.observe_response(_response(status=http.NOT_FOUND))
+
+        self.assertEqual(
+            metrics.errors.value('query', 'SalesforceResourceNotFound'), 1
+            )
+
+    def test_observe_connection_error(self):
+        """Test that calls without a response are counted by exception"""
+        metrics = SalesforceMetrics()
+        metrics.observe_response(_response(
+            status=0, response_bytes=0,
+            exception=requests.ConnectionError('connection refused')))
+
+        self.assertEqual(metrics.requests.value('query', 'GET', '0'), 1)
+        self.assertEqual(metrics.errors.value('query', 'ConnectionError'), 1)
+
+    def test_observe_bulk_event(self):
+        """Test batch states, record counts and throughput"""
+        metrics = SalesforceMetrics()
+        metrics.observe_bulk_event(BulkEvent(
+            api='bulk', object_name='Contact', operation='insert',
+            job_id='Job-1', batch_id='Batch-1', state='Completed',
+            records_processed=100, records_failed=4, processing_time=2.0
+            ))
+        metrics.observe_bulk_event(BulkEvent(
+            api='bulk2', object_name='Contact', operation='insert',
+            job_id='Job-2', batch_id=None, state='JobComplete',
+            records_processed=10, records_failed=0, processing_time=None
+            ))
+
+        self.assertEqual(
+            metrics.bulk_batches.value('Contact', 'insert', 'Completed'), 1
+            )
+        self.assertEqual(
+            metrics.bulk2_jobs.value('Contact', 'insert', 'JobComplete'), 1
+            )
+        self.assertEqual(
+            metrics.bulk_records.value('bulk', 'Contact', 'insert',
+                                       'success'), 96
+            )
+        self.assertEqual(
+            metrics.bulk_records.value('bulk', 'Contact', 'insert',
+                                       'failure'), 4
+            )
+        self.assertIn(
+            'salesforce_bulk_records_per_second_sum'
+            '{api="bulk",object="Contact",operation="insert"} 50',
+            metrics.render()
+            )
+        # 50 records per second falls in the throughput buckets
+        self.assertIn(
+            'salesforce_bulk_records_per_second_bucket'
+            '{api="bulk",object="Contact",operation="insert",le="50"} 1',
+            metrics.render()
+            )
+        self.assertIn(
+            'salesforce_bulk_records_per_second_bucket'
+            '{api="bulk",object="Contact",operation="insert",le="10"} 0',
+            metrics.render()
+            )
+
+    @responses.activate
+    def test_install(self):
+        """Test that installed metrics observe real calls"""
+        responses.add(
+            responses.GET,
+            re.compile(r'^https://.*/query/\?q=SELECT$'),
+            body='{}',
+            adding_headers={'Sforce-Limit-Info': 'api-usage=18/5000'},
+            status=http.OK
+            )
+        hooks = Hooks()
+        metrics = SalesforceMetrics()
+        metrics.install(hooks)
+
+        call_salesforce(
+            url='https://na1.salesforce.com/services/data/v59.0/query/'
+                '?q=SELECT',
+            method='GET',
+            session=requests.Session(),
+            headers={},
+            name='query',
+            hooks=hooks)
+
+        self.assertEqual(metrics.requests.value('query', 'GET', '200'), 1)
+        self.assertEqual(metrics.api_usage.value(''), 18)
+        self.assertIn('# TYPE salesforce_request_duration_seconds histogram',
+                      metrics.render())
@@ -0,0 +1,351 @@
+"""Tests for testing.py"""
+import csv
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from simple_salesforce.exceptions import (SalesforceExpiredSession,
+                                          SalesforceGeneralError,
+                                          SalesforceMalformedRequest,
+                                          SalesforceRefusedRequest,
+                                          SalesforceResourceNotFound)
+from simple_salesforce.testing import FakeOrg
+from simple_salesforce.util import Usage
+
+
+def _contacts(count):
+    """Build `count` distinct Contact records"""
+    return [{'FirstName': f'First {i}', 'LastName': f'Last {i}',
+             'Email': f'contact{i}@example.com'} for i in range(count)]
+
+
+class TestFakeOrgRest(unittest.TestCase):
+    """Test the REST endpoints of FakeOrg"""
+
+    def setUp(self):
+        self.org = FakeOrg(query_page_size=2)
+        self.ids = self.org.add_records('Contact', _contacts(5))
+        self.client = self.org.client()
+
+    def test_query_pages(self):
+        """Test that query results are paged with nextRecordsUrl"""
+        first = self.client.query('SELECT Id, LastName FROM Contact')
+        self.assertEqual(first['totalSize'], 5)
+        self.assertFalse(first['done'])
+        self.assertEqual(len(first['records']), 2)
+        self.assertRegex(first['nextRecordsUrl'],
+                         r'^/services/data/v[\d.]+/query/01g\w+-2$')
+
+        result = self.client.query_all('SELECT Id, LastName FROM Contact')
+
+        self.assertEqual([i['Id'] for i in result['records']], self.ids)
+        self.assertEqual(result['records'][0]['attributes']['type'],
+                         'Contact')
+        paths = [path for _, path in self.org.request_log[-3:]]
+        self.assertEqual(paths[0], '/services/data/v59.0/query/')
+        self.assertRegex(paths[1], r'/query/01g\w+-2$')
+        self.assertRegex(paths[2], r'/query/01g\w+-4$')
+
+    def test_query_filters(self):
+        """Test WHERE, ORDER BY, LIMIT and COUNT()"""
+        result = self.client.query_all(
+            "SELECT LastName FROM Contact "
+            "WHERE LastName IN ('Last 1', 'Last 3', 'Last 4') "
+            "AND Email LIKE '%example.com' ORDER BY LastName DESC LIMIT 2")
+        self.assertEqual([i['LastName'] for i in result['records']],
+                         ['Last 4', 'Last 3'])
+
+        count = self.client.query("SELECT COUNT() FROM Contact "
+                                  "WHERE LastName != 'Last 0'")
+        self.assertEqual(count['totalSize'], 4)
+
+    def test_unsupported_query(self):
+        """Test that unsupported SOQL is refused"""
+        with self.assertRaises(SalesforceMalformedRequest):
+            self.client.query('SELECT Id FROM Contact GROUP BY Email')
+
+    def test_crud(self):
+        """Test create, get, update, upsert and delete"""
+        created = self.client.Contact.create({'LastName': 'New',
+                                              'Email': 'new@example.com'})
+        self.assertTrue(created['success'])
+
+        self.client.Contact.update(created['id'], {'FirstName': 'Brand'})
+        record = self.client.Contact.get(created['id'])
+        self.assertEqual(record['FirstName'], 'Brand')
+        self.assertEqual(
+            self.client.Contact.get_by_custom_id(
+                'Email', 'new@example.com')['Id'],
+            created['id'])
+
+        self.assertEqual(
+            self.client.Contact.upsert('Email/new@example.com',
+                                       {'LastName': 'Upserted'}),
+            204)
+        self.assertEqual(
+            self.client.Contact.upsert('Email/other@example.com',
+                                       {'LastName': 'Other'}),
+            201)
+        self.assertEqual(self.client.Contact.get(created['id'])['LastName'],
+                         'Upserted')
+
+        self.assertEqual(self.client.Contact.delete(created['id']), 204)
+        with self.assertRaises(SalesforceResourceNotFound):
+            self.client.Contact.get(created['id'])
+        self.assertEqual(
+            self.client.query_all(
+                f"SELECT Id FROM Contact WHERE Id = '{created['id']}'",
+                include_deleted=True)['totalSize'],
+            1)
+
+    def test_collections(self):
+        """Test sObject collections, including allOrNone rollback"""
+        self.org.required_fields['Contact'] = ['LastName']
+        records = [{'attributes': {'type': 'Contact'}, 'LastName': 'A'},
+                   {'attributes': {'type': 'Contact'}, 'FirstName': 'B'}]
+
+        results = self.client.restful('composite/sobjects', method='POST',
+                                      json={'records': records})
+        self.assertEqual([i['success'] for i in results], [True, False])
+        self.assertEqual(results[1]['errors'][0]['statusCode'],
+                         'REQUIRED_FIELD_MISSING')
+
+        results = self.client.restful(
+            'composite/sobjects', method='POST',
+            json={'allOrNone': True, 'records': records})
+        self.assertEqual([i['success'] for i in results], [False, False])
+        self.assertEqual(len(self.org.get_records('Contact')), 6)
+
+        fetched = self.client.restful(
+            'composite/sobjects/Contact',
+            params={'ids': ','.join(self.ids[:2]), 'fields': 'LastName'})
+        self.assertEqual([i['LastName'] for i in fetched],
+                         ['Last 0', 'Last 1'])
+
+        results = self.client.restful(
+            'composite/sobjects', method='DELETE',
+            params={'ids': ','.join(self.ids[:2])})
+        self.assertTrue(all(i['success'] for i in results))
+        self.assertEqual(len(self.org.get_records('Contact')), 4)
+
+
+class TestFakeOrgFaults(unittest.TestCase):
+    """Test limits, latency and injected errors"""
+
+    def test_limit_info(self):
+        """Test that Sforce-Limit-Info reports and enforces the limit"""
+        org = FakeOrg(api_limit=2)
+        client = org.client()
+        client.query('SELECT Id FROM Account')
+        self.assertEqual(client.api_usage['api-usage'], Usage(1, 2))
+        client.query('SELECT Id FROM Account')
+        with self.assertRaises(SalesforceRefusedRequest):
+            client.query('SELECT Id FROM Account')
+
+    def test_inject_errors(self):
+        """Test injected 503 and 401 errors"""
+        org = FakeOrg()
+        client = org.client()
+        org.inject_error(503, path='/query/')
+        org.inject_error(401, method='GET')
+
+        with self.assertRaises(SalesforceGeneralError):
+            client.query('SELECT Id FROM Account')
+        with self.assertRaises(SalesforceExpiredSession):
+            client.query('SELECT Id FROM Account')
+        self.assertEqual(
+            client.query('SELECT Id FROM Account')['totalSize'], 0)
+
+    def test_lock_errors(self):
+        """Test that injected lock errors fail record writes"""
+        org = FakeOrg()
+        org.inject_lock_errors(1)
+        with self.assertRaises(SalesforceMalformedRequest) as raised:
+            org.client().Contact.create({'LastName': 'x'})
+        self.assertEqual(raised.exception.content[0]['errorCode'],
+                         'UNABLE_TO_LOCK_ROW')
+
+    def test_latency(self):
+        """Test that latency can depend on the request"""
+        latency = Mock(return_value=0)
+        org = FakeOrg(latency=latency)
+        org.client().query('SELECT Id FROM Account')
+        latency.assert_called_once_with('GET', '/services/data/v59.0/query/')
+
+
+class TestFakeOrgBulk(unittest.TestCase):
+    """Test the Bulk API endpoints of FakeOrg"""
+
+    @patch('simple_salesforce.bulk.sleep')
+    def test_insert_and_query(self, _):
+        """Test that batches move through their states"""
+        org = FakeOrg(processing_polls=1)
+        org.inject_lock_errors(1)
+        client = org.client()
+
+        results = client.bulk.Contact.insert(_contacts(3), batch_size=2)
+
+        self.assertEqual(len(results), 3)
+        failed = [i for i in results if not i['success']]
+        self.assertEqual(len(failed), 1)
+        self.assertEqual(failed[0]['errors'][0]['statusCode'],
+                         'UNABLE_TO_LOCK_ROW')
+        self.assertGreater(len([i for i in org.request_log
+                                if i[0] == 'GET' and i[1].endswith('/batch')]),
+                           1)
+        self.assertEqual(len(org.get_records('Contact')), 2)
+
+        rows = client.bulk.Contact.query(
+            "SELECT Id, LastName FROM Contact WHERE LastName LIKE 'Last%'")
+        self.assertEqual(sorted(i['Id'] for i in rows),
+                         sorted(i['id'] for i in results if i['success']))
+
+    def test_update_and_delete(self):
+        """Test update and delete jobs"""
+        org = FakeOrg()
+        ids = org.add_records('Contact', _contacts(2))
+        client = org.client()
+
+        client.bulk.Contact.update([{'Id': ids[0], 'LastName': 'Changed'}])
+        results = client.bulk.Contact.delete([{'Id': ids[1]},
+                                              {'Id': '003000000000999AAA'}])
+
+        self.assertEqual([i['success'] for i in results], [True, False])
+        self.assertEqual([i['LastName'] for i in org.get_records('Contact')],
+                         ['Changed'])
+
+    def test_csv(self):
+        """Test insert and query jobs with CSV content"""
+        org = FakeOrg()
+        org.required_fields['Contact'] = ['LastName']
+        client = org.client()
+
+        results = client.bulk.Contact.insert(
+            _contacts(2) + [{'FirstName': 'No last name'}],
+            content_type='CSV')
+
+        self.assertEqual([i['success'] for i in results],
+                         [True, True, False])
+        self.assertEqual(results[2]['errors'][0]['statusCode'],
+                         'REQUIRED_FIELD_MISSING')
+        rows = client.bulk.Contact.query('SELECT Id, Email FROM Contact',
+                                         content_type='CSV')
+        self.assertEqual(rows, [{'Id': i['id'], 'Email': f'contact{n}@'
+                                                         'example.com'}
+                                for n, i in enumerate(results[:2])])
+
+
+class TestFakeOrgBulk2(unittest.TestCase):
+    """Test the Bulk 2.0 endpoints of FakeOrg"""
+
+    def test_ingest(self):
+        """Test an ingest job with failed records"""
+        org = FakeOrg(processing_polls=1)
+        org.required_fields['Contact'] = ['LastName']
+        client = org.client()
+        records = _contacts(2) + [{'FirstName': 'No last name'}]
+
+        results = client.bulk2.Contact.insert(records=records, wait=0)
+
+        self.assertEqual(results[0]['numberRecordsProcessed'], 3)
+        self.assertEqual(results[0]['numberRecordsFailed'], 1)
+        failed = list(csv.DictReader(io.StringIO(
+            client.bulk2.Contact.get_failed_records(results[0]['job_id']))))
+        self.assertEqual(failed[0]['FirstName'], 'No last name')
+        self.assertTrue(failed[0]['sf__Error'].startswith(
+            'REQUIRED_FIELD_MISSING'))
+        successful = list(csv.DictReader(io.StringIO(
+            client.bulk2.Contact.get_successful_records(
+                results[0]['job_id']))))
+        self.assertEqual(
+            [i['sf__Id'] for i in successful],
+            [i['Id'] for i in org.get_records('Contact')])
+
+    def test_compressed_ingest(self):
+        """Test an ingest job with gzip-compressed data"""
+        org = FakeOrg()
+        client = org.client()
+
+        results = client.bulk2.Contact.insert(records=_contacts(3), wait=0,
+                                              compression='gzip')
+
+        self.assertEqual(results[0]['numberRecordsProcessed'], 3)
+        self.assertEqual(
+            [i['LastName'] for i in org.get_records('Contact')],
+            [f'Last {i}' for i in range(3)])
+
+    def test_query_locators(self):
+        """Test that query results are paged with Sforce-Locator"""
+        org = FakeOrg()
+        org.add_records('Contact', _contacts(5))
+        client = org.client()
+
+        pages = list(client.bulk2.Contact.query(
+            'SELECT Id, LastName FROM Contact', max_records=2, wait=0))
+
+        self.assertEqual(len(pages), 3)
+        rows = [row for page in pages
+                for row in csv.DictReader(io.StringIO(page))]
+        self.assertEqual([i['LastName'] for i in rows],
+                         [f'Last {i}' for i in range(5)])
+
+    def test_download(self):
+        """Test downloads to a file per page and to a single file"""
+        org = FakeOrg()
+        org.add_records('Contact', _contacts(5))
+        client = org.client()
+        query = 'SELECT Id, LastName FROM Contact'
+
+        with tempfile.TemporaryDirectory() as path:
+            pages = client.bulk2.Contact.download(query, path, max_records=2,
+                                                  wait=0)
+            single = client.bulk2.Contact.download(
+                query, path, max_records=2, wait=0, single_file=True,
+                prefetch=True)
+
+            self.assertEqual([i['number_of_records'] for i in pages],
+                             [2, 2, 1])
+            self.assertEqual(len(single), 1)
+            self.assertEqual(single[0]['number_of_records'], 5)
+            self.assertEqual(single[0]['locator'], '')
+            rows = []
+            for page in pages:
+                with open(page['file'], encoding='utf-8') as bis:
+                    rows.extend(csv.DictReader(bis))
+            with open(single[0]['file'], encoding='utf-8') as bis:
+                self.assertEqual(list(csv.DictReader(bis)), rows)
+        self.assertEqual([i['LastName'] for i in rows],
+                         [f'Last {i}' for i in range(5)])
+
+    @patch('simple_salesforce.testing.BULK2_RESULT_PAGE_LINKS', 2)
+    def test_parallel_query(self):
+        """Test that result pages are downloaded at once, in order"""
+        org = FakeOrg()
+        org.add_records('Contact', _contacts(5))
+        query = 'SELECT Id, LastName FROM Contact'
+        expected = [f'Last {i}' for i in range(5)]
+
+        for version in ('59.0', '62.0'):
+            client = org.client(version=version)
+            pages = list(client.bulk2.Contact.query(
+                query, max_records=2, wait=0, concurrency=3))
+            rows = [row for page in pages
+                    for row in csv.DictReader(io.StringIO(page))]
+            self.assertEqual([i['LastName'] for i in rows], expected)
+
+            with tempfile.TemporaryDirectory() as path:
+                single = client.bulk2.Contact.download(
+                    query, path, max_records=2, wait=0, single_file=True,
+                    concurrency=3)
+                with open(single[0]['file'], encoding='utf-8') as bis:
+                    rows = list(csv.DictReader(bis))
+                self.assertEqual(os.listdir(path),
+                                 [os.path.basename(single[0]['file'])])
+            self.assertEqual(single[0]['number_of_records'], 5)
+            self.assertEqual([i['LastName'] for i in rows], expected)
+
+        self.assertEqual(
+            len([i for i in org.request_log if i[1].endswith('/resultPages')]),
+            4)
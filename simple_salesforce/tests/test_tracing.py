@@ -0,0 +1,183 @@
+"""Tests for tracing.py"""
+import http.client as http
+import re
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import requests
+import responses
+from simple_salesforce import tests, tracing
+from simple_salesforce.api import Salesforce
+from simple_salesforce.bulk2 import Operation
+from simple_salesforce.tests.test_bulk2 import ingest_data, ingest_responses
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import \
+        InMemorySpanExporter
+    HAS_SDK = True
+except ImportError:
+    HAS_SDK = False
+
+_EXPORTER = None
+
+
+def exporter():
+    """Install a global tracer provider exporting to memory, once"""
+    global _EXPORTER  # pylint: disable=global-statement
+    if _EXPORTER is None:
+        _EXPORTER = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(_EXPORTER))
+        trace.set_tracer_provider(provider)
+    _EXPORTER.clear()
+    return _EXPORTER
+
+
+def children(spans, parent):
+    """Names of the spans directly nested under `parent`"""
+    return [i.name for i in spans
+            if i.parent is not None
+            and i.parent.span_id == parent.context.span_id]
+
+
+class TestNoOpTracing(unittest.TestCase):
+    """Test the helpers without OpenTelemetry"""
+
+    @patch('simple_salesforce.tracing.HAS_OPENTELEMETRY', False)
+    def test_span_without_opentelemetry(self):
+        """Test that spans fall back to a no-op"""
+        with tracing.span('bulk.operation', {'a': 1, 'b': None}) as current:
+            tracing.set_attributes(current, {'c': 'd'})
+        self.assertIsInstance(current, tracing.NoOpSpan)
+
+    @patch('simple_salesforce.tracing.HAS_OPENTELEMETRY', False)
+    def test_bind_context_without_opentelemetry(self):
+        """Test that functions are returned unchanged"""
+        self.assertIs(tracing.bind_context(len), len)
+
+
+@unittest.skipUnless(HAS_SDK, 'opentelemetry-sdk is not installed')
+class TestTracing(unittest.TestCase):
+    """Test the spans recorded around bulk job lifecycles"""
+
+    def test_bind_context(self):
+        """Test that spans started in worker threads keep their parent"""
+        spans = exporter()
+
+        def work():
+            with tracing.span('child'):
+                pass
+
+        with tracing.span('parent', {'skipped': None}):
+            with ThreadPoolExecutor() as pool:
+                pool.submit(tracing.bind_context(work)).result()
+
+        child, parent = spans.get_finished_spans()
+        self.assertEqual(child.parent.span_id, parent.context.span_id)
+        self.assertNotIn('skipped', parent.attributes)
+
+    @responses.activate
+    @patch('simple_salesforce.bulk.sleep')
+    def test_bulk_insert_spans(self, _):
+        """Test the spans of a Bulk API insert"""
+        spans = exporter()
+        responses.add(
+            responses.POST,
+            re.compile(r'^https://[^/job].*/job$'),
+            body='{"id": "Job-1","object": "Contact",'
+            '"operation": "insert","state": "Open"}',
+            status=http.OK)
+        responses.add(
+            responses.POST,
+            re.compile(r'^https://[^/job].*/job/Job-1/batch$'),
+            body='{"id": "Batch-1","jobId": "Job-1","state": "Queued"}',
+            status=http.OK
+        )
+        responses.add(
+            responses.POST,
+            re.compile(r'^https://[^/job].*/job/Job-1$'),
+            body='{"id": "Job-1","state": "Closed"}',
+            status=http.OK
+        )
+        responses.add(
+            responses.GET,
+            re.compile(r'^https://[^/job].*/job/Job-1/batch$'),
+            body='{"batchInfo": [{"id": "Batch-1","jobId": "Job-1",'
+            '"state": "InProgress"}]}',
+            status=http.OK
+        )
+        responses.add(
+            responses.GET,
+            re.compile(r'^https://[^/job].*/job/Job-1/batch$'),
+            body='{"batchInfo": [{"id": "Batch-1","jobId": "Job-1",'
+            '"state": "Completed","numberRecordsProcessed": 1,'
+            '"numberRecordsFailed": 0,"totalProcessingTime": 250}]}',
+            status=http.OK
+        )
+        responses.add(
+            responses.GET,
+            re.compile(
+                r'^https://[^/job].*/job/Job-1/batch/Batch-1/result$'),
+            body='[{"success": true,"created": true,'
+            '"id": "001xx000003DHP0AAO","errors": []}]',
+            status=http.OK
+        )
+        client = Salesforce(session_id=tests.SESSION_ID,
+                            instance_url=tests.SERVER_URL,
+                            session=requests.Session())
+
+        client.bulk.Contact.insert([{'LastName': 'x'}])
+
+        finished = spans.get_finished_spans()
+        by_name = {i.name: i for i in finished}
+        root = by_name['bulk.operation']
+        self.assertEqual(
+            children(finished, root),
+            ['bulk.create_job', 'bulk.add_batch', 'bulk.wait_for_batches',
+             'bulk.close_job']
+            )
+        self.assertEqual(root.attributes['salesforce.object'], 'Contact')
+        self.assertEqual(root.attributes['salesforce.bulk.records'], 1)
+        self.assertEqual(
+            by_name['bulk.add_batch'].attributes['salesforce.bulk.batch_id'],
+            'Batch-1'
+            )
+        wait = by_name['bulk.wait_for_batches']
+        self.assertEqual(wait.attributes['salesforce.bulk.polls'], 2)
+        self.assertEqual(wait.attributes['salesforce.bulk.batches'], 1)
+        event, = wait.events
+        self.assertEqual(event.name, 'bulk.batch_finished')
+        self.assertEqual(event.attributes['salesforce.bulk.state'],
+                         'Completed')
+        self.assertEqual(
+            event.attributes['salesforce.bulk.total_processing_time_ms'], 250)
+
+    @responses.activate
+    def test_bulk2_insert_spans(self):
+        """Test the spans of a Bulk 2.0 insert"""
+        spans = exporter()
+        ingest_responses(Operation.insert, processed=2)
+
+        ingest_data(Operation.insert,
+                    [{'LastName': 'x'}, {'LastName': 'y'}],
+                    wait=0)
+
+        finished = spans.get_finished_spans()
+        by_name = {i.name: i for i in finished}
+        self.assertEqual(children(finished, by_name['bulk2.load']),
+                         ['bulk2.ingest_job'])
+        job = by_name['bulk2.ingest_job']
+        self.assertEqual(
+            children(finished, job),
+            ['bulk2.create_job', 'bulk2.upload_job_data',
+             'bulk2.set_job_state', 'bulk2.wait_for_job', 'bulk2.get_job']
+            )
+        self.assertEqual(job.attributes['salesforce.bulk.job_id'], 'Job-1')
+        self.assertEqual(job.attributes['salesforce.bulk.records'], 2)
+        wait = by_name['bulk2.wait_for_job'].attributes
+        self.assertEqual(wait['salesforce.bulk.polls'], 2)
+        self.assertEqual(wait['salesforce.bulk.state'], 'JobComplete')
@@ -1,17 +1,25 @@
 """Tests for simple-salesforce utility functions"""
 import datetime
+import http.client as http
+import re
 import unittest
 from unittest.mock import Mock
 
 import pytz
+import requests
+import responses
 from simple_salesforce.exceptions import (SalesforceExpiredSession,
                                           SalesforceGeneralError,
                                           SalesforceMalformedRequest,
                                           SalesforceMoreThanOneRecord,
                                           SalesforceRefusedRequest,
                                           SalesforceResourceNotFound)
-from simple_salesforce.util import (date_to_iso8601, exception_handler,
-                                    getUniqueElementValueFromXmlString)
+from simple_salesforce.util import (Hooks, PerAppUsage, Usage,
+                                    call_salesforce, date_to_iso8601,
+                                    exception_handler,
+                                    getUniqueElementValueFromXmlString,
+                                    parse_api_usage, send_request,
+                                    url_template)
 
 
 class TestXMLParser(unittest.TestCase):
@@ -105,3 +113,151 @@ class TestExceptionHandler(unittest.TestCase):
         self.assertEqual(str(cm.exception), (
             'Error Code 500. Response content'
             ': Example Content'))
+
+
+class TestApiUsage(unittest.TestCase):
+    """Test parsing of the Sforce-Limit-Info header"""
+
+    def test_parse_api_usage(self):
+        """Test that both overall and per app usage are parsed"""
+        self.assertEqual(parse_api_usage('api-usage=18/5000'),
+                         {'api-usage': Usage(18, 5000)})
+        self.assertEqual(
+            parse_api_usage('api-usage=25/5000;'
+                            'per-app-api-usage=17/250(appName=sample-app)'),
+            {'api-usage': Usage(25, 5000),
+             'per-app-api-usage': PerAppUsage(17, 250, 'sample-app')})
+
+
+class TestUrlTemplate(unittest.TestCase):
+    """Test the URL template used to group calls by endpoint"""
+
+    def test_ids_are_replaced(self):
+        """Test that 15 and 18 character ids are replaced"""
+        self.assertEqual(
+            url_template('https://na1.salesforce.com/services/async/59.0/job/'
+                         '750x0000000005LAAQ/batch/751x00000000079?x=1'),
+            '/services/async/59.0/job/{id}/batch/{id}')
+
+    def test_names_are_kept(self):
+        """Test that object names and endpoints without digits are kept"""
+        self.assertEqual(
+            url_template('https://na1.salesforce.com/services/data/v59.0/'
+                         'jobs/ingest/750x0000000005LAAQ/unprocessedRecords'),
+            '/services/data/v59.0/jobs/ingest/{id}/unprocessedRecords')
+
+
+class TestHooks(unittest.TestCase):
+    """Test the request/response hooks fired by send_request"""
+
+    @responses.activate
+    def test_hooks_receive_request_and_response(self):
+        """Test that both hooks are called with the call details"""
+        responses.add(
+            responses.POST,
+            re.compile(r'^https://.*/job$'),
+            body='{"id": "Job-1"}',
+            adding_headers={'Sforce-Limit-Info': 'api-usage=18/5000'},
+            status=http.OK
+        )
+        hooks = Hooks()
+        before, after = [], []
+        hooks.register_before_request(before.append)
+        hooks.register_after_response(after.append)
+
+        result = call_salesforce(url='https://na1.salesforce.com/job',
+                                 method='POST',
+                                 session=requests.Session(),
+                                 headers={},
+                                 name='bulk.create_job',
+                                 hooks=hooks,
+                                 data='{"object": "Contact"}')
+
+        self.assertEqual(result.json(), {'id': 'Job-1'})
+        self.assertEqual(len(before), 1)
+        self.assertEqual(before[0].name, 'bulk.create_job')
+        self.assertEqual(before[0].method, 'POST')
+        self.assertEqual(before[0].url_template, '/job')
+        self.assertEqual(before[0].request_bytes, 21)
+        self.assertEqual(len(after), 1)
+        self.assertEqual(after[0].status, http.OK)
+        self.assertEqual(after[0].request_bytes, 21)
+        self.assertEqual(after[0].response_bytes, 15)
+        self.assertEqual(after[0].retries, 0)
+        self.assertGreaterEqual(after[0].elapsed, 0)
+        self.assertEqual(after[0].api_usage, {'api-usage': Usage(18, 5000)})
+
+    @responses.activate
+    def test_hooks_fire_before_errors(self):
+        """Test that the after-response hook sees failed calls"""
+        responses.add(
+            responses.GET,
+            re.compile(r'^https://.*$'),
+            body='[{"errorCode": "NOT_FOUND"}]',
+            status=http.NOT_FOUND
+        )
+        hooks = Hooks()
+        after = []
+        hooks.register_after_response(after.append)
+
+        with self.assertRaises(SalesforceResourceNotFound):
+            call_salesforce(url='https://na1.salesforce.com/x',
+                            method='GET',
+                            session=requests.Session(),
+                            headers={},
+                            hooks=hooks)
+        self.assertEqual([i.status for i in after], [http.NOT_FOUND])
+
+    @responses.activate
+    def test_hooks_fire_on_connection_errors(self):
+        """Test that the after-response hook sees calls without a response"""
+        error = requests.ConnectionError('connection refused')
+        responses.add(
+            responses.GET,
+            re.compile(r'^https://.*$'),
+            body=error
+        )
+        hooks = Hooks()
+        after = []
+        hooks.register_after_response(after.append)
+
+        with self.assertRaises(requests.ConnectionError):
+            send_request(requests.Session(),
+                         'GET',
+                         'https://na1.salesforce.com/x',
+                         name='query',
+                         hooks=hooks)
+        self.assertEqual([i.status for i in after], [0])
+        self.assertIs(after[0].exception, error)
+        self.assertEqual(after[0].name, 'query')
+        self.assertGreaterEqual(after[0].elapsed, 0)
+
+    @responses.activate
+    def test_failing_hook_does_not_break_call(self):
+        """Test that exceptions raised by hooks are logged and swallowed"""
+        responses.add(
+            responses.GET,
+            re.compile(r'^https://.*$'),
+            body='{}',
+            status=http.OK
+        )
+        hooks = Hooks()
+
+        @hooks.register_after_response
+        def failing_hook(info):
+            raise ValueError(info)
+
+        with self.assertLogs('simple_salesforce.util', level='ERROR'):
+            result = send_request(requests.Session(),
+                                  'GET',
+                                  'https://na1.salesforce.com/x',
+                                  hooks=hooks)
+        self.assertEqual(result.status_code, http.OK)
+        self.assertIs(hooks.after_response[0], failing_hook)
+
+    def test_empty_hooks_are_falsy(self):
+        """Test that no work is done unless a hook is registered"""
+        hooks = Hooks()
+        self.assertFalse(hooks)
+        hooks.register_before_request(lambda info: None)
+        self.assertTrue(hooks)
@@ -0,0 +1,95 @@
+""" Optional OpenTelemetry spans around bulk job lifecycles
+
+Spans are only recorded when the `opentelemetry-api` package is installed
+and an application configured a tracer provider, otherwise every helper here
+is a no-op.
+"""
+
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar, Union
+
+try:
+    from opentelemetry import context as otel_context
+    from opentelemetry import trace
+    HAS_OPENTELEMETRY = True
+except ImportError:
+    HAS_OPENTELEMETRY = False
+
+TRACER_NAME = 'simple_salesforce'
+
+AttributeValue = Union[str, bool, int, float]
+Attributes = Dict[str, Optional[AttributeValue]]
+
+T = TypeVar('T')
+
+
+class NoOpSpan:
+    """Stand-in for an OpenTelemetry span when tracing is unavailable"""
+
+    def set_attribute(self, key: str, value: AttributeValue) -> None:
+        """Ignore the attribute"""
+
+    def add_event(self,
+                  name: str,
+                  attributes: Optional[Dict[str, AttributeValue]] = None
+                  ) -> None:
+        """Ignore the event"""
+
+
+def _clean(attributes: Optional[Attributes]) -> Dict[str, AttributeValue]:
+    """Drop unset attributes, which OpenTelemetry does not accept"""
+    return {k: v for k, v in (attributes or {}).items() if v is not None}
+
+
+@contextmanager
+def span(name: str, attributes: Optional[Attributes] = None) -> Iterator[Any]:
+    """Start a span nested in the current one
+
+    Exceptions leaving the block are recorded on the span and mark it as
+    failed.
+
+    Arguments:
+
+    * name -- span name, e.g. `bulk2.wait_for_job`
+    * attributes -- initial attributes, `None` values are skipped
+    """
+    if not HAS_OPENTELEMETRY:
+        yield NoOpSpan()
+        return
+    tracer = trace.get_tracer(TRACER_NAME)
+    with tracer.start_as_current_span(name,
+                                      attributes=_clean(attributes)
+                                      ) as current:
+        yield current
+
+
+def set_attributes(current: Any, attributes: Attributes) -> None:
+    """Set several attributes on a span, skipping `None` values"""
+    for key, value in _clean(attributes).items():
+        current.set_attribute(key, value)
+
+
+def add_event(current: Any, name: str, attributes: Attributes) -> None:
+    """Record an event on a span, skipping `None` attribute values"""
+    current.add_event(name, _clean(attributes))
+
+
+def bind_context(func: Callable[..., T]) -> Callable[..., T]:
+    """Run `func` in the tracing context of the caller
+
+    Worker threads do not inherit the active span, so functions handed to an
+    executor are wrapped with this to keep their spans nested under the
+    span that scheduled them.
+    """
+    if not HAS_OPENTELEMETRY:
+        return func
+    parent = otel_context.get_current()
+
+    def run(*args: Any, **kwargs: Any) -> T:
+        token = otel_context.attach(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            otel_context.detach(token)
+
+    return run
@@ -1,15 +1,23 @@
 """Utility functions for simple-salesforce"""
 
 import datetime
+import logging
+import re
+import threading
+import time
 import xml.dom.minidom
-from typing import Any, Iterable, List, Mapping, MutableMapping, NamedTuple, \
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Mapping, MutableMapping, \
+    NamedTuple, \
     NoReturn, \
     Optional, \
-    TypeVar, Union
+    Type, TypeVar, Union
+from urllib.parse import urlparse
 
 import requests
 
-from .exceptions import (SalesforceExpiredSession, SalesforceGeneralError,
+from .exceptions import (SalesforceError, SalesforceExpiredSession,
+                         SalesforceGeneralError,
                          SalesforceMalformedRequest,
                          SalesforceMoreThanOneRecord, SalesforceRefusedRequest,
                          SalesforceResourceNotFound)
@@ -20,6 +28,15 @@ BulkDataAny = List[Mapping[str, Any]]
 BulkDataStr = List[Mapping[str, str]]
 T = TypeVar('T')
 
+# pylint: disable=invalid-name
+logger = logging.getLogger(__name__)
+
+# Workers of the executor shared by clients that are not given one
+DEFAULT_MAX_WORKERS = 16
+_default_executor: Optional[Executor] = None
+_default_executor_lock = threading.Lock()
+
+
 class Usage(NamedTuple):
     """Usage information for a Salesforce org"""
     used: int
@@ -31,6 +48,131 @@ class PerAppUsage(NamedTuple):
     total: int
     name: str
 
+ApiUsage = MutableMapping[str, Union[Usage, PerAppUsage]]
+
+
+class RequestInfo(NamedTuple):
+    """Details of an HTTP call about to be sent to Salesforce"""
+    name: str
+    method: str
+    url: str
+    url_template: str
+    request_bytes: int
+    retries: int
+
+
+class ResponseInfo(NamedTuple):
+    """Details of a completed HTTP call to Salesforce
+
+    `response_bytes` is None for streamed responses without a
+    Content-Length header, `elapsed` is the latency in seconds. When no
+    response was received, e.g. on a connection error or a timeout,
+    `status` is 0 and `exception` is the error raised for the call.
+    """
+    name: str
+    method: str
+    url: str
+    url_template: str
+    request_bytes: int
+    response_bytes: Optional[int]
+    status: int
+    elapsed: float
+    retries: int
+    api_usage: ApiUsage
+    exception: Optional[Exception] = None
+
+
+class BulkEvent(NamedTuple):
+    """A Bulk API batch or Bulk 2.0 job that reached a final state
+
+    `api` is `bulk` for Bulk API batches and `bulk2` for Bulk 2.0 jobs,
+    `batch_id` is None for the latter. `processing_time` is the server side
+    processing time in seconds, when Salesforce reports it.
+    """
+    api: str
+    object_name: str
+    operation: str
+    job_id: str
+    batch_id: Optional[str]
+    state: str
+    records_processed: int
+    records_failed: int
+    processing_time: Optional[float]
+
+
+BeforeRequestHook = Callable[[RequestInfo], None]
+AfterResponseHook = Callable[[ResponseInfo], None]
+BulkEventHook = Callable[[BulkEvent], None]
+
+
+class Hooks:
+    """Callbacks fired around every HTTP call made to Salesforce
+
+    Before-request hooks receive a `RequestInfo`, after-response hooks
+    receive a `ResponseInfo`. After-response hooks also fire for error
+    responses, before the matching exception is raised. Bulk event hooks
+    receive a `BulkEvent` whenever a bulk batch or job finishes. Exceptions
+    raised by a hook are logged and never interrupt the call.
+    """
+
+    def __init__(self) -> None:
+        self.before_request: List[BeforeRequestHook] = []
+        self.after_response: List[AfterResponseHook] = []
+        self.bulk_event: List[BulkEventHook] = []
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.before_request or self.after_response or self.bulk_event
+            )
+
+    def register_before_request(
+            self,
+            hook: BeforeRequestHook
+            ) -> BeforeRequestHook:
+        """Register a before-request hook, usable as a decorator"""
+        self.before_request.append(hook)
+        return hook
+
+    def register_after_response(
+            self,
+            hook: AfterResponseHook
+            ) -> AfterResponseHook:
+        """Register an after-response hook, usable as a decorator"""
+        self.after_response.append(hook)
+        return hook
+
+    def register_bulk_event(
+            self,
+            hook: BulkEventHook
+            ) -> BulkEventHook:
+        """Register a bulk event hook, usable as a decorator"""
+        self.bulk_event.append(hook)
+        return hook
+
+    def fire_before_request(self, info: RequestInfo) -> None:
+        """Call every before-request hook with `info`"""
+        for hook in self.before_request:
+            try:
+                hook(info)
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception('before_request hook %r failed', hook)
+
+    def fire_after_response(self, info: ResponseInfo) -> None:
+        """Call every after-response hook with `info`"""
+        for hook in self.after_response:
+            try:
+                hook(info)
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception('after_response hook %r failed', hook)
+
+    def fire_bulk_event(self, event: BulkEvent) -> None:
+        """Call every bulk event hook with `event`"""
+        for hook in self.bulk_event:
+            try:
+                hook(event)
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception('bulk_event hook %r failed', hook)
+
 # pylint: disable=invalid-name
 def getUniqueElementValueFromXmlString(
         xmlString: Union[str, bytes],
@@ -67,6 +209,149 @@ def date_to_iso8601(date: datetime.date) -> str:
     )
 
 
+def parse_api_usage(sforce_limit_info: str) -> ApiUsage:
+    """parse API usage and limits out of the Sforce-Limit-Info header
+    Arguments:
+    * sforce_limit_info: The value of response header 'Sforce-Limit-Info'
+        Example 1: 'api-usage=18/5000'
+        Example 2: 'api-usage=25/5000;
+            per-app-api-usage=17/250(appName=sample-connected-app)'
+    """
+    result: ApiUsage = {}
+
+    api_usage = re.match(
+        r'[^-]?api-usage=(?P<used>\d+)/(?P<tot>\d+)',
+        sforce_limit_info
+        )
+
+    pau = r'.+per-app-api-usage=(?P<u>\d+)/(?P<t>\d+)\(appName=(?P<n>.+)\)'
+    per_app_api_usage = re.match(pau,
+                                 sforce_limit_info
+                                 )
+
+    if api_usage and api_usage.groups():
+        groups = api_usage.groups()
+        result['api-usage'] = Usage(used=int(groups[0]),
+                                    total=int(groups[1])
+                                    )
+    if per_app_api_usage and per_app_api_usage.groups():
+        groups = per_app_api_usage.groups()
+        result['per-app-api-usage'] = PerAppUsage(used=int(groups[0]),
+                                                  total=int(groups[1]),
+                                                  name=groups[2]
+                                                  )
+
+    return result
+
+
+# Record, job, batch and result ids: 15 or 18 alphanumerics with a digit
+_ID_SEGMENT = re.compile(r'^(?=[^/]*\d)[a-zA-Z0-9]{15}(?:[a-zA-Z0-9]{3})?$')
+
+
+def url_template(url: str) -> str:
+    """Returns the path of `url` with Salesforce ids replaced by `{id}`
+
+    For example `https://na1.salesforce.com/services/async/59.0/job/
+    750x0000000005LAAQ/batch?x=1` becomes
+    `/services/async/59.0/job/{id}/batch`, which groups calls to the same
+    endpoint together.
+    """
+    return '/'.join(
+        '{id}' if _ID_SEGMENT.match(segment) else segment
+        for segment in urlparse(url).path.split('/')
+        )
+
+
+def _payload_size(data: Any) -> int:
+    """Size of a request body that is known before sending it"""
+    if isinstance(data, (str, bytes, bytearray, memoryview)):
+        return len(data)
+    return 0
+
+
+def send_request(
+        session: requests.Session,
+        method: str,
+        url: str,
+        name: str = "",
+        hooks: Optional[Hooks] = None,
+        retries: int = 0,
+        **kwargs: Any) -> requests.Response:
+    """Send an HTTP request through `session`, firing `hooks` around it.
+
+    Returns a `requests.result` object, whatever its status code.
+    """
+    if not hooks:
+        return session.request(method, url, **kwargs)
+
+    template = url_template(url)
+    request_bytes = _payload_size(kwargs.get('data'))
+    hooks.fire_before_request(RequestInfo(name=name,
+                                          method=method,
+                                          url=url,
+                                          url_template=template,
+                                          request_bytes=request_bytes,
+                                          retries=retries
+                                          ))
+    start = time.perf_counter()
+    try:
+        result = session.request(method, url, **kwargs)
+    except Exception as error:
+        hooks.fire_after_response(ResponseInfo(
+            name=name,
+            method=method,
+            url=url,
+            url_template=template,
+            request_bytes=request_bytes,
+            response_bytes=0,
+            status=0,
+            elapsed=time.perf_counter() - start,
+            retries=retries,
+            api_usage={},
+            exception=error
+            ))
+        raise
+    elapsed = time.perf_counter() - start
+
+    if result.request is not None:
+        content_length = result.request.headers.get('Content-Length')
+        if content_length is not None:
+            request_bytes = int(content_length)
+    response_bytes: Optional[int]
+    if kwargs.get('stream'):
+        content_length = result.headers.get('Content-Length')
+        response_bytes = int(content_length) if content_length else None
+    else:
+        response_bytes = len(result.content)
+    sforce_limit_info = result.headers.get('Sforce-Limit-Info')
+    hooks.fire_after_response(ResponseInfo(
+        name=name,
+        method=method,
+        url=url,
+        url_template=template,
+        request_bytes=request_bytes,
+        response_bytes=response_bytes,
+        status=result.status_code,
+        elapsed=elapsed,
+        retries=retries,
+        api_usage=parse_api_usage(sforce_limit_info)
+        if sforce_limit_info else {}
+        ))
+    return result
+
+
+def exception_class(status_code: int) -> Type[SalesforceError]:
+    """Returns the exception raised by `exception_handler` for a status"""
+    exc_map: Mapping[int, Type[SalesforceError]] = {
+        300: SalesforceMoreThanOneRecord,
+        400: SalesforceMalformedRequest,
+        401: SalesforceExpiredSession,
+        403: SalesforceRefusedRequest,
+        404: SalesforceResourceNotFound,
+    }
+    return exc_map.get(status_code, SalesforceGeneralError)
+
+
 def exception_handler(
         result: requests.Response,
         name: str = "") -> NoReturn:
@@ -77,14 +362,7 @@ def exception_handler(
     except Exception:
         response_content = result.text
 
-    exc_map = {
-        300: SalesforceMoreThanOneRecord,
-        400: SalesforceMalformedRequest,
-        401: SalesforceExpiredSession,
-        403: SalesforceRefusedRequest,
-        404: SalesforceResourceNotFound,
-    }
-    exc_cls = exc_map.get(result.status_code, SalesforceGeneralError)
+    exc_cls = exception_class(result.status_code)
 
     raise exc_cls(result.url, result.status_code, name, response_content)
 
@@ -101,11 +379,13 @@ def call_salesforce(
     """
 
     additional_headers = kwargs.pop('additional_headers', {})
+    name = kwargs.pop('name', '')
     headers.update(additional_headers or {})
-    result = session.request(method, url, headers=headers, **kwargs)
+    result = send_request(session, method, url, name=name, headers=headers,
+                          **kwargs)
 
     if result.status_code >= 300:
-        exception_handler(result)
+        exception_handler(result, name=name)
 
     return result
 
@@ -117,3 +397,19 @@ def list_from_generator(
     for list_results in generator_function:
         ret_val.extend(list_results)
     return ret_val
+
+
+def default_executor() -> Executor:
+    """The thread pool running the bulk and bulk 2.0 requests of clients
+    that were not given an executor, created on first use.
+
+    It is shared by every such client in the process, so concurrent loads
+    do not each start their own threads.
+    """
+    global _default_executor  # pylint: disable=global-statement
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = ThreadPoolExecutor(
+                max_workers=DEFAULT_MAX_WORKERS,
+                thread_name_prefix='simple_salesforce')
+        return _default_executor